@@ -0,0 +1,9 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    # indexul btree este inlocuit cu un index trigram (pg_trgm), care se creeaza la actualizarea modulului
+    cr.execute("DROP INDEX IF EXISTS product_template__search_index_index")
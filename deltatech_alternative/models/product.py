@@ -5,13 +5,90 @@
 from odoo import api, fields, models
 from odoo.osv import expression
 from odoo.tools.safe_eval import safe_eval
+from odoo.tools.sql import escape_psql
+
+# produsele cu cod egal cu textul cautat (rank 0) sau care incepe cu textul cautat (rank 1),
+# citite prin indexurile trigram ale codurilor
+CODE_MATCHES_QUERY = """
+    SELECT codes.id, MIN(codes.rank) AS rank, p.default_code
+    FROM (
+        SELECT p.id, CASE WHEN p.default_code ILIKE %(code)s THEN 0 ELSE 1 END AS rank
+        FROM {table} AS p
+        WHERE p.default_code ILIKE %(prefix)s
+        UNION ALL
+        SELECT p.id, tmpl_codes.rank
+        FROM (
+            SELECT product_tmpl_id, CASE WHEN name ILIKE %(code)s THEN 0 ELSE 1 END AS rank
+            FROM product_alternative
+            WHERE name ILIKE %(prefix)s
+            UNION ALL
+            SELECT product_tmpl_id, CASE WHEN product_code ILIKE %(code)s THEN 0 ELSE 1 END AS rank
+            FROM product_supplierinfo
+            WHERE product_code ILIKE %(prefix)s
+        ) AS tmpl_codes
+            JOIN {table} AS p ON {tmpl_column} = tmpl_codes.product_tmpl_id
+    ) AS codes
+        JOIN {table} AS p ON p.id = codes.id
+    GROUP BY codes.id, p.default_code
+    ORDER BY rank, p.default_code, codes.id
+    LIMIT %(code_limit)s
+"""
+# indexurile trigram nu pot fi folosite pentru texte mai scurte
+CODE_MATCHES_MIN_LENGTH = 3
+# produsele gasite dupa cod si excluse de domeniu sunt compensate citind mai multe coduri decat limita
+CODE_MATCHES_LIMIT_FACTOR = 10
+
+
+def search_index_name_search(model, name, args, operator, limit, name_get_uid, tmpl_column):
+    """Search the products in search_index (trigram index) and return the exact and prefix code matches first.
+
+    The code matches are read through the indexes of the codes, capped to a multiple of the limit,
+    the rest of the products are filled from the trigram search with the limit applied by the database.
+    """
+    domain = expression.AND([[("search_index", operator, name)], args])
+    if operator not in ("ilike", "=ilike") or len(name) < CODE_MATCHES_MIN_LENGTH:
+        return model._search(domain, limit=limit, access_rights_uid=name_get_uid)
+    model.flush_model()
+    model.env["product.alternative"].flush_model(["name", "product_tmpl_id"])
+    model.env["product.supplierinfo"].flush_model(["product_code", "product_tmpl_id"])
+    code = escape_psql(name)
+    model.env.cr.execute(
+        CODE_MATCHES_QUERY.format(table=model._table, tmpl_column=tmpl_column),
+        {"code": code, "prefix": code + "%", "code_limit": limit and limit * CODE_MATCHES_LIMIT_FACTOR or None},
+    )
+    code_ids = [row[0] for row in model.env.cr.fetchall()]
+    if code_ids:
+        # din produsele gasite dupa cod raman cele care respecta domeniul
+        allowed = set(model._search(expression.AND([[("id", "in", code_ids)], domain]), access_rights_uid=name_get_uid))
+        code_ids = [product_id for product_id in code_ids if product_id in allowed][:limit]
+    if limit and len(code_ids) >= limit:
+        return code_ids
+    other_ids = model._search(
+        expression.AND([[("id", "not in", code_ids)], domain]),
+        limit=limit and limit - len(code_ids),
+        access_rights_uid=name_get_uid,
+    )
+    return code_ids + list(other_ids)
+
+
+def _create_default_code_trigram_index(model):
+    """Trigram index on default_code next to the btree index, used by the prefix searches of the codes"""
+    if model.env.registry.has_trigram:
+        model.env.cr.execute(
+            """
+            CREATE INDEX IF NOT EXISTS {table}_default_code_trgm_index
+            ON {table} USING gin (default_code gin_trgm_ops)
+            """.format(
+                table=model._table
+            )
+        )
 
 
 class ProductTemplate(models.Model):
     _inherit = "product.template"
 
     search_index = fields.Char(
-        compute="_compute_search_index", store=True, index=True, compute_sudo=True, unaccent=False
+        compute="_compute_search_index", store=True, index="trigram", compute_sudo=True, unaccent=False
     )
 
     alternative_code = fields.Char(
@@ -25,28 +102,23 @@ class ProductTemplate(models.Model):
 
     used_for = fields.Char(string="Used For")
 
+    def init(self):
+        _create_default_code_trigram_index(self)
+
     @api.depends("name", "default_code", "alternative_ids.name", "seller_ids.product_code")
     def _compute_search_index(self):
-        langs = self.env["res.lang"].search([("active", "=", True)])
-        langs = langs.mapped("code")
-        for product in self:
-            names = [product.with_context(lang=lang).name for lang in langs]
-            name_terms = list(set(names))
-            good_terms = [term for term in name_terms if term is not False]
-            search_index = " ".join(good_terms)
-
-            if product.default_code:
-                search_index = product.default_code + " " + search_index
-
-            terms = []
-            if product.seller_ids:
-                terms += [s.product_code for s in product.seller_ids if s.product_code]
-            if product.alternative_ids:
-                terms += [a.name for a in product.alternative_ids if a.name]
-
-            terms = list(set(terms))
-            search_index += " " + " ".join(terms)
-            product.search_index = search_index[:1000]
+        # denumirile se citesc o singura data pe limba pentru toate produsele
+        names_by_lang = [
+            self.with_context(lang=lang).mapped("name") for lang, _name in self.env["res.lang"].get_installed()
+        ]
+        for index, product in enumerate(self):
+            names = {names[index] for names in names_by_lang}
+            terms = [product.default_code] if product.default_code else []
+            terms += [name for name in names if name]
+            codes = {s.product_code for s in product.seller_ids if s.product_code}
+            codes |= {a.name for a in product.alternative_ids if a.name}
+            terms += sorted(codes)
+            product.search_index = " ".join(" ".join(terms).split())[:1000]
 
     def _inverse_alternative_code(self):
         for product in self:
@@ -73,8 +145,7 @@ class ProductTemplate(models.Model):
         args = args or []
         get_param = self.env["ir.config_parameter"].sudo().get_param
         if name and safe_eval(get_param("deltatech_alternative_website.search_index", "False")):
-            domain = [("search_index", operator, name)]
-            return self._search(expression.AND([domain, args]), limit=limit, access_rights_uid=name_get_uid)
+            return search_index_name_search(self, name, args, operator, limit, name_get_uid, "p.id")
         else:
             return super()._name_search(name, args=args, operator=operator, limit=limit, name_get_uid=name_get_uid)
 
@@ -82,13 +153,15 @@ class ProductTemplate(models.Model):
 class ProductProduct(models.Model):
     _inherit = "product.product"
 
+    def init(self):
+        _create_default_code_trigram_index(self)
+
     @api.model
     def _name_search(self, name, args=None, operator="ilike", limit=100, name_get_uid=None):
         args = args or []
         get_param = self.env["ir.config_parameter"].sudo().get_param
         if name and safe_eval(get_param("deltatech_alternative_website.search_index", "False")):
-            domain = [("search_index", operator, name)]
-            return self._search(expression.AND([domain, args]), limit=limit, access_rights_uid=name_get_uid)
+            return search_index_name_search(self, name, args, operator, limit, name_get_uid, "p.product_tmpl_id")
         else:
             return super()._name_search(name, args=args, operator=operator, limit=limit, name_get_uid=name_get_uid)
 
@@ -97,7 +170,13 @@ class ProductAlternative(models.Model):
     _name = "product.alternative"
     _description = "Product alternative"
 
-    name = fields.Char(string="Code", index=True, unaccent=False)
+    name = fields.Char(string="Code", index="trigram", unaccent=False)
     sequence = fields.Integer(string="sequence", default=10)
-    product_tmpl_id = fields.Many2one("product.template", string="Product Template", ondelete="cascade")
+    product_tmpl_id = fields.Many2one("product.template", string="Product Template", ondelete="cascade", index=True)
     hide = fields.Boolean(string="Hide")
+
+
+class ProductSupplierinfo(models.Model):
+    _inherit = "product.supplierinfo"
+
+    product_code = fields.Char(index="trigram")
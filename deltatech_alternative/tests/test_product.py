@@ -34,3 +34,16 @@ class TestProduct(TransactionCase):
         product.name_search("CODE2")
         self.set_param("deltatech_alternative_website.search_index", "False")
         product.name_search("CODE2")
+
+    def test_search_index_rank(self):
+        other = self.env["product.product"].create({"name": "Test XCODE77", "default_code": "OTHER77"})
+        product = self.env["product.product"].create({"name": "Test Product", "default_code": "CODE77"})
+        alternative = self.env["product.product"].create({"name": "Alternative", "alternative_code": "CODE77-A"})
+
+        self.assertIn("CODE77-A", alternative.search_index)
+        result = [res[0] for res in self.env["product.product"].name_search("CODE77")]
+        self.assertEqual(result, [product.id, alternative.id, other.id])
+        result = [res[0] for res in self.env["product.product"].name_search("CODE77", limit=2)]
+        self.assertEqual(result, [product.id, alternative.id])
+        result = [res[0] for res in self.env["product.product"].name_search("XCODE77", limit=2)]
+        self.assertEqual(result, [other.id])
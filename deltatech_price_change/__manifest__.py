@@ -6,7 +6,7 @@
 {
     "name": "Price Change",
     "summary": "Price Change",
-    "version": "16.0.1.0.0",
+    "version": "16.0.1.0.1",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
     "category": "Generic Modules",
@@ -78,58 +78,96 @@ class ProductPriceChange(models.Model):
         self.write({"state": "done"})
         # aici se actualizeaza si preturile din produse
 
-        for change in self:
-            if not change.location_id:
-                locations = self.env["stock.location"].search([("usage", "=", "internal")])
-
-                for location in locations:
-                    new_lines = []
-                    warehouse = location.warehouse_id
-                    for line in change.line_ids:
-                        available = 0
-                        quant_ids = self.env["stock.quant"].search(
-                            [("product_id", "=", line.product_id.id), ("location_id", "=", location.id)]
-                        )
-
-                        for quant in quant_ids:
-                            available += quant.quantity
-                        # available = line.product_id.qty_available
-
-                        if available != 0:
-                            new_lines.append(
-                                [
-                                    0,
-                                    0,
-                                    {
-                                        "product_id": line.product_id.id,
-                                        "old_price": line.old_price,
-                                        "new_price": line.new_price,
-                                        "quantity": available,
-                                    },
-                                ]
-                            )
-
-                    if len(new_lines) > 0:
-                        self.create(
-                            {
-                                "name": change.name,
-                                "parent_id": change.id,
-                                "warehouse_id": warehouse.id,
-                                "location_id": location.id,
-                                "state": "done",
-                                "line_ids": new_lines,
-                            }
-                        )
-                        if warehouse.partner_id:
-                            self.message_subscribe([warehouse.partner_id.id])
-                        self.message_post(body=_("New Price Change"), type="comment", subtype="mail.mt_comment")
-
-            for change in self:
-                for line in change.line_ids:
-                    line.product_id.with_context(ref=change.name).write({"list_price": line.new_price})
+        changes = self.filtered(lambda c: not c.location_id)
+        if changes:
+            locations = self.env["stock.location"].search([("usage", "=", "internal")])
+            changes._create_location_changes(locations)
 
+        self._update_list_price()
         return True
 
+    @api.model
+    def _get_quantities_by_location(self, product_ids, location_ids):
+        """Quantities of the products in each location, with a single grouped query over stock_quant
+
+        :return: dict {location_id: {product_id: quantity}}, without the null quantities
+        """
+        res = {}
+        if not product_ids or not location_ids:
+            return res
+        self.env["stock.quant"].flush_model(["product_id", "location_id", "quantity"])
+        self.env.cr.execute(
+            """
+            SELECT location_id, product_id, SUM(quantity)
+            FROM stock_quant
+            WHERE product_id IN %s AND location_id IN %s
+            GROUP BY location_id, product_id
+            HAVING SUM(quantity) != 0
+            """,
+            (tuple(product_ids), tuple(location_ids)),
+        )
+        for location_id, product_id, quantity in self.env.cr.fetchall():
+            res.setdefault(location_id, {})[product_id] = quantity
+        return res
+
+    def _create_location_changes(self, locations):
+        """Create, for each location with stock, a child document with the lines of the products in stock"""
+        quantities = self._get_quantities_by_location(self.line_ids.product_id.ids, locations.ids)
+        vals_list = []
+        warehouses = self.env["stock.warehouse"]
+        for change in self:
+            for location in locations:
+                available = quantities.get(location.id)
+                if not available:
+                    continue
+                new_lines = [
+                    (
+                        0,
+                        0,
+                        {
+                            "product_id": line.product_id.id,
+                            "old_price": line.old_price,
+                            "new_price": line.new_price,
+                            "quantity": available[line.product_id.id],
+                        },
+                    )
+                    for line in change.line_ids
+                    if line.product_id.id in available
+                ]
+                if not new_lines:
+                    continue
+                vals_list.append(
+                    {
+                        "name": change.name,
+                        "parent_id": change.id,
+                        "warehouse_id": location.warehouse_id.id,
+                        "location_id": location.id,
+                        "state": "done",
+                        "line_ids": new_lines,
+                    }
+                )
+                warehouses |= location.warehouse_id
+        children = self.create(vals_list)
+        partners = warehouses.partner_id
+        if partners:
+            children.parent_id.message_subscribe(partners.ids)
+        for change in children.parent_id:
+            change.message_post(body=_("New Price Change"), message_type="comment", subtype_xmlid="mail.mt_comment")
+        return children
+
+    def _update_list_price(self):
+        """Write the new sale prices, grouping the products with the same price in a single write"""
+        new_prices = {}
+        for change in self:
+            for line in change.line_ids:
+                new_prices[line.product_id] = (change.name, line.new_price)
+        products_by_price = {}
+        for product, key in new_prices.items():
+            products_by_price.setdefault(key, self.env["product.product"])
+            products_by_price[key] |= product
+        for (ref, price), products in products_by_price.items():
+            products.with_context(ref=ref).write({"list_price": price})
+
     def unlink(self):
         for change in self:
             if change.state not in ["draft"]:
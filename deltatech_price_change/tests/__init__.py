@@ -0,0 +1,5 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from . import test_price_change
+from . import test_price_change_benchmark
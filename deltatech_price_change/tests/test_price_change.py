@@ -0,0 +1,33 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from odoo.tests.common import TransactionCase
+
+
+class TestPriceChange(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.location = self.env.ref("stock.stock_location_stock")
+        self.product_1 = self.env["product.product"].create({"name": "Test 1", "type": "product", "list_price": 10})
+        self.product_2 = self.env["product.product"].create({"name": "Test 2", "type": "product", "list_price": 20})
+        self.env["stock.quant"]._update_available_quantity(self.product_1, self.location, 5)
+
+    def test_price_change_all_locations(self):
+        change = self.env["product.price.change"].create(
+            {
+                "line_ids": [
+                    (0, 0, {"product_id": self.product_1.id, "new_price": 12}),
+                    (0, 0, {"product_id": self.product_2.id, "new_price": 22}),
+                ]
+            }
+        )
+        change.action_confirm()
+
+        self.assertEqual(change.state, "done")
+        self.assertEqual(self.product_1.list_price, 12)
+        self.assertEqual(self.product_2.list_price, 22)
+
+        child = change.child_ids.filtered(lambda c: c.location_id == self.location)
+        self.assertEqual(len(child), 1)
+        self.assertEqual(child.line_ids.product_id, self.product_1)
+        self.assertEqual(child.line_ids.quantity, 5)
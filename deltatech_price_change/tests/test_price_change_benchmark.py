@@ -0,0 +1,60 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+import logging
+import time
+
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class TestPriceChangeBenchmark(TransactionCase):
+    """Run with --test-tags benchmark; changes the price of 3000 products in stock in 40 locations"""
+
+    products_count = 3000
+    locations_count = 40
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.parent_location = cls.env["stock.location"].create({"name": "Benchmark", "usage": "view"})
+        cls.locations = cls.env["stock.location"].create(
+            [
+                {"name": "Benchmark %s" % i, "usage": "internal", "location_id": cls.parent_location.id}
+                for i in range(cls.locations_count)
+            ]
+        )
+        cls.products = cls.env["product.product"].create(
+            [{"name": "Benchmark %s" % i, "type": "product", "list_price": 10.0} for i in range(cls.products_count)]
+        )
+        cls.env["stock.quant"].create(
+            [
+                {"product_id": product.id, "location_id": location.id, "quantity": 10.0}
+                for product in cls.products
+                for location in cls.locations
+            ]
+        )
+
+    def test_benchmark_action_confirm(self):
+        change = self.env["product.price.change"].create(
+            {"line_ids": [(0, 0, {"product_id": product.id, "new_price": 15.0}) for product in self.products]}
+        )
+        queries = self.env.cr.sql_log_count
+        start = time.time()
+        change.action_confirm()
+        duration = time.time() - start
+        _logger.info(
+            "Price change of %s products in %s locations took %.2f seconds and %s queries",
+            self.products_count,
+            self.locations_count,
+            duration,
+            self.env.cr.sql_log_count - queries,
+        )
+        children = change.child_ids.filtered(lambda c: c.location_id in self.locations)
+        self.assertEqual(len(children), self.locations_count)
+        self.assertEqual(len(children.line_ids), self.products_count * self.locations_count)
+        self.assertTrue(all(price == 15.0 for price in self.products.mapped("list_price")))
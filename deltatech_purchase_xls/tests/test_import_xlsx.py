@@ -72,3 +72,34 @@ class TestImportXLS(TransactionCase):
         wizard_form = Form(wizard)
         wizard = wizard_form.save()
         wizard.do_export()
+
+    def test_csv_file_import(self):
+        vendor = self.env["res.partner"].create({"name": "vendor"})
+        product = self.env["product.product"].create(
+            {
+                "name": "Vendor Product",
+                "type": "product",
+                "seller_ids": [(0, 0, {"partner_id": vendor.id, "product_code": "V-001", "price": 10})],
+            }
+        )
+        internal_product = self.env["product.product"].create(
+            {"name": "Internal Product", "type": "product", "default_code": "INT-001"}
+        )
+        content = "product_code;default_code;product_name;quantity;price;uom_name\n"
+        content += "V-001;;;2;10;\nINT-001;;;3;5;\nV-001;;;1;10;\n"
+
+        order_form = Form(self.env["purchase.order"])
+        order_form.partner_id = vendor
+        order = order_form.save()
+
+        wizard = self.env["import.purchase.line"].with_context(active_id=order.id, active_model="purchase.order")
+        wizard_form = Form(wizard)
+        wizard_form.data_file = base64.b64encode(content.encode())
+        wizard_form.filename = "lines.csv"
+        wizard_form.has_header = True
+        wizard_form.search_by_default_code = True
+        wizard = wizard_form.save()
+        wizard.do_import()
+
+        self.assertEqual(order.order_line.mapped("product_id"), product | internal_product)
+        self.assertEqual(sum(order.order_line.filtered(lambda l: l.product_id == product).mapped("product_qty")), 3)
@@ -1,8 +1,11 @@
 import base64
+import csv
+import io
 import logging
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import split_every
 
 _logger = logging.getLogger(__name__)
 
@@ -16,6 +19,11 @@ try:
 except ImportError:
     xlrd = xlsx = None
 
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
 
 class ImportPurchaseLine(models.TransientModel):
     _name = "import.purchase.line"
@@ -45,54 +53,80 @@ class ImportPurchaseLine(models.TransientModel):
         defaults["purchase_id"] = purchase.id
         return defaults
 
-    def get_rows(self):
-        decoded_data = base64.b64decode(self.data_file)
-        book = xlrd.open_workbook(file_contents=decoded_data)
+    @api.model
+    def _get_chunk_size(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return int(get_param("deltatech_purchase_xls.import_chunk_size", "500"))
+
+    @api.model
+    def _cell_to_str(self, value):
+        if value is None:
+            return ""
+        if isinstance(value, float):
+            return str(value) if value % 1 != 0.0 else str(int(value))
+        return str(value)
+
+    def _iter_csv_rows(self, file_content):
+        text = io.TextIOWrapper(io.BytesIO(file_content), encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+
+    def _iter_xlsx_rows(self, file_content):
+        # in modul read-only openpyxl citeste foaia rand cu rand, fara sa incarce tot fisierul in memorie
+        book = openpyxl.load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
+        try:
+            for row in book.worksheets[0].iter_rows(values_only=True):
+                yield [self._cell_to_str(value) for value in row]
+        finally:
+            book.close()
+
+    def _iter_xls_rows(self, file_content):
+        book = xlrd.open_workbook(file_contents=file_content, on_demand=True)
         sheet = book.sheet_by_index(0)
-        table_values = []
-        for row in list(map(sheet.row, range(sheet.nrows))):
+        for index in range(sheet.nrows):
             values = []
-            for cell in row:
+            for cell in sheet.row(index):
                 if cell.ctype is xlrd.XL_CELL_NUMBER:
-                    is_float = cell.value % 1 != 0.0
-                    values.append(str(cell.value) if is_float else str(int(cell.value)))
+                    values.append(self._cell_to_str(cell.value))
                 else:
                     values.append(cell.value)
-            table_values.append(values)
+            yield values
 
-        if not table_values:
-            return False
+    def _iter_rows(self):
+        """Stream the rows of the file: CSV, xlsx with openpyxl in read-only mode or xls with xlrd"""
+        file_content = base64.b64decode(self.data_file)
+        filename = (self.filename or "").lower()
+        if filename.endswith(".csv"):
+            rows = self._iter_csv_rows(file_content)
+        elif file_content[:2] == b"PK" and openpyxl:
+            rows = self._iter_xlsx_rows(file_content)
+        elif xlrd:
+            rows = self._iter_xls_rows(file_content)
+        else:
+            raise UserError(_("Invalid file format"))
         if self.has_header:
-            table_values.pop(0)
-        return table_values
+            next(rows, None)
+        yield from rows
 
-    def do_import(self):
-        table_values = self.get_rows()
-        lines = []
-        for row in table_values:
-            try:
-                fields_list = self.fields_list.split(",")
-                values = dict(zip(fields_list, row))
-            except Exception:
-                raise UserError(_("Invalid file format"))
+    def get_rows(self):
+        table_values = list(self._iter_rows())
+        return table_values or False
 
+    def _parse_rows(self, rows):
+        fields_list = self.fields_list.split(",")
+        for row in rows:
+            values = dict(zip(fields_list, row))
             product_code = values.get("product_code", False)
             if not product_code:
                 continue
 
-            product_name = values.get("product_name", False)
-            quantity = values.get("quantity", False)
+            quantity = float(values.get("quantity", False))
             price = values.get("price", False)
-            uom_name = values.get("uom_name", False)
-
-            # if len(row) == 5:
-            #     product_code, product_name, quantity, price, uom_name = row
-            # elif len(row) == 4:
-            #     product_code, product_name, quantity, price = row
-            #     uom_name = False
-            # else:
-            #     continue
-            quantity = float(quantity)
             if self.is_amount and quantity:
                 price = float(price) / quantity
             else:
@@ -100,20 +134,68 @@ class ImportPurchaseLine(models.TransientModel):
                     price = float(price)
                 except Exception:
                     continue
+            yield {
+                "product_code": product_code,
+                "product_name": values.get("product_name", False),
+                "quantity": quantity,
+                "price": price,
+                "uom_name": values.get("uom_name", False),
+            }
+
+    def _search_products(self, codes):
+        """
+        Search the products for all the codes at once: the supplier codes and then, for the codes
+        not found, the internal codes.
+        :param codes: codes to search
+        :return: dict {code: product}
+        """
+        products = {}
+        codes = set(codes)
+        supplier_infos = self.env["product.supplierinfo"].sudo().search([("product_code", "in", list(codes))])
+        for supplier_info in supplier_infos:
+            if supplier_info.product_code in products:
+                continue
+            if supplier_info.product_id:
+                product = supplier_info.product_id
+            else:
+                product = supplier_info.product_tmpl_id.product_variant_id
+            products[supplier_info.product_code] = product
 
-            product_id = self.search_product(product_code)
+        missing = codes - set(products)
+        if missing and self.search_by_default_code:
+            for product in self.env["product.product"].sudo().search([("default_code", "in", list(missing))]):
+                products.setdefault(product.default_code, product)
+        return products
+
+    def _get_uom(self, uom_name, cache):
+        if uom_name not in cache:
+            cache[uom_name] = self.env["uom.uom"].search([("name", "=", uom_name)], limit=1)
+        return cache[uom_name]
+
+    def do_import(self):
+        rows = list(self._parse_rows(self._iter_rows()))
+        products = self._search_products(row["product_code"] for row in rows)
+        uom_cache = {}
+        lines = []
+        for row in rows:
+            product_code = row["product_code"]
+            uom_name = row["uom_name"]
+            product_id = products.get(product_code)
             if product_id:
                 # check UOM
                 product_uom = product_id.uom_po_id or product_id.uom_id
                 if uom_name and uom_name != product_uom.name:
-                    uom = self.env["uom.uom"].search([("name", "=", uom_name)], limit=1)
+                    uom = self._get_uom(uom_name, uom_cache)
                     if uom:
                         if uom != product_id.uom_po_id and uom != product_id.uom_id:
                             raise UserError(_("Product %s does not have UOM %s") % (product_id.name, uom.name))
                         product_uom = uom
             else:
                 if self.new_product:
-                    product_id = self.create_product(product_code, product_name, quantity, price, uom_name)
+                    product_id = self.create_product(
+                        product_code, row["product_name"], row["quantity"], row["price"], uom_name, uom_cache
+                    )
+                    products[product_code] = product_id
                     product_uom = product_id.uom_po_id or product_id.uom_id
                 else:
                     raise UserError(_("Product %s not found") % product_code)
@@ -122,17 +204,28 @@ class ImportPurchaseLine(models.TransientModel):
                 {
                     "order_id": self.purchase_id.id,
                     "product_id": product_id.id,
-                    "name": product_name or product_id.display_name,
-                    "product_qty": quantity,
-                    "price_unit": price,
+                    "name": row["product_name"] or product_id.display_name,
+                    "product_qty": row["quantity"],
+                    "price_unit": row["price"],
                     "product_uom": product_uom.id,
                     "date_planned": self.purchase_id.date_order,
                 }
             ]
-        purchase_lines = self.env["purchase.order.line"].create(lines)
-        purchase_lines._compute_tax_id()
-        if "price" not in self.fields_list:
-            purchase_lines._onchange_quantity()
+        self._create_lines(lines)
+
+    def _create_lines(self, lines):
+        """Create the order lines in chunks, logging the progress after each chunk"""
+        purchase_lines = self.env["purchase.order.line"]
+        done = 0
+        for chunk in split_every(self._get_chunk_size(), lines, list):
+            chunk_lines = self.env["purchase.order.line"].create(chunk)
+            chunk_lines._compute_tax_id()
+            if "price" not in self.fields_list:
+                chunk_lines._onchange_quantity()
+            purchase_lines |= chunk_lines
+            done += len(chunk)
+            _logger.info("Import purchase lines in %s: %s/%s", self.purchase_id.name, done, len(lines))
+        return purchase_lines
 
     def search_product(self, code=False):
         """
@@ -140,32 +233,16 @@ class ImportPurchaseLine(models.TransientModel):
         :param code: code to search
         :return: product record or False if not found
         """
-        domain = [("product_code", "=", code)]
-        supplier_info = self.env["product.supplierinfo"].sudo().search(domain, limit=1)
-        if not supplier_info:
-            if self.search_by_default_code:
-                domain = [("default_code", "=", code)]
-                product = self.env["product.product"].sudo().search(domain, limit=1)
-                if product:
-                    return product
-                else:
-                    return False
-            else:
-                return False
-        else:
-            if supplier_info.product_id:
-                product = supplier_info.product_id
-            else:
-                product = supplier_info.product_tmpl_id.product_variant_id
-            return product
+        return self._search_products([code]).get(code, False)
 
-    def create_product(self, product_code, product_name, quantity, price, uom_name=False):
+    def create_product(self, product_code, product_name, quantity, price, uom_name=False, uom_cache=None):
         """
         :param product_code: code
         :param product_name: name
         :param quantity: qty to order
         :param price: price
         :param uom_name: optional, default uom(1) is set if not present
+        :param uom_cache: optional, dict {uom_name: uom} shared by the rows of the file
         :return: product record
         """
         seller_values = {
@@ -174,7 +251,7 @@ class ImportPurchaseLine(models.TransientModel):
             "price": price,
             "currency_id": self.purchase_id.currency_id.id,
         }
-        uom = self.env["uom.uom"].search([("name", "=", uom_name)], limit=1)
+        uom = self._get_uom(uom_name, {} if uom_cache is None else uom_cache)
         if uom:
             uom_id = uom.id
         else:
@@ -0,0 +1,9 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+
+def migrate(cr, version):
+    if not version:
+        return
+    # raportul devine tabel, vederea veche trebuie stearsa inainte de crearea tabelului
+    cr.execute("DROP VIEW IF EXISTS sale_margin_report CASCADE")
@@ -2,7 +2,7 @@
 # See README.rst file on addons root folder for license details
 
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class CommissionUsers(models.Model):
@@ -18,3 +18,34 @@ class CommissionUsers(models.Model):
     director_user_id = fields.Many2one("res.users", string="Sales Director")
     journal_id = fields.Many2one("account.journal", string="Journal", domain="[('type', 'in', ['sale','sale_refund'])]")
     company_id = fields.Many2one("res.company", required=True, default=lambda self: self.env.company)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._refresh_margin_report(records.journal_id.ids)
+        return records
+
+    def write(self, vals):
+        journal_ids = self.journal_id.ids
+        res = super().write(vals)
+        self._refresh_margin_report(journal_ids + self.journal_id.ids)
+        return res
+
+    def unlink(self):
+        journal_ids = self.journal_id.ids
+        res = super().unlink()
+        self._refresh_margin_report(journal_ids)
+        return res
+
+    @api.model
+    def _refresh_margin_report(self, journal_ids):
+        """The rates are copied in the report lines, so the invoices of the journals are refreshed"""
+        if not journal_ids:
+            return
+        domain = [
+            ("journal_id", "in", journal_ids),
+            ("move_type", "in", ["out_invoice", "out_refund"]),
+            ("state", "=", "posted"),
+        ]
+        moves = self.env["account.move"].sudo().search(domain)
+        self.env["sale.margin.report"].sudo()._refresh_invoices(moves.ids)
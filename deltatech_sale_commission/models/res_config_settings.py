@@ -1,4 +1,4 @@
-from odoo import api, fields, models
+from odoo import fields, models
 
 
 class ResConfigSettings(models.TransientModel):
@@ -11,6 +11,9 @@ class ResConfigSettings(models.TransientModel):
         readonly=False,
     )
 
-    @api.onchange("sale_user_detail")
-    def _onchange_sale_user_detail(self):
-        self.env["sale.margin.report"].init()
+    def set_values(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        sale_user_detail = get_param("sale_commission.sale_user_detail", "invoice")
+        super().set_values()
+        if self.sale_user_detail != sale_user_detail:
+            self.env["sale.margin.report"].sudo()._refresh(full=True)
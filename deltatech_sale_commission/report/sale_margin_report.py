@@ -1,19 +1,41 @@
 # ©  2008-2021 Deltatech
 # See README.rst file on addons root folder for license details
 
-from odoo import fields, models, tools
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+
+WATERMARK_PARAM = "deltatech_sale_commission.margin_report_watermark"
+DIMENSION_WATERMARK_PARAM = "deltatech_sale_commission.margin_report_dimension_watermark"
+# facturile scrise de tranzactii inca deschise la citirea watermark-ului sunt reluate la urmatoarea actualizare
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# categoria produsului si regiunea partenerului sunt copiate in raport, se actualizeaza pentru cei modificati
+DIMENSION_UPDATE_QUERIES = [
+    """
+    UPDATE sale_margin_report AS r SET categ_id = pt.categ_id
+    FROM product_product AS pp
+        JOIN product_template AS pt ON pt.id = pp.product_tmpl_id
+    WHERE r.product_id = pp.id AND pt.write_date >= %(date_from)s AND r.categ_id IS DISTINCT FROM pt.categ_id
+    """,
+    """
+    UPDATE sale_margin_report AS r SET state_id = rp.state_id
+    FROM res_partner AS rp
+    WHERE r.partner_id = rp.id AND rp.write_date >= %(date_from)s AND r.state_id IS DISTINCT FROM rp.state_id
+    """,
+]
 
 
 class SaleMarginReport(models.Model):
     _name = "sale.margin.report"
     _description = "Sale Margin Report"
-    _auto = False
     _order = "date desc"
+    _log_access = False
 
-    date = fields.Date("Date", readonly=True)
-    invoice_id = fields.Many2one("account.move", "Invoice", readonly=True)
+    date = fields.Date("Date", readonly=True, index=True)
+    invoice_id = fields.Many2one("account.move", "Invoice", readonly=True, index=True, ondelete="cascade")
     categ_id = fields.Many2one("product.category", "Category", readonly=True)
-    product_id = fields.Many2one("product.product", "Product", readonly=True)
+    product_id = fields.Many2one("product.product", "Product", readonly=True, index=True)
     product_uom = fields.Many2one("uom.uom", "Unit of Measure", readonly=True)
     product_uom_qty = fields.Float("Quantity", readonly=True)
     purchase_price = fields.Float("Purchase price", readonly=False)
@@ -35,10 +57,10 @@ class SaleMarginReport(models.Model):
     commission_director_computed = fields.Float("Commission Director Computed", readonly=True)
 
     commission = fields.Float("Commission")
-    partner_id = fields.Many2one("res.partner", "Partner", readonly=True)
+    partner_id = fields.Many2one("res.partner", "Partner", readonly=True, index=True)
     commercial_partner_id = fields.Many2one("res.partner", "Commercial Partner", readonly=True)
 
-    user_id = fields.Many2one("res.users", "Salesperson")
+    user_id = fields.Many2one("res.users", "Salesperson", index=True)
     manager_user_id = fields.Many2one("res.users", "Sales Manager", readonly=True)
     director_user_id = fields.Many2one("res.users", "Sales Director", readonly=True)
 
@@ -229,11 +251,20 @@ class SaleMarginReport(models.Model):
         return group_by_str
 
     def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
-        # pylint: disable=E8103
-        self.env.cr.execute(
-            """CREATE or REPLACE VIEW %s as (
-            WITH currency_rate AS (%s)
+        # facturile modificate se citesc dupa write_date la fiecare actualizare
+        for table in ("account_move", "account_move_line"):
+            self.env.cr.execute(
+                "CREATE INDEX IF NOT EXISTS {table}_write_date_index ON {table} (write_date)".format(table=table)
+            )
+        # la instalare si la trecerea de la vedere la tabel raportul se construieste complet
+        if not self.env["ir.config_parameter"].sudo().get_param(WATERMARK_PARAM):
+            self._refresh()
+
+    def _query(self, move_ids=None):
+        where = self._where()
+        if move_ids is not None:
+            where += " and s.id = ANY(%(move_ids)s)"
+        return """
             %s
             FROM (
                 %s
@@ -241,17 +272,93 @@ class SaleMarginReport(models.Model):
                 WHERE %s
                 GROUP BY %s
             ) AS sub
-        )"""
-            % (
-                self._table,
-                self.env["res.currency"]._select_companies_rates(),
-                self._select(),
-                self._sub_select(),
-                self._from(),
-                self._where(),
-                self._group_by(),
-            )
+        """ % (
+            self._select(),
+            self._sub_select(),
+            self._from(),
+            where,
+            self._group_by(),
+        )
+
+    @api.model
+    def _refresh_invoices(self, move_ids=None):
+        """Replace the report lines of the invoices with the current values of the invoice lines
+
+        :param move_ids: the invoices to refresh, None to rebuild the whole report
+        """
+        self.env.flush_all()
+        columns = ", ".join(name for name, field in self._fields.items() if field.store and field.column_type)
+        params = {"move_ids": move_ids}
+        if move_ids is None:
+            self.env.cr.execute("DELETE FROM sale_margin_report")
+        elif move_ids:
+            self.env.cr.execute("DELETE FROM sale_margin_report WHERE invoice_id = ANY(%(move_ids)s)", params)
+        else:
+            return
+        # pylint: disable=E8103
+        self.env.cr.execute(
+            "INSERT INTO sale_margin_report ({columns}) SELECT {columns} FROM ({query}) AS report".format(
+                columns=columns, query=self._query(move_ids)
+            ),
+            params,
         )
+        self.invalidate_model()
+
+    @api.model
+    def _refresh(self, full=False):
+        """Refresh the report with the invoices changed since the last refresh.
+
+        The commission is read from the invoice lines, where the edits of the report are saved,
+        so it is kept by any refresh. The category and the region of the products and partners
+        changed since the last refresh are updated. Without a watermark or with full the report is rebuilt.
+        """
+        config = self.env["ir.config_parameter"].sudo()
+        watermark = not full and config.get_param(WATERMARK_PARAM)
+        dimension_watermark = config.get_param(DIMENSION_WATERMARK_PARAM)
+        self.env.flush_all()
+        self.env.cr.execute(
+            """
+            SELECT GREATEST((SELECT MAX(write_date) FROM account_move), (SELECT MAX(write_date) FROM account_move_line))
+            """
+        )
+        new_watermark = self.env.cr.fetchone()[0]
+        self.env.cr.execute(
+            """
+            SELECT GREATEST((SELECT MAX(write_date) FROM product_template), (SELECT MAX(write_date) FROM res_partner))
+            """
+        )
+        new_dimension_watermark = self.env.cr.fetchone()[0]
+        if watermark:
+            # fara watermark pentru produse si parteneri se verifica toate liniile o singura data
+            date_from = dimension_watermark and fields.Datetime.to_datetime(dimension_watermark) - WATERMARK_OVERLAP
+            for query in DIMENSION_UPDATE_QUERIES:
+                self.env.cr.execute(query, {"date_from": date_from or datetime.min})
+            self.invalidate_model(["categ_id", "state_id"])
+            date_from = fields.Datetime.to_datetime(watermark) - WATERMARK_OVERLAP
+            self.env.cr.execute(
+                """
+                SELECT id FROM account_move WHERE write_date >= %(date_from)s
+                UNION
+                SELECT move_id FROM account_move_line WHERE write_date >= %(date_from)s
+                """,
+                {"date_from": date_from},
+            )
+            self._refresh_invoices([row[0] for row in self.env.cr.fetchall()])
+        else:
+            self._refresh_invoices()
+        if new_watermark:
+            config.set_param(WATERMARK_PARAM, fields.Datetime.to_string(new_watermark))
+        if new_dimension_watermark:
+            config.set_param(DIMENSION_WATERMARK_PARAM, fields.Datetime.to_string(new_dimension_watermark))
+
+    @api.model
+    def _cron_refresh(self):
+        self.sudo()._refresh()
+
+    @api.model
+    def action_refresh(self):
+        self.sudo()._refresh()
+        return {"type": "ir.actions.client", "tag": "reload"}
 
     def write(self, vals):
         invoice_line = self.env["account.move.line"].sudo().browse(self.id)
@@ -267,4 +374,5 @@ class SaleMarginReport(models.Model):
             invoice.write({"invoice_user_id": vals["user_id"]})
         if 1 == 2:
             super().write(vals)
+        self.sudo()._refresh_invoices(self.invoice_id.ids)
         return True
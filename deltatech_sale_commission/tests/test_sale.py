@@ -90,3 +90,37 @@ class TestSale(TransactionCase):
         wizard.price_from_doc = False
         wizard = wizard.save()
         wizard.do_compute()
+
+    def test_margin_report_refresh(self):
+        invoice = self.env["account.move"].create(
+            {
+                "move_type": "out_invoice",
+                "partner_id": self.partner_a.id,
+                "invoice_line_ids": [(0, 0, {"product_id": self.product_a.id, "quantity": 2, "price_unit": 150})],
+            }
+        )
+        invoice.action_post()
+        report_model = self.env["sale.margin.report"]
+        report_model._refresh()
+        line = report_model.search([("invoice_id", "=", invoice.id)])
+        self.assertEqual(len(line), 1)
+        self.assertEqual(line.product_uom_qty, 2)
+
+        line.write({"commission": 12})
+        self.assertEqual(line.commission, 12)
+        report_model._refresh(full=True)
+        self.assertEqual(report_model.search([("invoice_id", "=", invoice.id)]).commission, 12)
+
+        # categoria si regiunea modificate ajung in raport fara reconstruire
+        category = self.env["product.category"].create({"name": "Margin Category"})
+        state = self.env["res.country.state"].search([], limit=1)
+        self.product_a.categ_id = category
+        self.partner_a.state_id = state
+        report_model._refresh()
+        line = report_model.search([("invoice_id", "=", invoice.id)])
+        self.assertEqual(line.categ_id, category)
+        self.assertEqual(line.state_id, state)
+
+        invoice.button_draft()
+        report_model._refresh()
+        self.assertFalse(report_model.search([("invoice_id", "=", invoice.id)]))
@@ -40,6 +40,7 @@ class CommissionCompute(models.TransientModel):
             invoice_line = self.env["account.move.line"].browse(line.id)
             invoice_line.write(value)
             res.append(line.id)
+        self.env["sale.margin.report"].sudo()._refresh_invoices(self.invoice_line_ids.invoice_id.ids)
         return {
             "domain": "[('id','in', [" + ",".join(map(str, res)) + "])]",
             "name": _("Commission"),
@@ -59,4 +59,5 @@ class CommissionUpdatePurchasePrice(models.TransientModel):
 
             if purchase_price:
                 invoice_line.write({"purchase_price": purchase_price})
+        self.env["sale.margin.report"].sudo()._refresh_invoices(lines.invoice_id.ids)
         return True
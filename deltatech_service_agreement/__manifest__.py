@@ -4,7 +4,7 @@
 {
     "name": "Services Agreement",
     "summary": "Manage Services Agreement",
-    "version": "16.0.2.0.4",
+    "version": "16.0.2.0.7",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
     "category": "Services/Agreement",
@@ -25,6 +25,7 @@
         "views/service_agreement_view.xml",
         "views/account_journal_view.xml",
         "views/account_move_view.xml",
+        "views/service_billing_run_view.xml",
         "wizard/service_billing_preparation_view.xml",
         "wizard/service_billing_view.xml",
         "wizard/service_distribution_view.xml",
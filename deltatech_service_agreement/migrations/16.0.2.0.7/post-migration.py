@@ -0,0 +1,30 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+
+def migrate(cr, version):
+    # totalurile sunt actualizate incremental, se initializeaza o singura data
+    cr.execute(
+        """
+        UPDATE service_agreement AS sa SET
+            total_consumption = COALESCE(cons.total, 0),
+            total_invoiced = COALESCE(inv.total, 0)
+        FROM service_agreement AS agr
+            LEFT JOIN (
+                SELECT agreement_id, SUM(revenues) AS total FROM service_consumption
+                WHERE state = 'done'
+                GROUP BY agreement_id
+            ) AS cons ON cons.agreement_id = agr.id
+            LEFT JOIN (
+                SELECT aml.agreement_id,
+                    SUM(CASE WHEN am.move_type = 'out_refund' THEN -aml.price_subtotal ELSE aml.price_subtotal END)
+                        AS total
+                FROM account_move_line AS aml
+                    JOIN account_move AS am ON am.id = aml.move_id
+                WHERE am.state = 'posted' AND am.move_type IN ('out_invoice', 'out_refund')
+                    AND aml.agreement_id IS NOT NULL
+                GROUP BY aml.agreement_id
+            ) AS inv ON inv.agreement_id = agr.id
+        WHERE sa.id = agr.id
+    """
+    )
@@ -6,3 +6,4 @@ from . import service_agreement
 from . import service_consumption
 from . import account_move
 from . import account_journal
+from . import service_billing_run
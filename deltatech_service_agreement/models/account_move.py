@@ -13,21 +13,39 @@ class AccountInvoice(models.Model):
         consumptions = self.env["service.consumption"].search([("invoice_id", "in", self.ids)])
         if consumptions:
             consumptions.write({"state": "draft", "invoice_id": False})
-            for consumption in consumptions:
-                consumption.agreement_id.compute_totals()
         return res
 
     def unlink(self):
         consumptions = self.env["service.consumption"].search([("invoice_id", "in", self.ids)])
         if consumptions:
             consumptions.write({"state": "draft"})
-            for consumption in consumptions:
-                consumption.agreement_id.compute_totals()
         return super().unlink()
 
+    def write(self, vals):
+        # totalurile de pe contracte se actualizeaza doar cu diferenta facturilor care se valideaza sau se anuleaza
+        if "state" not in vals:
+            return super().write(vals)
+        before = self._get_invoiced_totals()
+        res = super().write(vals)
+        self.env["service.agreement"].sudo()._add_totals_delta(before, self._get_invoiced_totals())
+        return res
+
+    def _get_invoiced_totals(self):
+        totals = {}
+        for move in self.filtered(lambda m: m.state == "posted" and m.move_type in ("out_invoice", "out_refund")):
+            # notele de credit copiaza linia de contract si scad din total
+            sign = -1 if move.move_type == "out_refund" else 1
+            for line in move.invoice_line_ids:
+                if not line.agreement_line_id:
+                    continue
+                for record, field_name in line._get_invoiced_targets():
+                    if record:
+                        key = (record._name, field_name, record.id)
+                        totals[key] = totals.get(key, 0.0) + sign * line.price_subtotal
+        return totals
+
     def action_post(self):
         res = super().action_post()
-        agreements = self.env["service.agreement"]
         for invoice in self:
             if invoice.move_type == "out_invoice":
                 invoice_agreements = self.env["service.agreement"]
@@ -35,9 +53,6 @@ class AccountInvoice(models.Model):
                     invoice_agreements |= line.agreement_line_id.agreement_id
 
                 invoice_agreements.write({"last_invoice_id": invoice.id})
-                agreements |= invoice_agreements
-
-        agreements.compute_totals()
         return res
 
 
@@ -46,3 +61,11 @@ class AccountInvoiceLine(models.Model):
 
     agreement_line_id = fields.Many2one("service.agreement.line", string="Service Agreement Line")
     agreement_id = fields.Many2one("service.agreement", related="agreement_line_id.agreement_id", store=True)
+
+    def _get_invoiced_targets(self):
+        """Records with running totals that include the amount of the invoice line
+
+        :return: list of (record, field name)
+        """
+        self.ensure_one()
+        return [(self.agreement_line_id.agreement_id, "total_invoiced")]
@@ -204,21 +204,59 @@ class ServiceAgreement(models.Model):
             agreement.unpaid_invoices = invoice_count
 
     def compute_totals(self):
-        for agreement in self:
-            total_consumption = 0.0
-            total_invoiced = 0.0
-            consumptions = self.env["service.consumption"].search([("agreement_id", "=", agreement.id)])
-            invoices = self.env["account.move"]
-            for consumption in consumptions:
-                if consumption.state == "done":
-                    total_consumption += consumption.revenues
-                    invoices |= consumption.invoice_id
-            for invoice in invoices:
-                if invoice.state == "posted":
-                    for line in invoice.invoice_line_ids:
-                        if line.agreement_line_id in agreement.with_context(test_active=False).agreement_line:
-                            total_invoiced += line.price_subtotal
-            agreement.write({"total_invoiced": total_invoiced, "total_consumption": total_consumption})
+        """Full recompute of the totals; the totals are kept up to date incrementally from the
+        consumptions and the posted invoices, this is needed only to fix the existing data"""
+        if not self:
+            return
+        self.env["service.consumption"].flush_model(["agreement_id", "state", "revenues"])
+        self.env["account.move.line"].flush_model(["agreement_id", "price_subtotal", "move_id"])
+        self.env["account.move"].flush_model(["state", "move_type"])
+        self.env.cr.execute(
+            """
+            UPDATE service_agreement AS sa SET
+                total_consumption = COALESCE((
+                    SELECT SUM(sc.revenues) FROM service_consumption AS sc
+                    WHERE sc.agreement_id = sa.id AND sc.state = 'done'
+                ), 0),
+                total_invoiced = COALESCE((
+                    SELECT SUM(CASE WHEN am.move_type = 'out_refund' THEN -aml.price_subtotal ELSE aml.price_subtotal END) FROM account_move_line AS aml
+                        JOIN account_move AS am ON am.id = aml.move_id
+                    WHERE aml.agreement_id = sa.id AND am.state = 'posted'
+                        AND am.move_type IN ('out_invoice', 'out_refund')
+                ), 0)
+            WHERE sa.id IN %s
+            """,
+            (tuple(self.ids),),
+        )
+        self.invalidate_recordset(["total_consumption", "total_invoiced"])
+
+    @api.model
+    def _add_totals_delta(self, before, after):
+        """Add to the stored totals the difference between two snapshots of amounts
+
+        :param before: dict {(model, field name, record id): amount} before the change
+        :param after: dict {(model, field name, record id): amount} after the change
+        """
+        deltas = {}
+        for key in set(before) | set(after):
+            delta = after.get(key, 0.0) - before.get(key, 0.0)
+            if delta:
+                model, field_name, res_id = key
+                deltas.setdefault((model, field_name), {})[res_id] = delta
+        for (model, field_name), values in deltas.items():
+            records = self.env[model].browse(values.keys())
+            records.flush_recordset([field_name])
+            self.env.cr.execute(
+                """
+                UPDATE {table} AS t SET {field} = COALESCE(t.{field}, 0) + d.delta
+                FROM unnest(%s::int[], %s::float8[]) AS d(id, delta)
+                WHERE t.id = d.id
+                """.format(
+                    table=records._table, field=field_name
+                ),
+                (list(values.keys()), list(values.values())),
+            )
+            records.invalidate_recordset([field_name])
 
     # TODO: de legat acest contract la un cont analitic ...
     @api.depends("last_invoice_id")
@@ -308,23 +346,10 @@ class ServiceAgreement(models.Model):
 
     @api.model
     def make_billing_automation(self):
-        agreements = self.get_agreements_auto_billing()
-        from_date = fields.Date.context_today(self) + relativedelta(day=1, months=0, days=0)
-        to_date = fields.Date.context_today(self) + relativedelta(day=1, months=1, days=-1)
-        domain = [("date_start", "=", from_date), ("date_end", "=", to_date)]
-        service_period = self.env["service.date.range"].search(domain)
-        domain = [("service_period_id", "in", service_period.ids), ("agreement_id", "in", agreements.ids)]
-        consumptions = self.env["service.consumption"].search(domain)
-        for consumption in consumptions:  # check if has consumptions in current period
-            agreements = agreements - consumption.agreement_id
-        if agreements:
-            wizard_preparation = self.env["service.billing.preparation"]
-            wizard_preparation = wizard_preparation.with_context(active_ids=agreements.ids).create({})
-            res = wizard_preparation.do_billing_preparation()
-            if res:
-                self = self.with_context(auto=True)
-                wizard_billing = self.env["service.billing"].with_context(active_ids=res["consumption_ids"]).create({})
-                wizard_billing.do_billing()
+        # facturarea se face pe loturi, fiecare lot intr-o tranzactie separata (vezi service.billing.run)
+        run = self.env["service.billing.run"]._get_current_run()
+        run._process()
+        return run
 
 
 class ServiceAgreementType(models.Model):
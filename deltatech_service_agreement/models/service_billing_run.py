@@ -0,0 +1,222 @@
+# ©  2008-2018 Deltatech
+# See README.rst file on addons root folder for license details
+
+import logging
+import threading
+import traceback
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+
+class ServiceBillingRun(models.Model):
+    _name = "service.billing.run"
+    _description = "Service Billing Run"
+    _order = "date desc, id desc"
+
+    name = fields.Char(string="Reference", required=True, readonly=True)
+    date = fields.Date(string="Date", required=True, readonly=True, index=True)
+    company_id = fields.Many2one("res.company", string="Company", default=lambda self: self.env.company, required=True)
+    service_period_id = fields.Many2one("service.date.range", string="Period", readonly=True)
+    state = fields.Selection(
+        [("progress", "In progress"), ("done", "Done"), ("failed", "With errors")],
+        string="Status",
+        default="progress",
+        readonly=True,
+        index=True,
+    )
+    batch_ids = fields.One2many("service.billing.run.batch", "run_id", string="Batches", readonly=True)
+    batch_count = fields.Integer(compute="_compute_progress")
+    batch_done_count = fields.Integer(compute="_compute_progress")
+    batch_failed_count = fields.Integer(compute="_compute_progress")
+
+    @api.depends("batch_ids.state")
+    def _compute_progress(self):
+        for run in self:
+            run.batch_count = len(run.batch_ids)
+            run.batch_done_count = len(run.batch_ids.filtered(lambda b: b.state == "done"))
+            run.batch_failed_count = len(run.batch_ids.filtered(lambda b: b.state == "failed"))
+
+    @api.model
+    def _get_batch_size(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return int(get_param("deltatech_service_agreement.billing_batch_size", "50"))
+
+    @api.model
+    def _auto_commit(self):
+        return not getattr(threading.current_thread(), "testing", False) and not self.env.registry.in_test_mode()
+
+    @api.model
+    def _get_service_period(self):
+        today = fields.Date.context_today(self)
+        from_date = today + relativedelta(day=1, months=0, days=0)
+        to_date = today + relativedelta(day=1, months=1, days=-1)
+        domain = [("date_start", "=", from_date), ("date_end", "=", to_date)]
+        return self.env["service.date.range"].search(domain, limit=1)
+
+    @api.model
+    def _get_agreements_to_bill(self, service_period):
+        agreements = self.env["service.agreement"].get_agreements_auto_billing()
+        # contractele care au deja consumuri in perioada curenta nu se mai factureaza
+        domain = [("service_period_id", "=", service_period.id), ("agreement_id", "in", agreements.ids)]
+        consumptions = self.env["service.consumption"].search(domain)
+        return agreements - consumptions.agreement_id
+
+    @api.model
+    def _get_current_run(self):
+        """Return the run of today; a run interrupted before the end is resumed, not recreated"""
+        today = fields.Date.context_today(self)
+        run = self.search([("date", "=", today), ("company_id", "=", self.env.company.id)], limit=1)
+        if run:
+            return run
+        service_period = self._get_service_period()
+        agreements = self._get_agreements_to_bill(service_period)
+        batches = [
+            (0, 0, {"sequence": sequence, "agreement_ids": [(6, 0, agreement_ids)]})
+            for sequence, agreement_ids in enumerate(split_every(self._get_batch_size(), agreements.ids, list))
+        ]
+        run = self.create(
+            {
+                "name": _("Billing %s") % today,
+                "date": today,
+                "service_period_id": service_period.id,
+                "batch_ids": batches,
+            }
+        )
+        if self._auto_commit():
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+        return run
+
+    def _process(self):
+        """Process the pending batches of the run.
+
+        With queue_job each batch is billed in its own job, enqueued only once, otherwise the batches
+        are billed here one after the other. Every batch is committed separately and the batches are
+        locked with SKIP LOCKED, so several cron workers or jobs can share the same run.
+        """
+        for run in self.filtered(lambda r: r.state == "progress"):
+            pending = run.batch_ids.filtered(lambda b: b.state == "pending")
+            if hasattr(pending, "with_delay"):
+                for batch in pending.filtered(lambda b: not b.enqueued):
+                    batch.enqueued = True
+                    batch.with_delay(
+                        description=_("%(run)s - batch %(batch)s", run=run.name, batch=batch.sequence)
+                    )._bill(commit=True)
+            else:
+                batch = run.batch_ids._lock_next_pending()
+                while batch:
+                    batch._bill(commit=True)
+                    batch = run.batch_ids._lock_next_pending()
+            run._update_state()
+
+    def _update_state(self):
+        for run in self:
+            states = set(run.batch_ids.mapped("state"))
+            if "pending" in states:
+                continue
+            run.state = "failed" if "failed" in states else "done"
+
+    def action_retry_failed(self):
+        self.batch_ids.filtered(lambda b: b.state == "failed").write(
+            {"state": "pending", "enqueued": False, "error": False}
+        )
+        self.write({"state": "progress"})
+        self._process()
+
+
+class ServiceBillingRunBatch(models.Model):
+    _name = "service.billing.run.batch"
+    _description = "Service Billing Run Batch"
+    _order = "run_id, sequence"
+
+    run_id = fields.Many2one("service.billing.run", required=True, ondelete="cascade", index=True)
+    sequence = fields.Integer()
+    agreement_ids = fields.Many2many("service.agreement", string="Agreements")
+    state = fields.Selection(
+        [("pending", "Pending"), ("done", "Done"), ("failed", "Failed")],
+        string="Status",
+        default="pending",
+        index=True,
+    )
+    invoice_ids = fields.Many2many("account.move", string="Invoices")
+    date_done = fields.Datetime(string="Processed on")
+    enqueued = fields.Boolean(readonly=True, help="The batch was sent to the job queue")
+    error = fields.Text()
+
+    def _lock_next_pending(self):
+        """Return the next pending batch, locked for the current transaction"""
+        if not self:
+            return self
+        self.flush_model(["state"])
+        self.env.cr.execute(
+            """
+            SELECT id FROM service_billing_run_batch
+            WHERE id IN %s AND state = 'pending'
+            ORDER BY sequence
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+            """,
+            (tuple(self.ids),),
+        )
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    def _lock_pending(self):
+        """Lock the batch for the current transaction, return False if it is no longer pending or it is
+        billed right now by another worker"""
+        self.ensure_one()
+        self.flush_recordset(["state"])
+        self.env.cr.execute(
+            "SELECT id FROM service_billing_run_batch WHERE id = %s AND state = 'pending' FOR UPDATE SKIP LOCKED",
+            (self.id,),
+        )
+        locked = bool(self.env.cr.fetchone())
+        self.invalidate_recordset(["state"])
+        return locked
+
+    def _bill(self, commit=False):
+        """Bill the agreements of the batch
+
+        :param commit: commit the transaction after the batch, so an interrupted run resumes from the next batch
+        """
+        self.ensure_one()
+        if not self._lock_pending():
+            return
+        try:
+            with self.env.cr.savepoint():
+                invoices = self._do_billing()
+            self.write({"state": "done", "invoice_ids": [(6, 0, invoices.ids)], "date_done": fields.Datetime.now()})
+        except Exception:
+            _logger.exception("Billing batch %s of %s failed", self.sequence, self.run_id.name)
+            self.write({"state": "failed", "error": traceback.format_exc(), "date_done": fields.Datetime.now()})
+        self.run_id._update_state()
+        if commit and self.run_id._auto_commit():
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _do_billing(self):
+        agreements = self.agreement_ids.filtered(lambda a: a.state == "open")
+        invoices = self.env["account.move"]
+        if not agreements:
+            return invoices
+        if not self.run_id.service_period_id:
+            raise UserError(_("There is no service period for the current month"))
+        wizard_preparation = (
+            self.env["service.billing.preparation"]
+            .with_context(active_ids=agreements.ids)
+            .create({"service_period_id": self.run_id.service_period_id.id})
+        )
+        res = wizard_preparation.do_billing_preparation()
+        if res:
+            consumptions = self.env["service.consumption"].search(res["domain"])
+            if consumptions:
+                wizard_billing = (
+                    self.env["service.billing"].with_context(auto=True, active_ids=consumptions.ids).create({})
+                )
+                action = wizard_billing.do_billing()
+                invoices = self.env["account.move"].search(action["domain"])
+        return invoices
@@ -120,6 +120,43 @@ class ServiceConsumption(models.Model):
                 date=consumption.date_invoice or fields.Date.today(),
             )
 
+    def _get_revenue_targets(self):
+        """Records with running totals that include the revenues of the consumption
+
+        :return: list of (record, field name)
+        """
+        self.ensure_one()
+        return [(self.agreement_id, "total_consumption")]
+
+    def _get_revenue_totals(self):
+        totals = {}
+        for consumption in self:
+            if consumption.state != "done":
+                continue
+            for record, field_name in consumption._get_revenue_targets():
+                if record:
+                    key = (record._name, field_name, record.id)
+                    totals[key] = totals.get(key, 0.0) + consumption.revenues
+        return totals
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        consumptions = super().create(vals_list)
+        self.env["service.agreement"].sudo()._add_totals_delta({}, consumptions._get_revenue_totals())
+        return consumptions
+
+    def write(self, vals):
+        if not set(vals) & set(self._get_revenue_fields()):
+            return super().write(vals)
+        before = self._get_revenue_totals()
+        res = super().write(vals)
+        self.env["service.agreement"].sudo()._add_totals_delta(before, self._get_revenue_totals())
+        return res
+
+    @api.model
+    def _get_revenue_fields(self):
+        return ["state", "price_unit", "invoiced_qty", "date_invoice", "currency_id", "agreement_id"]
+
     def unlink(self):
         for item in self:
             if item.state == "done":
@@ -2,6 +2,7 @@
 # See README.rst file on addons root folder for license details
 
 
+from odoo import fields
 from odoo.tests import Form
 from odoo.tests.common import TransactionCase
 
@@ -75,3 +76,116 @@ class TestAgreement(TransactionCase):
 
         invoices = self.env["account.move"].search(action["domain"])
         invoices.action_post()
+
+    def test_billing_group_service(self):
+        agreement = Form(self.env["service.agreement"])
+        agreement.partner_id = self.partner_1
+        agreement.type_id = self.agreement_type
+        agreement.cycle_id = self.cycle
+        agreement.invoice_mode = "service"
+        for quantity in [2, 3]:
+            with agreement.agreement_line.new() as agreement_line:
+                agreement_line.product_id = self.product_1
+                agreement_line.quantity = quantity
+                agreement_line.price_unit = 100
+        agreement = agreement.save()
+        agreement.contract_open()
+
+        wizard = Form(self.env["service.billing.preparation"].with_context(active_ids=[agreement.id]))
+        wizard.service_period_id = self.date_range
+        wizard = wizard.save()
+        action = wizard.do_billing_preparation()
+        consumptions = self.env["service.consumption"].search(action["domain"])
+
+        wizard = Form(self.env["service.billing"].with_context(active_ids=consumptions.ids))
+        wizard = wizard.save()
+        action = wizard.do_billing()
+
+        invoice = self.env["account.move"].search(action["domain"])
+        self.assertEqual(len(invoice), 1)
+        self.assertEqual(len(invoice.invoice_line_ids), 1)
+        self.assertEqual(invoice.invoice_line_ids.quantity, 5)
+        self.assertEqual(set(consumptions.mapped("state")), {"done"})
+        self.assertEqual(consumptions.invoice_id, invoice)
+
+    def _create_open_agreement(self, partner):
+        agreement = Form(self.env["service.agreement"])
+        agreement.partner_id = partner
+        agreement.type_id = self.agreement_type
+        agreement.cycle_id = self.cycle
+        with agreement.agreement_line.new() as agreement_line:
+            agreement_line.product_id = self.product_1
+            agreement_line.quantity = 1
+            agreement_line.price_unit = 100
+        agreement = agreement.save()
+        agreement.contract_open()
+        return agreement
+
+    def test_billing_run(self):
+        agreement = self._create_open_agreement(self.partner_1)
+        blocked_partner = self.env["res.partner"].create(
+            {"name": "Blocked Partner", "invoice_warn": "block", "invoice_warn_msg": "Blocked"}
+        )
+        blocked_agreement = self._create_open_agreement(blocked_partner)
+
+        run = self.env["service.billing.run"].create(
+            {
+                "name": "Test run",
+                "date": fields.Date.today(),
+                "service_period_id": self.date_range.id,
+                "batch_ids": [
+                    (0, 0, {"sequence": 0, "agreement_ids": [(6, 0, agreement.ids)]}),
+                    (0, 0, {"sequence": 1, "agreement_ids": [(6, 0, blocked_agreement.ids)]}),
+                ],
+            }
+        )
+        run._process()
+        batch_ok, batch_failed = run.batch_ids
+        self.assertEqual(batch_ok.state, "done")
+        self.assertEqual(len(batch_ok.invoice_ids), 1)
+        self.assertEqual(batch_failed.state, "failed")
+        self.assertEqual(run.state, "failed")
+        self.assertFalse(self.env["service.consumption"].search([("agreement_id", "=", blocked_agreement.id)]))
+
+        # un lot facturat nu se mai factureaza a doua oara
+        invoices = batch_ok.invoice_ids
+        batch_ok._bill(commit=True)
+        self.assertEqual(batch_ok.invoice_ids, invoices)
+
+        run.action_retry_failed()
+        self.assertEqual(batch_failed.state, "failed")
+        self.assertEqual(run.state, "failed")
+
+    def test_totals_incremental(self):
+        agreement = self._create_open_agreement(self.partner_1)
+        wizard = Form(self.env["service.billing.preparation"].with_context(active_ids=[agreement.id]))
+        wizard.service_period_id = self.date_range
+        wizard = wizard.save()
+        action = wizard.do_billing_preparation()
+        consumptions = self.env["service.consumption"].search(action["domain"])
+
+        wizard = Form(self.env["service.billing"].with_context(active_ids=consumptions.ids))
+        wizard = wizard.save()
+        action = wizard.do_billing()
+        invoice = self.env["account.move"].search(action["domain"])
+        self.assertEqual(agreement.total_consumption, 100)
+        self.assertEqual(agreement.total_invoiced, 0)
+
+        invoice.action_post()
+        self.assertEqual(agreement.total_invoiced, 100)
+
+        invoice.button_draft()
+        self.assertEqual(agreement.total_invoiced, 0)
+
+        invoice.action_post()
+        agreement.compute_totals()
+        self.assertEqual(agreement.total_consumption, 100)
+        self.assertEqual(agreement.total_invoiced, 100)
+
+        # nota de credit scade din totalul facturat
+        refund = invoice._reverse_moves()
+        refund.action_post()
+        self.assertEqual(agreement.total_invoiced, 0)
+        agreement.compute_totals()
+        self.assertEqual(agreement.total_invoiced, 0)
+        self.env["service.agreement"].compute_totals()
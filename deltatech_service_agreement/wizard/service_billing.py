@@ -2,9 +2,11 @@
 # See README.rst file on addons root folder for license details
 
 
+from collections import defaultdict
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
-from odoo.tools import float_compare
+from odoo.tools import float_round
 
 
 class ServiceBilling(models.TransientModel):
@@ -59,14 +61,27 @@ class ServiceBilling(models.TransientModel):
         defaults["consumption_ids"] = [(6, 0, [rec.id for rec in res])]
         return defaults
 
-    def add_invoice_line(self, cons, pre_invoice, price_unit, name, key):
+    def _get_income_account(self, product, accounts_cache):
         # nu mai exista get_invoice_line_account  in V14
-        # account_id = self.env["account.move.line"].get_invoice_line_account(
-        #     "out_invoice", cons.product_id, "", self.env.user.company_id
-        # )
-
-        accounts = cons.product_id.product_tmpl_id.get_product_accounts()
-        account_id = accounts["income"]
+        template = product.product_tmpl_id
+        if template.id not in accounts_cache:
+            accounts_cache[template.id] = template.get_product_accounts()["income"]
+        return accounts_cache[template.id]
+
+    def _convert_price(self, cons, rates_cache):
+        # convertire pret in moneda companiei, cursul se citeste o singura data pe (moneda, data)
+        date = cons.date_invoice or fields.Date.context_today(self)
+        company = self.env.user.company_id
+        to_currency = company.currency_id
+        key = (cons.currency_id.id, date)
+        if key not in rates_cache:
+            rates_cache[key] = self.env["res.currency"]._get_conversion_rate(
+                cons.currency_id, to_currency, company, date
+            )
+        return to_currency.round(cons.price_unit * rates_cache[key])
+
+    def add_invoice_line(self, cons, pre_invoice, price_unit, name, key, accounts_cache=None):
+        account_id = self._get_income_account(cons.product_id, {} if accounts_cache is None else accounts_cache)
 
         invoice_line = {
             "product_id": cons.product_id.id,
@@ -76,7 +91,7 @@ class ServiceBilling(models.TransientModel):
             "name": name,
             # todo: de determinat contul
             "account_id": account_id.id,
-            "tax_ids": [(6, 0, ([rec.id for rec in cons.product_id.taxes_id]))],
+            "tax_ids": [(6, 0, cons.product_id.taxes_id.ids)],
             "agreement_line_id": cons.agreement_line_id.id,
             # "analytic_account_id": cons.analytic_account_id.id,  # nu mai e in 16.0
         }
@@ -85,42 +100,40 @@ class ServiceBilling(models.TransientModel):
         if cons.quantity < 0:
             invoice_line["quantity"] = cons.quantity
 
-        if pre_invoice[cons.date_invoice].get(key, False):
-            is_prod = False
+        invoice = pre_invoice[cons.date_invoice].get(key, False)
+        if invoice:
+            # liniile se grupeaza dupa (produs, pret) folosind un dictionar
+            line_key = (cons.product_id.id, float_round(price_unit, precision_digits=2))
+            line = False
             if (
                 self.group_service and cons.agreement_id.invoice_mode != "detail"
             ) or cons.agreement_id.invoice_mode == "service":
-                for line in pre_invoice[cons.date_invoice][key]["lines"]:
-                    if (
-                        line["product_id"] == cons.product_id.id
-                        and float_compare(line["price_unit"], invoice_line["price_unit"], precision_digits=2) == 0
-                    ):
-                        line["quantity"] += invoice_line["quantity"]
-                        is_prod = True
-                        break
-            if not is_prod:
-                pre_invoice[cons.date_invoice][key]["lines"].append(invoice_line)
-            pre_invoice[cons.date_invoice][key]["cons"] += cons
-            pre_invoice[cons.date_invoice][key]["agreement_ids"] |= cons.agreement_id
+                line = invoice["line_by_key"].get(line_key)
+            if line:
+                line["quantity"] += invoice_line["quantity"]
+            else:
+                invoice["lines"].append(invoice_line)
+                invoice["line_by_key"].setdefault(line_key, invoice_line)
+            invoice["cons_ids"].append(cons.id)
+            invoice["agreement_ids"] |= cons.agreement_id
         else:
             pre_invoice[cons.date_invoice][key] = {
                 "lines": [invoice_line],
-                "cons": cons,
+                "line_by_key": {(cons.product_id.id, float_round(price_unit, precision_digits=2)): invoice_line},
+                "cons_ids": [cons.id],
                 "partner_id": cons.partner_id.id,
+                "agreement_ids": cons.agreement_id,
                 # todo: dterminare cont
                 # 'account_id':cons.partner_id.property_account_receivable.id,
             }
 
-            pre_invoice[cons.date_invoice][key]["agreement_ids"] = cons.agreement_id
-
     def do_billing_step1(self, pre_invoice):
+        rates_cache = {}
+        accounts_cache = {}
+        # consumurile se actualizeaza grupat dupa valorile scrise
+        cons_by_values = defaultdict(list)
         for cons in self.consumption_ids:
-            # convertire pret in moneda companeie
-            date = cons.date_invoice or fields.Date.context_today(self)
-            currency = cons.currency_id.with_context(date=cons.date_invoice or fields.Date.context_today(self))
-            to_currency = self.env.user.company_id.currency_id
-            company = self.env.user.company_id
-            price_unit = currency._convert(cons.price_unit, to_currency, company, date)
+            price_unit = self._convert_price(cons, rates_cache)
             name = cons.product_id.name
 
             if cons.name and (cons.agreement_id.invoice_mode == "detail" or not self.group_service):
@@ -136,18 +149,35 @@ class ServiceBilling(models.TransientModel):
                 key = cons.agreement_line_id.id
 
             if cons.quantity > cons.agreement_line_id.quantity_free or cons.quantity < 0 or cons.with_free_cycle:
-                self.add_invoice_line(cons, pre_invoice, price_unit, name, key)
-                cons.write({"state": "done", "invoiced_qty": cons.quantity - cons.agreement_line_id.quantity_free})
+                self.add_invoice_line(cons, pre_invoice, price_unit, name, key, accounts_cache)
+                cons_by_values[("done", cons.quantity - cons.agreement_line_id.quantity_free)].append(cons.id)
             else:  # cons.quantity < cons.agreement_line_id.quantity_free:
-                cons.write({"state": "none"})
+                cons_by_values[("none", None)].append(cons.id)
+
+        consumption_model = self.env["service.consumption"]
+        for (state, invoiced_qty), cons_ids in cons_by_values.items():
+            values = {"state": state}
+            if invoiced_qty is not None:
+                values["invoiced_qty"] = invoiced_qty
+            consumption_model.browse(cons_ids).write(values)
+
+    @api.model
+    def _check_negative_lines(self, lines):
+        # check if negative values greater than positive ones for the same product
+        plus_qty_by_product = defaultdict(float)
+        for line in lines:
+            if line["quantity"] > 0.0:
+                plus_qty_by_product[line["product_id"]] += line["quantity"]
+        for line in lines:
+            if line["quantity"] < 0:
+                plus_qty = plus_qty_by_product[line["product_id"]]
+                if abs(line["quantity"]) >= plus_qty:
+                    line["quantity"] = -1 * plus_qty
 
     def do_billing(self):
         pre_invoice = {}  # lista de facuri
-        agreements = self.env["service.agreement"]
-
         for cons in self.consumption_ids:
             pre_invoice[cons.date_invoice] = {}
-            agreements |= cons.agreement_id
 
         self.do_billing_step1(pre_invoice)
 
@@ -158,13 +188,13 @@ class ServiceBilling(models.TransientModel):
                 key = cons.partner_id.id
             if pre_invoice[cons.date_invoice].get(key, False):
                 # daca a fost generata o factura atunci leg si consumul de facura pentru a aparea in centralizator
-                pre_invoice[cons.date_invoice][key]["cons"] += cons
+                pre_invoice[cons.date_invoice][key]["cons_ids"].append(cons.id)
 
         if not pre_invoice:
             raise UserError(_("No condition for create a new invoice"))
 
-        service_invoices = self.env["account.move"]
-
+        invoice_values = []
+        invoice_cons_ids = []
         for date_invoice in pre_invoice:
             for key in pre_invoice[date_invoice]:
                 comment = _("According to agreement ")
@@ -178,41 +208,34 @@ class ServiceBilling(models.TransientModel):
                     for agreement in pre_invoice[date_invoice][key]["agreement_ids"]:
                         payment_term_id = agreement.payment_term_id.id or agreement.partner_id.property_payment_term_id
                         user_id = agreement.user_id.id
-                # check if negative values greater than positive ones for the same product
-                for invoice_line in pre_invoice[date_invoice][key]["lines"]:
-                    if invoice_line["quantity"] < 0:
-                        plus_qty = 0.0
-                        for positive_line in pre_invoice[date_invoice][key]["lines"]:
-                            if (
-                                positive_line["product_id"] == invoice_line["product_id"]
-                                and positive_line["quantity"] > 0.0
-                            ):
-                                plus_qty += positive_line["quantity"]
-                        if abs(invoice_line["quantity"]) >= plus_qty:
-                            invoice_line["quantity"] = -1 * plus_qty
-                invoice_value = {
-                    # 'name': _('Invoice'),
-                    "partner_id": pre_invoice[date_invoice][key]["partner_id"],
-                    "journal_id": self.journal_id.id,
-                    "company_id": self.company_id.id,
-                    "invoice_date": date_invoice,
-                    "invoice_payment_term_id": payment_term_id,
-                    # todo: de determinat contul
-                    # 'account_id': pre_invoice[date_invoice][key]['account_id'],
-                    "move_type": "out_invoice",
-                    "state": "draft",
-                    "invoice_line_ids": [(0, 0, x) for x in pre_invoice[date_invoice][key]["lines"]],
-                    "narration": comment,
-                    "invoice_user_id": user_id,
-                    # 'agreement_id':pre_invoice[key]['agreement_id'],
-                }
-                invoice_id = self.env["account.move"].create(invoice_value)
-                # todo: de determinat care e butonul de calcul tva
-                # invoice_id.button_compute(True)
-                pre_invoice[date_invoice][key]["cons"].write({"invoice_id": invoice_id.id})
-                service_invoices |= invoice_id
-
-        agreements.compute_totals()
+                self._check_negative_lines(pre_invoice[date_invoice][key]["lines"])
+                invoice_values.append(
+                    {
+                        # 'name': _('Invoice'),
+                        "partner_id": pre_invoice[date_invoice][key]["partner_id"],
+                        "journal_id": self.journal_id.id,
+                        "company_id": self.company_id.id,
+                        "invoice_date": date_invoice,
+                        "invoice_payment_term_id": payment_term_id,
+                        # todo: de determinat contul
+                        # 'account_id': pre_invoice[date_invoice][key]['account_id'],
+                        "move_type": "out_invoice",
+                        "state": "draft",
+                        "invoice_line_ids": [(0, 0, x) for x in pre_invoice[date_invoice][key]["lines"]],
+                        "narration": comment,
+                        "invoice_user_id": user_id,
+                        # 'agreement_id':pre_invoice[key]['agreement_id'],
+                    }
+                )
+                invoice_cons_ids.append(pre_invoice[date_invoice][key]["cons_ids"])
+
+        # toate facturile se creeaza cu un singur apel
+        service_invoices = self.env["account.move"].create(invoice_values)
+        # todo: de determinat care e butonul de calcul tva
+        # invoice_id.button_compute(True)
+        for invoice, cons_ids in zip(service_invoices, invoice_cons_ids):
+            self.env["service.consumption"].browse(cons_ids).write({"invoice_id": invoice.id})
+
         action = self.env["ir.actions.actions"]._for_xml_id("deltatech_service_agreement.action_service_invoice")
         action["domain"] = [("id", "in", service_invoices.ids)]
         return action
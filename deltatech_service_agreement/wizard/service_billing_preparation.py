@@ -55,7 +55,6 @@ class ServiceBillingPreparation(models.TransientModel):
         consumptions = self.env["service.consumption"]
         for agreement in self.agreement_ids:
             consumptions = agreement.agreement_line.do_billing_preparation(self.service_period_id)
-        self.agreement_ids.compute_totals()
         domain = [
             "|",
             ("id", "in", consumptions.ids),
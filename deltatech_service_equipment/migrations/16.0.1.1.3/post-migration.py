@@ -0,0 +1,30 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+
+def migrate(cr, version):
+    # totalurile sunt actualizate incremental, se initializeaza o singura data
+    cr.execute(
+        """
+        UPDATE service_equipment AS se SET
+            total_revenues = COALESCE(cons.total, 0),
+            total_invoiced = COALESCE(inv.total, 0)
+        FROM service_equipment AS equi
+            LEFT JOIN (
+                SELECT equipment_id, SUM(revenues) AS total FROM service_consumption
+                WHERE state = 'done'
+                GROUP BY equipment_id
+            ) AS cons ON cons.equipment_id = equi.id
+            LEFT JOIN (
+                SELECT sal.equipment_id,
+                    SUM(CASE WHEN am.move_type = 'out_refund' THEN -aml.price_subtotal ELSE aml.price_subtotal END)
+                        AS total
+                FROM account_move_line AS aml
+                    JOIN account_move AS am ON am.id = aml.move_id
+                    JOIN service_agreement_line AS sal ON sal.id = aml.agreement_line_id
+                WHERE am.state = 'posted' AND am.move_type IN ('out_invoice', 'out_refund')
+                GROUP BY sal.equipment_id
+            ) AS inv ON inv.equipment_id = equi.id
+        WHERE se.id = equi.id
+    """
+    )
@@ -2,66 +2,87 @@
 # See README.rst file on addons root folder for license details
 
 
-import base64
-from io import BytesIO
+import os
+import tempfile
+import zipfile
 
 from odoo import _, models
 from odoo.tools.misc import xlsxwriter
 
+# o linie pentru fiecare contor: prima valoare anterioara, ultima valoare citita si data ei
+COUNTER_LINES_QUERY = """
+    SELECT {invoice_column} r.meter_id, r.equipment_id,
+        MIN(r.previous_counter_value) AS value_min,
+        MAX(r.counter_value) AS value_max,
+        (ARRAY_AGG(r.date ORDER BY r.counter_value DESC, r.date DESC))[1] AS date
+    FROM service_meter_reading AS r
+        JOIN service_consumption AS c ON c.id = r.consumption_id
+    WHERE c.invoice_id IN %s
+    GROUP BY {invoice_column} r.meter_id, r.equipment_id
+"""
+
 
 class AccountInvoice(models.Model):
     _inherit = "account.move"
 
+    def _read_counter_lines(self, by_invoice=False):
+        """Counter lines of the invoices read with one aggregated query
+
+        :return: dict {invoice_id: lines} if by_invoice else {False: lines}
+        """
+        res = {}
+        if not self:
+            return res
+        self.env["service.meter.reading"].flush_model(
+            ["meter_id", "equipment_id", "previous_counter_value", "counter_value", "date", "consumption_id"]
+        )
+        self.env["service.consumption"].flush_model(["invoice_id"])
+        invoice_column = "c.invoice_id," if by_invoice else ""
+        self.env.cr.execute(COUNTER_LINES_QUERY.format(invoice_column=invoice_column), (tuple(self.ids),))
+        rows = self.env.cr.fetchall()
+        if not by_invoice:
+            rows = [(False,) + row for row in rows]
+
+        meters = self.env["service.meter"].browse({row[1] for row in rows})
+        equipments = self.env["service.equipment"].browse({row[2] for row in rows})
+        meters.mapped("name")
+        equipments.mapped("display_name")
+        equipments.mapped("address_id.display_name")
+        equipments.mapped("serial_id.name")
+        for invoice_id, meter_id, equipment_id, value_min, value_max, date in rows:
+            meter = self.env["service.meter"].browse(meter_id)
+            equipment = self.env["service.equipment"].browse(equipment_id)
+            res.setdefault(invoice_id, []).append(
+                {
+                    "date": date,
+                    "equipment_id": equipment.display_name,
+                    "min": value_min,
+                    "max": value_max,
+                    "serial_id": equipment.serial_id.name,
+                    "meter_id": meter.name,
+                    "address_id": equipment.address_id.display_name,
+                }
+            )
+        for lines in res.values():
+            lines.sort(key=lambda k: k["address_id"] or "")
+        return res
+
     def get_counter_lines(self):
-        consumptions = self.env["service.consumption"].search([("invoice_id", "in", self.ids)])
-
-        readings = self.env["service.meter.reading"].search([("consumption_id", "in", consumptions.ids)])
-        meters_ids = []  # all meters with readings
-        for reading in readings:
-            if reading.meter_id not in meters_ids:
-                meters_ids += [reading.meter_id]
-        lines = []
-        for meter_id in meters_ids:
-            line = {}
-            line["date"] = "2000-01-01"
-            value_min = 9999999999
-            value_max = 0
-            for reading in readings:
-                if reading.meter_id == meter_id:
-                    if reading.previous_counter_value < value_min:
-                        value_min = reading.previous_counter_value
-                    if reading.counter_value > value_max:
-                        value_max = reading.counter_value
-                        line["date"] = reading.date
-                    line["equipment_id"] = reading.equipment_id.display_name
-                    # line[reading.id] = reading
-                    line["min"] = value_min
-                    line["max"] = value_max
-                    line["serial_id"] = reading.equipment_id.serial_id.name
-                    line["meter_id"] = reading.meter_id.name
-                    line["address_id"] = reading.address_id.display_name
-            lines += [line]
-
-        return sorted(lines, key=lambda k: k["address_id"] or "")
+        return self._read_counter_lines().get(False, [])
 
-    def generate_excel_meters_report(self):
+    def _get_meters_report_name(self):
         self.ensure_one()
-        # filename = 'filename.xls'
-        temp_file = BytesIO()
-        workbook = xlsxwriter.Workbook(temp_file, {"in_memory": True})
+        return "export_contori_%s.xls" % self.name or self.invoice_date
+
+    def _write_meters_report(self, file_path, lines):
+        """Write the meters report of the invoice in file_path; the rows are flushed to disk one by one"""
+        self.ensure_one()
+        workbook = xlsxwriter.Workbook(file_path, {"constant_memory": True})
         worksheet = workbook.add_worksheet("Sheet 1")
 
-        agreements = self.invoice_line_ids.mapped("agreement_id")
-        list_agreements = []
-        for agreement in agreements:
-            list_agreements += [("%s / %s") % (agreement.name, agreement.date_agreement)]
-        agreements_string = ", ".join(agreements.mapped("name"))
-        # write cells
-        # style = xlwt.easyxf('font: bold True, name Arial;')
+        agreements_string = ", ".join(self.invoice_line_ids.mapped("agreement_id.name"))
         style = workbook.add_format({"bold": True, "font_name": "Arial"})
 
-        # date_default_style = workbook.add_format({"num_format": "dd/mm/yy"})
-
         worksheet.write(0, 0, _("Invoice: %s / %s") % (self.name, self.invoice_date), style)
         worksheet.write(1, 0, _("Customer: %s") % self.partner_id.name, style)
         worksheet.write(2, 0, _("Agreement: %s ") % (agreements_string), style)
@@ -75,44 +96,74 @@ class AccountInvoice(models.Model):
         worksheet.write(3, 6, _("Read value"), style)
         worksheet.write(3, 7, _("Difference"), style)
         total_readings = 0
-        lines = self.get_counter_lines()
         crt_row = 4
         for line in lines:
-            date = line["date"]
-            try:
-                worksheet.write(crt_row, 0, date.strftime("%d/%m/%Y"))
-            except Exception:
-                worksheet.write(crt_row, 0, date)
+            worksheet.write(crt_row, 0, line["date"].strftime("%d/%m/%Y") if line["date"] else "")
             worksheet.write(crt_row, 1, line["equipment_id"])
             worksheet.write(crt_row, 2, line["serial_id"])
             worksheet.write(crt_row, 3, line["meter_id"])
             worksheet.write(crt_row, 4, line["address_id"])
-            worksheet.write(crt_row, 5, line["min"])  # "{:,.0f}".format(line["min"]))
-            worksheet.write(crt_row, 6, line["max"])  # "{:,.0f}".format(line["max"]))
-            worksheet.write(crt_row, 7, line["max"] - line["min"])  # "{:,.0f}".format(line["max"] - line["min"]))
+            worksheet.write(crt_row, 5, line["min"])
+            worksheet.write(crt_row, 6, line["max"])
+            worksheet.write(crt_row, 7, line["max"] - line["min"])
             crt_row += 1
             total_readings += int(line["max"]) - int(line["min"])
         crt_row += 1
         worksheet.write(crt_row, 6, "Total: ", style)
-        worksheet.write(crt_row, 7, total_readings, style)  # "{:,.0f}".format(total_readings), style)
-
+        worksheet.write(crt_row, 7, total_readings, style)
         workbook.close()
-        data_file = base64.b64encode(temp_file.getvalue())
-        file_name = "export_contori_%s.xls" % self.name or self.invoice_date
-        # wizard = self.env["wizard.download.file"].create({"data_file": data_file, "file_name": file_name})
-        # return wizard.do_download_file()
-        attachment = self.env["ir.attachment"].create(
-            {
-                "name": file_name,
-                "raw": data_file,
-                "mimetype": "application/xlsx",
-                "res_model": "account.move",
-                "res_id": self.id,
-            }
-        )
+
+    def _create_attachment_from_file(self, file_path, values):
+        """Create an attachment with the content of file_path"""
+        with open(file_path, "rb") as file:
+            return self.env["ir.attachment"].create(dict(values, raw=file.read()))
+
+    def _get_download_action(self, attachment):
         return {
             "type": "ir.actions.act_url",
-            "url": "/web/content?model=%s&download=True&field=datas&id=%s&filename=%s"
-            % ("ir.attachment", attachment.id, file_name),
+            "url": "/web/content/%s?download=true" % attachment.id,
             "target": "new",
         }
+
+    def generate_excel_meters_report(self):
+        self.ensure_one()
+        lines = self.get_counter_lines()
+        file_name = self._get_meters_report_name()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "report.xlsx")
+            self._write_meters_report(file_path, lines)
+            attachment = self._create_attachment_from_file(
+                file_path,
+                {
+                    "name": file_name,
+                    "mimetype": "application/xlsx",
+                    "res_model": "account.move",
+                    "res_id": self.id,
+                },
+            )
+        return self._get_download_action(attachment)
+
+    def generate_excel_meters_report_zip(self):
+        """Meters reports of all the invoices in one zip file"""
+        invoices = self.filtered(lambda m: m.move_type == "out_invoice")
+        lines_by_invoice = invoices._read_counter_lines(by_invoice=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_path = os.path.join(tmp_dir, "export_contori.zip")
+            report_path = os.path.join(tmp_dir, "report.xlsx")
+            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as zip_file:
+                for invoice in invoices:
+                    invoice._write_meters_report(report_path, lines_by_invoice.get(invoice.id, []))
+                    zip_file.write(report_path, invoice._get_meters_report_name().replace("/", "_"))
+            attachment = self._create_attachment_from_file(
+                zip_path, {"name": "export_contori.zip", "mimetype": "application/zip"}
+            )
+        return self._get_download_action(attachment)
+
+
+class AccountInvoiceLine(models.Model):
+    _inherit = "account.move.line"
+
+    def _get_invoiced_targets(self):
+        targets = super()._get_invoiced_targets()
+        targets.append((self.agreement_line_id.equipment_id, "total_invoiced"))
+        return targets
@@ -86,10 +86,10 @@ class ServiceAgreement(models.Model):
             for item in self.agreement_line:
                 if item.equipment_id:
                     equipments |= item.equipment_id
+            equipments._update_readings_status()
             for equipment in equipments:
                 if not equipment.meter_ids:
                     continue
-                equipment._compute_readings_status()
                 if equipment.last_reading < limit_date:
                     self.meter_reading_status = False
                     message = "Device {}/{} (serial:{}): no reads older than 7 days ".format(
@@ -198,3 +198,12 @@ class ServiceConsumption(models.Model):
             "Agreement line in period already exist!",
         ),
     ]
+
+    def _get_revenue_targets(self):
+        targets = super()._get_revenue_targets()
+        targets.append((self.equipment_id, "total_revenues"))
+        return targets
+
+    @api.model
+    def _get_revenue_fields(self):
+        return super()._get_revenue_fields() + ["equipment_id"]
@@ -2,13 +2,46 @@
 # See README.rst file on addons root folder for license details
 
 
-from datetime import date
-
-from dateutil.relativedelta import relativedelta
-
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
 
+# data citirii: ultima zi a lunii anterioare pentru zile negative, ziua din luna pentru zile pozitive
+READINGS_STATUS_QUERY = """
+    WITH meters AS (
+        SELECT e.id, e.reading_day,
+            COALESCE(MAX(r.date), e.last_reading) AS last_reading,
+            COUNT(m.id) AS meter_count,
+            COUNT(r.id) AS read_count,
+            MIN(r.date) AS first_date
+        FROM service_equipment AS e
+            LEFT JOIN service_meter AS m ON m.equipment_id = e.id
+            LEFT JOIN service_meter_reading AS r ON r.id = m.last_meter_reading_id
+        WHERE e.id IN %(ids)s
+        GROUP BY e.id
+    ),
+    base AS (
+        SELECT *, date_trunc('month', GREATEST(%(today)s::date, last_reading))::date AS month_start,
+            GREATEST(%(today)s::date, last_reading) AS base_date
+        FROM meters
+    ),
+    due AS (
+        SELECT *, CASE
+            WHEN reading_day < 0 THEN month_start + reading_day
+            WHEN reading_day > 0 THEN LEAST(
+                month_start + reading_day - 1, (month_start + interval '1 month - 1 day')::date
+            )
+            ELSE base_date
+        END AS due_date
+        FROM base
+    )
+    SELECT id,
+        CASE WHEN meter_count = 0 OR (read_count = meter_count AND first_date >= due_date)
+            THEN 'done' ELSE 'unmade' END AS readings_status,
+        last_reading,
+        CASE WHEN due_date < last_reading THEN (due_date + interval '1 month')::date ELSE due_date END AS next_reading
+    FROM due
+"""
+
 
 class ServiceEquipment(models.Model):
     _inherit = "service.equipment"
@@ -77,6 +110,7 @@ class ServiceEquipment(models.Model):
         compute="_compute_readings_status",
         default="unmade",
         store=True,
+        index=True,
     )
 
     group_id = fields.Many2one("service.agreement.group", string="Service Group")
@@ -111,7 +145,7 @@ class ServiceEquipment(models.Model):
                                      If it's positive, it gives the day of the month. Set 0 for net days .""",
     )
     last_reading = fields.Date("Last Reading Date", readonly=True, default="2000-01-01")
-    next_reading = fields.Date("Next reading date", readonly=True, default="2000-01-01")
+    next_reading = fields.Date("Next reading date", readonly=True, default="2000-01-01", index=True)
     last_reading_value = fields.Float(string="Last reading value")
     installation_date = fields.Date("Installation Date")
 
@@ -132,21 +166,33 @@ class ServiceEquipment(models.Model):
                     equipment.location_id = False
 
     def compute_totals(self):
-        for equipment in self:
-            total_consumption = 0.0
-            total_invoiced = 0.0
-            consumptions = self.env["service.consumption"].search([("equipment_id", "=", equipment.id)])
-            invoices = self.env["account.move"]
-            for consumption in consumptions:
-                if consumption.state == "done":
-                    total_consumption += consumption.revenues
-                    invoices |= consumption.invoice_id
-            for invoice in invoices:
-                if invoice.state == "posted":
-                    for line in invoice.invoice_line_ids:
-                        if line.agreement_line_id.equipment_id == equipment:
-                            total_invoiced += line.price_subtotal
-            equipment.write({"total_invoiced": total_invoiced, "total_revenues": total_consumption})
+        """Full recompute of the totals; the totals are kept up to date incrementally from the
+        consumptions and the posted invoices, this is needed only to fix the existing data"""
+        if not self:
+            return
+        self.env["service.consumption"].flush_model(["equipment_id", "state", "revenues"])
+        self.env["service.agreement.line"].flush_model(["equipment_id"])
+        self.env["account.move.line"].flush_model(["agreement_line_id", "price_subtotal", "move_id"])
+        self.env["account.move"].flush_model(["state", "move_type"])
+        self.env.cr.execute(
+            """
+            UPDATE service_equipment AS se SET
+                total_revenues = COALESCE((
+                    SELECT SUM(sc.revenues) FROM service_consumption AS sc
+                    WHERE sc.equipment_id = se.id AND sc.state = 'done'
+                ), 0),
+                total_invoiced = COALESCE((
+                    SELECT SUM(CASE WHEN am.move_type = 'out_refund' THEN -aml.price_subtotal ELSE aml.price_subtotal END) FROM account_move_line AS aml
+                        JOIN account_move AS am ON am.id = aml.move_id
+                        JOIN service_agreement_line AS sal ON sal.id = aml.agreement_line_id
+                    WHERE sal.equipment_id = se.id AND am.state = 'posted'
+                        AND am.move_type IN ('out_invoice', 'out_refund')
+                ), 0)
+            WHERE se.id IN %s
+            """,
+            (tuple(self.ids),),
+        )
+        self.invalidate_recordset(["total_revenues", "total_invoiced"])
 
     def costs_and_revenues(self):
         self.compute_totals()
@@ -165,34 +211,63 @@ class ServiceEquipment(models.Model):
                 equipment.location_type = "rental"
 
     def _compute_readings_status(self):
+        status = self._get_readings_status()
         for equi in self:
-            if equi.last_reading:
-                next_date = max(date.today(), equi.last_reading)
-            else:
-                next_date = date.today()
-
-            if equi.reading_day < 0:
-                next_first_date = next_date + relativedelta(day=1, months=0)
-                next_date = next_first_date + relativedelta(days=equi.reading_day)
-            if equi.reading_day > 0:
-                next_date += relativedelta(day=equi.reading_day, months=0)
-
-            next_reading_date = next_date
+            if equi.id not in status:
+                equi.readings_status = "unmade"
+                continue
+            readings_status, last_reading, next_reading = status[equi.id]
+            equi.readings_status = readings_status
+            equi.last_reading = last_reading
+            equi.next_reading = next_reading
+
+    def _get_readings_status(self):
+        """Stare citiri pentru toate echipamentele dintr-o singura interogare
+
+        :return: dict {equipment_id: (readings_status, last_reading, next_reading)}
+        """
+        equipments = self.filtered("id")
+        if not equipments:
+            return {}
+        self._flush_readings_status()
+        self.env.cr.execute(
+            READINGS_STATUS_QUERY,
+            {"ids": tuple(equipments.ids), "today": fields.Date.context_today(self)},
+        )
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    def _update_readings_status(self):
+        """Write readings_status, last_reading and next_reading of the equipments with one UPDATE"""
+        if not self:
+            return
+        self.flush_model(["reading_day", "last_reading"])
+        self._flush_readings_status()
+        self.env.cr.execute(
+            """
+            UPDATE service_equipment AS e SET
+                readings_status = status.readings_status,
+                last_reading = status.last_reading,
+                next_reading = status.next_reading
+            FROM ({query}) AS status
+            WHERE e.id = status.id AND (
+                e.readings_status IS DISTINCT FROM status.readings_status OR
+                e.last_reading IS DISTINCT FROM status.last_reading OR
+                e.next_reading IS DISTINCT FROM status.next_reading
+            )
+            """.format(
+                query=READINGS_STATUS_QUERY
+            ),
+            {"ids": tuple(self.ids), "today": fields.Date.context_today(self)},
+        )
+        self.invalidate_recordset(["readings_status", "last_reading", "next_reading"])
 
-            equi.readings_status = "done"
-            for meter in equi.meter_ids:
-                if not meter.last_meter_reading_id:
-                    equi.readings_status = "unmade"
-                    break
-                else:
-                    equi.last_reading = meter.last_meter_reading_id.date
-                if not (meter.last_meter_reading_id.date >= next_reading_date):
-                    equi.readings_status = "unmade"
-                    break
+    def _flush_readings_status(self):
+        self.env["service.meter"].flush_model(["equipment_id", "last_meter_reading_id"])
+        self.env["service.meter.reading"].flush_model(["date"])
 
-            if next_reading_date < equi.last_reading:
-                next_date += relativedelta(months=1)
-            equi.next_reading = next_date
+    @api.model
+    def _cron_update_readings_status(self):
+        self.search([])._update_readings_status()
 
     # def _compute_readings_status(self):
     #     from_date = date.today() + relativedelta(day=1, months=0, days=0)
@@ -234,7 +309,7 @@ class ServiceEquipment(models.Model):
 
     def update_meter_status(self):
         super().update_meter_status()
-        self._compute_readings_status()
+        self._update_readings_status()
 
     # o fi ok sa elimin echipmanetul din contract
     def remove_from_agreement_button(self):
@@ -1,12 +1,20 @@
 # ©  2023 Deltatech
 # See README.rst file on addons root folder for license details
 
+import io
+import zipfile
 
+from odoo import fields
 from odoo.tests import Form
 
 from odoo.addons.deltatech_service_agreement.tests.test_agreement import TestAgreement
 from odoo.addons.deltatech_service_equipment_base.tests.test_service import TestService
 
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
 
 class TestAgreementEquipment(TestAgreement, TestService):
     def setUp(self):
@@ -27,6 +35,10 @@ class TestAgreementEquipment(TestAgreement, TestService):
             }
         )
 
+    def _get_action_attachment(self, action):
+        attachment_id = int(action["url"].split("/web/content/")[1].split("?")[0])
+        return self.env["ir.attachment"].browse(attachment_id)
+
     def test_agreement_with_equipment(self):
         agreement = Form(self.env["service.agreement"])
         agreement.name = "Test Agreement"
@@ -72,7 +84,19 @@ class TestAgreementEquipment(TestAgreement, TestService):
 
         invoices = self.env["account.move"].search(action["domain"])
         invoices.action_post()
-        # invoices.generate_excel_meters_report()
+        action = invoices[0].generate_excel_meters_report()
+        self.assertEqual(action["type"], "ir.actions.act_url")
+        content = self._get_action_attachment(action).raw
+        self.assertTrue(content)
+        if openpyxl:
+            workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+            self.assertEqual(workbook.active.cell(row=1, column=1).value.split(":")[0], "Invoice")
+        action = invoices.generate_excel_meters_report_zip()
+        self.assertEqual(action["type"], "ir.actions.act_url")
+        content = self._get_action_attachment(action).raw
+        self.assertTrue(content)
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            self.assertEqual(len(zip_file.namelist()), len(invoices))
 
         self.equipment.compute_totals()
         self.equipment.invoice_button()
@@ -111,3 +135,25 @@ class TestAgreementEquipment(TestAgreement, TestService):
                 "product_id": product.id,
             }
         )
+
+    def test_readings_status(self):
+        today = fields.Date.context_today(self.equipment)
+        self.equipment.reading_day = 0
+        self.equipment._update_readings_status()
+        self.assertEqual(self.equipment.readings_status, "unmade")
+        self.assertEqual(self.equipment.next_reading, today)
+
+        self.env["service.meter.reading"].create(
+            {
+                "meter_id": self.meter.id,
+                "equipment_id": self.equipment.id,
+                "date": today,
+                "counter_value": 100,
+            }
+        )
+        self.env["service.equipment"]._cron_update_readings_status()
+        self.assertEqual(self.equipment.readings_status, "done")
+        self.assertEqual(self.equipment.last_reading, today)
+
+        status = self.equipment._get_readings_status()
+        self.assertEqual(status[self.equipment.id][0], "done")
@@ -5,11 +5,12 @@
 {
     "name": "Services Equipment Base",
     "summary": "Service Equipment Management",
-    "version": "16.0.1.1.4",
+    "version": "16.0.1.2.1",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
     "category": "Services/Equipment",
     "depends": ["deltatech_service_base", "product"],
+    "external_dependencies": {"python": ["numpy"]},
     "license": "OPL-1",
     "data": [
         "data/data.xml",
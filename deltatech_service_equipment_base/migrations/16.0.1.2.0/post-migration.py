@@ -0,0 +1,10 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    # legaturile dintre citiri se calculeaza o singura data pentru toate contoarele
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["service.meter"].search([]).recheck_value()
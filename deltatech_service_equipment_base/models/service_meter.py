@@ -5,12 +5,51 @@
 import logging
 from datetime import datetime
 
+import numpy as np
+
 from odoo import api, fields, models
 
 _logger = logging.getLogger(__name__)
 
 READING_TYPE_SELECTION = [("inc", "Increase"), ("dec", "Decrease"), ("cng", "Change"), ("src", "Meter")]
 
+MAX_ORDINAL = datetime.max.toordinal()
+
+
+def grouped_linreg(groups, x, y, size, weights=None, robust=False, iterations=10):
+    """Weighted least squares y = a*x + b for every group in one pass
+
+    :param groups: index of the group of each point, in range(size)
+    :param robust: reweight the points with the Tukey bisquare function of the residuals
+    :return: arrays a, b of length size; a = b = 0 for the groups without a solution
+    """
+    base_weights = np.ones_like(x) if weights is None else np.asarray(weights, dtype=float)
+    weights = base_weights
+    for _iteration in range(iterations if robust else 1):
+        sum_w = np.bincount(groups, weights, minlength=size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_x = np.bincount(groups, weights * x, minlength=size) / sum_w
+            mean_y = np.bincount(groups, weights * y, minlength=size) / sum_w
+            dx = x - mean_x[groups]
+            dy = y - mean_y[groups]
+            sxx = np.bincount(groups, weights * dx * dx, minlength=size)
+            sxy = np.bincount(groups, weights * dx * dy, minlength=size)
+            a = np.where(sxx > 0, sxy / sxx, 0.0)
+            b = np.where(sxx > 0, mean_y - a * mean_x, 0.0)
+        if robust:
+            residuals = np.abs(y - a[groups] * x - b[groups])
+            # pragul din deviatia absoluta mediana a fiecarui contor
+            scale = np.zeros(size)
+            order = np.lexsort((residuals, groups))
+            bounds = np.searchsorted(groups[order], np.arange(size + 1))
+            for group in np.flatnonzero(np.diff(bounds)):
+                scale[group] = np.median(residuals[order[bounds[group] : bounds[group + 1]]])
+            threshold = 4.685 * 1.4826 * scale[groups]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                bisquare = np.where(threshold > 0, np.clip(1 - (residuals / threshold) ** 2, 0, None) ** 2, 1.0)
+            weights = base_weights * bisquare
+    return np.nan_to_num(a), np.nan_to_num(b)
+
 
 class ServiceMeter(models.Model):
     _name = "service.meter"
@@ -127,64 +166,102 @@ class ServiceMeter(models.Model):
             meter.total_counter_value = total_counter_value
 
     def _compute_estimated_value(self):
+        date = self.env.context.get("date", fields.Date.today())
+        values = self.get_forcast_multi(date)
         for meter in self:
-            date = self.env.context.get("date", fields.Date.today())
-            meter.estimated_value = meter.get_forcast(date)
-
-    def calc_forecast_coef(self):
-        def linreg(X, Y):
+            meter.estimated_value = values[meter.id]
+
+    def calc_forecast_coef(self, weighted=False, robust=False):
+        """Calculeaza coeficientii dreptei de regresie pentru toate contoarele dintr-o singura trecere
+
+        :param weighted: the recent readings weigh more than the old ones
+        :param robust: the outliers are down-weighted with a few bisquare iterations
+        """
+        if not self:
+            return
+        self.env["service.meter.reading"].flush_model(["meter_id", "date", "counter_value", "estimated"])
+        self.env.cr.execute(
             """
-            return a,b in solution to y = ax + b such that root mean square distance between
-            trend line and original points is minimized
+            SELECT meter_id, date, counter_value FROM service_meter_reading
+            WHERE meter_id IN %s AND estimated IS NOT TRUE
+            """,
+            (tuple(self.ids),),
+        )
+        rows = self.env.cr.fetchall()
+        meter_ids = np.array(self.ids)
+        value_a = np.zeros(len(meter_ids))
+        value_b = np.zeros(len(meter_ids))
+        if rows:
+            readings_meter, readings_date, readings_value = zip(*rows)
+            index = {meter_id: i for i, meter_id in enumerate(self.ids)}
+            groups = np.array([index[meter_id] for meter_id in readings_meter])
+            x = np.array([reading_date.toordinal() for reading_date in readings_date], dtype=float)
+            y = np.array(readings_value, dtype=float)
+            weights = None
+            if weighted:
+                # ponderea scade la jumatate pentru fiecare an vechime fata de ultima citire
+                last = np.full(len(meter_ids), -np.inf)
+                np.maximum.at(last, groups, x)
+                weights = 0.5 ** ((last[groups] - x) / 365.0)
+            value_a, value_b = grouped_linreg(groups, x, y, len(meter_ids), weights=weights, robust=robust)
+
+        self.env.cr.execute(
             """
-            N = len(X)
-            Sx = Sy = Sxx = Syy = Sxy = 0.0
-            for x, y in zip(X, Y):
-                Sx = Sx + x
-                Sy = Sy + y
-                Sxx = Sxx + x * x
-                Syy = Syy + y * y
-                Sxy = Sxy + x * y
-            det = Sxx * N - Sx * Sx
-            if det:
-                a, b = (Sxy * N - Sy * Sx) / det, (Sxx * Sy - Sx * Sxy) / det
-            else:
-                a = b = 0.0
-            return a, b
-
-        for meter in self:
-            x = []
-            y = []
-            for reading in meter.meter_reading_ids:
-                if not reading.estimated:
-                    x += [fields.Date.from_string(reading.date).toordinal()]
-                    y += [reading.counter_value]
+            UPDATE service_meter AS m SET value_a = c.value_a, value_b = c.value_b
+            FROM unnest(%s::int[], %s::float8[], %s::float8[]) AS c(id, value_a, value_b)
+            WHERE m.id = c.id
+            """,
+            (meter_ids.tolist(), value_a.tolist(), value_b.tolist()),
+        )
+        self.invalidate_recordset(["value_a", "value_b"])
 
-            a, b = linreg(x, y)
-            meter.write({"value_a": a, "value_b": b})
-            # _logger.info("Value A: %s, Value B: %s" % (str(a), str(b) ))
+    @api.model
+    def _cron_calc_forecast_coef(self):
+        self.search([("type", "=", "counter")]).calc_forecast_coef()
+
+    def get_forcast_multi(self, date):
+        """Valorile estimate ale contoarelor la data
+
+        :return: dict {meter_id: value}
+        """
+        x = fields.Date.to_date(date).toordinal()
+        value_a = np.array(self.mapped("value_a"), dtype=float)
+        value_b = np.array(self.mapped("value_b"), dtype=float)
+        values = value_a * x + value_b
+        totals = np.array(self.mapped("total_counter_value"), dtype=float)
+        values = np.where(values == 0, totals, values)
+        return dict(zip(self.ids, values.tolist()))
+
+    def get_forcast_date_multi(self, values):
+        """Datele estimate la care contoarele ating valorile
+
+        :param values: one value for all the meters or a list with one value for each meter
+        :return: dict {meter_id: date string or False}
+        """
+        value_a = np.array(self.mapped("value_a"), dtype=float)
+        value_b = np.array(self.mapped("value_b"), dtype=float)
+        values = np.broadcast_to(np.asarray(values, dtype=float), value_a.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = np.where(value_a != 0, (values - value_b) / value_a, np.nan)
+        res = {}
+        for meter_id, ordinal in zip(self.ids, x.tolist()):
+            if np.isfinite(ordinal) and 1 <= ordinal < MAX_ORDINAL:
+                res[meter_id] = fields.Date.to_string(datetime.fromordinal(int(ordinal)))
+            else:
+                res[meter_id] = False
+        return res
 
     @api.model
     def get_forcast(self, date):
         """Calculeaza valoarea estimata in functie de data"""
         self.ensure_one()
-        x = fields.Date.from_string(date).toordinal()
-        res = self.value_a * x + self.value_b
-        if not res:
-            res = self.total_counter_value
-        return res
+        return self.get_forcast_multi(date)[self.id]
 
     @api.model
     def get_forcast_date(self, value):
         """Calculeaza data estimata in functie de valoare"""
         self.ensure_one()
-        if self.value_a:
-            x = (value - self.value_b) / self.value_a
-            date = datetime.fromordinal(int(x))
-            date = fields.Date.to_string(date)
-        else:
-            date = False
-        return date
+        return self.get_forcast_date_multi(value)[self.id]
 
     def get_counter_value(self, begin_date, end_date):
         value = 0
@@ -201,20 +278,13 @@ class ServiceMeter(models.Model):
         return value
 
     def recheck_value(self):
-        for meter in self:
-            readings = meter.meter_reading_ids.sorted(key=lambda r: r.date)
-            previous_counter_value = meter.start_value
-            for reading in readings:
-                # reading.previous_counter_value = previous_counter_value
-                # difference =
-                # reading._store_set_values
-                reading.write(
-                    {
-                        "previous_counter_value": previous_counter_value,
-                        "difference": reading.counter_value - previous_counter_value,
-                    }
-                )
-                previous_counter_value = reading.counter_value
+        self.env["service.meter.reading"]._update_chain({meter.id: False for meter in self})
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "start_value" in vals:
+            self.recheck_value()
+        return res
 
 
 class ServiceMeterReading(models.Model):
@@ -238,18 +308,16 @@ class ServiceMeterReading(models.Model):
     )
 
     date = fields.Date(string="Date", index=True, required=True, default=fields.Date.context_today)
-    previous_counter_value = fields.Float(
-        string="Previous Counter Value",
-        readonly=True,
-        digits="Meter Value",
-        compute="_compute_previous_counter_value",
-        store=True,
+    previous_reading_id = fields.Many2one(
+        "service.meter.reading", string="Previous Reading", readonly=True, index=True, ondelete="set null"
     )
+    next_reading_id = fields.Many2one(
+        "service.meter.reading", string="Next Reading", readonly=True, index=True, ondelete="set null"
+    )
+    previous_counter_value = fields.Float(string="Previous Counter Value", readonly=True, digits="Meter Value")
     counter_value = fields.Float(string="Counter Value", digits="Meter Value", group_operator="max")
     estimated = fields.Boolean(string="Estimated")
-    difference = fields.Float(
-        string="Difference", readonly=True, digits="Meter Value", compute="_compute_difference", store=True
-    )
+    difference = fields.Float(string="Difference", readonly=True, digits="Meter Value")
 
     read_by = fields.Many2one("res.partner", string="Read by", domain=[("is_company", "=", False)])
     note = fields.Text(string="Notes")
@@ -258,45 +326,93 @@ class ServiceMeterReading(models.Model):
 
     # todo: de adaugat status: ciorna, valid, neplauzibil, facturat ?
 
-    @api.depends("date", "meter_id", "equipment_id")
-    def _compute_previous_counter_value(self):
-        for reading in self:
-            reading.previous_counter_value = reading.meter_id.start_value
-            if reading.date and reading.meter_id:
-                previous = self.env["service.meter.reading"].search(
-                    [("meter_id", "=", reading.meter_id.id), ("date", "<", reading.date)],
-                    limit=1,
-                    order="date desc, id desc",
-                )
-                if previous:
-                    reading.previous_counter_value = previous.counter_value
-                    reading.difference = reading.counter_value - reading.previous_counter_value
-                    # self.invalidate_recordset() # asta e solutia ?
-
-    @api.depends("counter_value", "previous_counter_value")
-    def _compute_difference(self):
-        for reading in self:
-            reading.difference = reading.counter_value - reading.previous_counter_value
-            next_reading = self.env["service.meter.reading"].search(
-                [("meter_id", "=", reading.meter_id.id), ("date", ">", reading.date)], limit=1, order="date, id"
+    @api.model
+    def _update_chain(self, date_from_by_meter):
+        """Link the readings of the meters to the previous and next reading in one window-function pass
+        and recompute the previous counter value and the difference.
+
+        :param date_from_by_meter: dict {meter_id: date}, only the readings from this date are recomputed;
+            False recomputes all the readings of the meter
+        """
+        if not date_from_by_meter:
+            return
+        self.flush_model()
+        self.env["service.meter"].flush_model(["start_value"])
+        meter_ids = list(date_from_by_meter.keys())
+        dates = [date_from_by_meter[meter_id] or datetime.min.date() for meter_id in meter_ids]
+        self.env.cr.execute(
+            """
+            WITH todo AS (
+                SELECT t.meter_id, t.date_from,
+                    COALESCE((
+                        SELECT MAX(p.date) FROM service_meter_reading AS p
+                        WHERE p.meter_id = t.meter_id AND p.date < t.date_from
+                    ), t.date_from) AS window_from
+                FROM unnest(%s::int[], %s::date[]) AS t(meter_id, date_from)
+            ),
+            chain AS (
+                SELECT r.id, r.date >= todo.date_from AS in_scope,
+                    LAG(r.id) OVER w AS previous_id,
+                    LEAD(r.id) OVER w AS next_id,
+                    COALESCE(LAG(r.counter_value) OVER w, m.start_value, 0) AS previous_value
+                FROM service_meter_reading AS r
+                    JOIN todo ON todo.meter_id = r.meter_id
+                    JOIN service_meter AS m ON m.id = r.meter_id
+                WHERE r.date >= todo.window_from
+                WINDOW w AS (PARTITION BY r.meter_id ORDER BY r.date, r.id)
             )
-            if next_reading and next_reading.previous_counter_value != reading.counter_value:
-                next_reading.write(
-                    {
-                        "previous_counter_value": reading.counter_value,
-                        "difference": (next_reading.counter_value - reading.counter_value),
-                    }
-                )
+            UPDATE service_meter_reading AS r SET
+                next_reading_id = chain.next_id,
+                previous_reading_id = CASE WHEN chain.in_scope THEN chain.previous_id ELSE r.previous_reading_id END,
+                previous_counter_value = CASE
+                    WHEN chain.in_scope THEN chain.previous_value ELSE r.previous_counter_value END,
+                difference = CASE
+                    WHEN chain.in_scope THEN COALESCE(r.counter_value, 0) - chain.previous_value ELSE r.difference END
+            FROM chain
+            WHERE r.id = chain.id AND (
+                r.next_reading_id IS DISTINCT FROM chain.next_id OR (chain.in_scope AND (
+                    r.previous_reading_id IS DISTINCT FROM chain.previous_id OR
+                    r.previous_counter_value IS DISTINCT FROM chain.previous_value OR
+                    r.difference IS DISTINCT FROM COALESCE(r.counter_value, 0) - chain.previous_value
+                ))
+            )
+            """,
+            (meter_ids, dates),
+        )
+        self.invalidate_model(["previous_reading_id", "next_reading_id", "previous_counter_value", "difference"])
+
+    def _get_chain_dates(self, date_from_by_meter=None):
+        """First date of each meter from which the chain of readings must be recomputed"""
+        date_from_by_meter = date_from_by_meter or {}
+        for reading in self:
+            meter_id = reading.meter_id.id
+            if meter_id not in date_from_by_meter or reading.date < date_from_by_meter[meter_id]:
+                date_from_by_meter[meter_id] = reading.date
+        return date_from_by_meter
 
     @api.onchange("meter_id")
     def onchange_meter_id(self):
         if self.meter_id:
             self.equipment_id = self.meter_id.equipment_id
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        readings = super().create(vals_list)
+        self._update_chain(readings._get_chain_dates())
+        return readings
+
     def write(self, vals):
+        if not {"date", "counter_value", "meter_id"} & set(vals):
+            return super().write(vals)
+        date_from_by_meter = self._get_chain_dates()
         res = super().write(vals)
+        self._update_chain(self._get_chain_dates(date_from_by_meter))
         if vals.get("date", False):
-            for reading in self:
-                reading.meter_id.recheck_value()
-                reading.meter_id.calc_forecast_coef()
+            self.meter_id.calc_forecast_coef()
+        return res
+
+    def unlink(self):
+        date_from_by_meter = self._get_chain_dates()
+        res = super().unlink()
+        self._update_chain(date_from_by_meter)
         return res
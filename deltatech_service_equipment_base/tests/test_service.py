@@ -63,3 +63,93 @@ class TestService(TransactionCase):
         location = Form(self.env["service.location"])
         location.name = "Test Location"
         location = location.save()
+
+    def test_reading_chain(self):
+        equipment = self.env["service.equipment"].create(
+            {"name": "Test Equipment", "type_id": self.equipment_type.id, "model_id": self.equipment_model.id}
+        )
+        meter = self.env["service.meter"].create(
+            {
+                "name": "Test Meter",
+                "meter_categ_id": self.meter_category.id,
+                "uom_id": self.meter_category.uom_id.id,
+                "equipment_id": equipment.id,
+                "start_value": 10,
+            }
+        )
+        reading_1, reading_3 = self.env["service.meter.reading"].create(
+            [
+                {"meter_id": meter.id, "equipment_id": equipment.id, "date": "2020-01-01", "counter_value": 100},
+                {"meter_id": meter.id, "equipment_id": equipment.id, "date": "2020-03-01", "counter_value": 300},
+            ]
+        )
+        self.assertEqual(reading_1.previous_counter_value, 10)
+        self.assertEqual(reading_1.difference, 90)
+        self.assertEqual(reading_1.next_reading_id, reading_3)
+        self.assertEqual(reading_3.previous_reading_id, reading_1)
+        self.assertEqual(reading_3.difference, 200)
+
+        reading_2 = self.env["service.meter.reading"].create(
+            {"meter_id": meter.id, "equipment_id": equipment.id, "date": "2020-02-01", "counter_value": 250}
+        )
+        self.assertEqual(reading_2.previous_reading_id, reading_1)
+        self.assertEqual(reading_2.difference, 150)
+        self.assertEqual(reading_1.next_reading_id, reading_2)
+        self.assertEqual(reading_3.previous_reading_id, reading_2)
+        self.assertEqual(reading_3.difference, 50)
+
+        reading_2.counter_value = 200
+        self.assertEqual(reading_3.previous_counter_value, 200)
+        self.assertEqual(reading_3.difference, 100)
+
+        reading_2.unlink()
+        self.assertEqual(reading_1.next_reading_id, reading_3)
+        self.assertEqual(reading_3.previous_reading_id, reading_1)
+        self.assertEqual(reading_3.difference, 200)
+
+        meter.start_value = 0
+        self.assertEqual(reading_1.difference, 100)
+
+    def test_forecast(self):
+        equipment = self.env["service.equipment"].create(
+            {"name": "Test Equipment", "type_id": self.equipment_type.id, "model_id": self.equipment_model.id}
+        )
+        meter_category_2 = self.env["service.meter.category"].create(
+            {"name": "Test Meter Category 2", "uom_id": self.env.ref("uom.product_uom_dozen").id}
+        )
+        meters = self.env["service.meter"].create(
+            [
+                {
+                    "name": "Meter %s" % meter_categ.name,
+                    "meter_categ_id": meter_categ.id,
+                    "uom_id": meter_categ.uom_id.id,
+                    "equipment_id": equipment.id,
+                }
+                for meter_categ in self.meter_category | meter_category_2
+            ]
+        )
+        meter_1, meter_2 = meters
+        vals_list = []
+        for day, value in [(1, 100), (2, 110), (3, 120), (4, 1000), (5, 140)]:
+            date = "2020-01-0%s" % day
+            vals_list.append(
+                {"meter_id": meter_1.id, "equipment_id": equipment.id, "date": date, "counter_value": value}
+            )
+        vals_list.append(
+            {"meter_id": meter_2.id, "equipment_id": equipment.id, "date": "2020-01-01", "counter_value": 5}
+        )
+        self.env["service.meter.reading"].create(vals_list)
+
+        meters.calc_forecast_coef()
+        self.assertGreater(meter_1.value_a, 10)
+        self.assertEqual(meter_2.value_a, 0)
+
+        meters.calc_forecast_coef(robust=True)
+        self.assertAlmostEqual(meter_1.value_a, 10, places=0)
+
+        forecast = meters.get_forcast_multi("2020-01-06")
+        self.assertAlmostEqual(forecast[meter_1.id], 150, places=0)
+        self.assertEqual(forecast[meter_2.id], meter_2.total_counter_value)
+        self.assertEqual(meter_1.get_forcast("2020-01-06"), forecast[meter_1.id])
+        self.assertEqual(meters.get_forcast_date_multi(150)[meter_2.id], False)
+        self.assertEqual(meter_1.get_forcast_date(meter_1.get_forcast("2020-01-10") + 0.01), "2020-01-10")
@@ -68,9 +68,10 @@ class ServiceEnterReading(models.TransientModel):
 
     def do_enter(self):
         equipments = self.env["service.equipment"]
+        vals_list = []
         for enter_reading in self:
             for item in enter_reading.items:
-                self.env["service.meter.reading"].create(
+                vals_list.append(
                     {
                         "meter_id": item.meter_id.id,
                         "equipment_id": item.meter_id.equipment_id.id,
@@ -79,10 +80,10 @@ class ServiceEnterReading(models.TransientModel):
                         "note": enter_reading.note,
                         "counter_value": item.counter_value,
                         "estimated": item.estimated,
-                        "previous_counter_value": item.prev_value,
                     }
                 )
                 equipments |= item.equipment_id
+        self.env["service.meter.reading"].create(vals_list)
         equipments.update_meter_status()
 
 
@@ -2,10 +2,34 @@
 #              Dorin Hongu <dhongu(@)gmail(.)com
 # See README.rst file on addons root folder for license details
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class ProductTemplate(models.Model):
     _inherit = "product.template"
 
     alternative_code = fields.Char(string="Alternative Code")
+
+
+class ProductProduct(models.Model):
+    _inherit = "product.product"
+
+    @api.model
+    def _get_qty_available_by_location(self, product_ids, location_ids):
+        """Stocul disponibil al produselor in fiecare locatie, cu o interogare grupata pe locatie
+
+        :param location_ids: stock location ids; False gives the stock of all the warehouses, as qty_available
+        :return: dict {location_id: {product_id: quantity}}
+        """
+        res = {}
+        product_ids = list(set(product_ids))
+        for location_id in set(location_ids):
+            res[location_id] = quantities = dict.fromkeys(product_ids, 0.0)
+            if not product_ids:
+                continue
+            products = self.with_context(location=location_id)
+            domain_quant_loc = products._get_domain_locations()[0]
+            domain = [("product_id", "in", product_ids)] + domain_quant_loc
+            for group in self.env["stock.quant"]._read_group(domain, ["product_id", "quantity"], ["product_id"]):
+                quantities[group["product_id"][0]] = group["quantity"]
+        return res
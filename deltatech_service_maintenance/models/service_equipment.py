@@ -3,7 +3,7 @@
 # See README.rst file on addons root folder for license details
 
 
-from odoo import _, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
 
 
@@ -12,6 +12,77 @@ class ServiceEquipment(models.Model):
 
     work_center_id = fields.Many2one("service.work.center", string="Work Center")
 
+    @api.model
+    def _get_code_fields(self):
+        """Fields with codes that identify the equipment in the text of a notification"""
+        code_fields = ["serial_no", "serial_id"]
+        if "ean_code" in self._fields:
+            code_fields.append("ean_code")
+        return code_fields
+
+    @api.model
+    @tools.ormcache()
+    def _get_code_index(self):
+        """Index {code: tuple of equipment ids} with the EAN codes and the serial numbers, built once per
+        process and dropped by _clear_code_index when a code is changed"""
+        columns = ["e.serial_no", "lot.name"]
+        if "ean_code" in self._fields:
+            columns.append("e.ean_code")
+        self.env.cr.execute(
+            """
+            SELECT e.id, {columns} FROM service_equipment AS e
+                LEFT JOIN stock_lot AS lot ON lot.id = e.serial_id
+            """.format(
+                columns=", ".join(columns)
+            )
+        )
+        index = {}
+        for row in self.env.cr.fetchall():
+            for code in set(row[1:]):
+                if code:
+                    index.setdefault(code, []).append(row[0])
+        return {code: tuple(equipment_ids) for code, equipment_ids in index.items()}
+
+    @api.model
+    def _clear_code_index(self):
+        self.clear_caches()
+
+    @api.model
+    def _match_codes(self, text):
+        """Ids of the equipments with a code found between the words of text"""
+        index = self._get_code_index()
+        equipment_ids = set()
+        for word in set(text.split()):
+            equipment_ids.update(index.get(word, ()))
+        return equipment_ids
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        equipments = super().create(vals_list)
+        code_fields = self._get_code_fields()
+        if any(vals.get(field_name) for vals in vals_list for field_name in code_fields):
+            self._clear_code_index()
+        return equipments
+
+    def _read_codes(self, code_fields):
+        return {(equipment.id, field_name): equipment[field_name] for equipment in self for field_name in code_fields}
+
+    def write(self, vals):
+        # indexul codurilor se sterge doar cand un cod se schimba efectiv
+        code_fields = [field_name for field_name in self._get_code_fields() if field_name in vals]
+        before = code_fields and self._read_codes(code_fields)
+        res = super().write(vals)
+        if code_fields and self._read_codes(code_fields) != before:
+            self._clear_code_index()
+        return res
+
+    def unlink(self):
+        with_codes = any(self._read_codes(self._get_code_fields()).values())
+        res = super().unlink()
+        if with_codes:
+            self._clear_code_index()
+        return res
+
     def get_context_default(self):
         context = {
             "default_equipment_id": self.id,
@@ -168,50 +168,62 @@ class ServiceNotification(models.Model):
             self.onchange_equipment_id()
 
     @api.model
-    def create(self, vals):
-        if "company_id" in vals:
-            self = self.with_company(vals["company_id"])
-
-        equipment_id = vals.get("equipment_id", False)
-
-        if not equipment_id:
-            equipments = self.env["service.equipment"]
-            contact_id = vals.get("contact_id", False)
-            if contact_id:
-                equipments = self.env["service.equipment"].search([("contact_id", "=", contact_id)])
-
+    def _match_equipments(self, vals_list):
+        """Identifica echipamentele pentru toate sesizarile: dupa contact si dupa codurile din descriere"""
+        todo = [vals for vals in vals_list if not vals.get("equipment_id", False)]
+        if not todo:
+            return
+        equipment_model = self.env["service.equipment"]
+        by_contact = {}
+        contact_ids = {vals["contact_id"] for vals in todo if vals.get("contact_id", False)}
+        if contact_ids:
+            for equipment in equipment_model.search_read([("contact_id", "in", list(contact_ids))], ["contact_id"]):
+                by_contact.setdefault(equipment["contact_id"][0], set()).add(equipment["id"])
+
+        candidates = []
+        for vals in todo:
+            equipment_ids = set(by_contact.get(vals.get("contact_id", False), ()))
             description = vals.get("description", False)
-
-            if description and (len(equipments) != 1):
-                keywords = description.split()
-                equipments_by_ean = self.env["service.equipment"]
-                for keyword in keywords:
-                    equipments_by_ean |= self.env["service.equipment"].search([("ean_code", "=", keyword)])
-
-                if len(equipments) == 0:
-                    equipments = equipments_by_ean
+            if description and len(equipment_ids) != 1:
+                equipment_ids_by_code = equipment_model._match_codes(description)
+                if not equipment_ids:
+                    equipment_ids = equipment_ids_by_code
                 else:
-                    equipments &= equipments_by_ean
-
-            if len(equipments) == 1:
-                vals["equipment_id"] = equipments.id
-                # if not vals.get("address_id", False):
-                #     vals["address_id"] = equipments.address_id.id
-                if not vals.get("user_id", False):
-                    vals["user_id"] = equipments.technician_user_id.id
-
-                if not vals.get("partner_id", False):
-                    vals["partner_id"] = equipments.agreement_id.partner_id.id
-
-        if vals.get("name", _("New")) == _("New"):
-            seq_date = None
-            if "date" in vals:
-                seq_date = fields.Datetime.context_timestamp(self, fields.Datetime.to_datetime(vals["date"]))
-            vals["name"] = self.env["ir.sequence"].next_by_code("service.notification", sequence_date=seq_date) or _(
-                "New"
-            )
-
-        return super().create(vals)
+                    equipment_ids &= equipment_ids_by_code
+            candidates.append(equipment_ids)
+
+        # indexul nu tine cont de reguli de acces, se verifica echipamentele gasite
+        single_ids = {next(iter(equipment_ids)) for equipment_ids in candidates if len(equipment_ids) == 1}
+        allowed = equipment_model.search([("id", "in", list(single_ids))]) if single_ids else equipment_model
+        for vals, equipment_ids in zip(todo, candidates):
+            if len(equipment_ids) != 1:
+                continue
+            equipment = equipment_model.browse(equipment_ids.pop())
+            if equipment not in allowed:
+                continue
+            vals["equipment_id"] = equipment.id
+            # if not vals.get("address_id", False):
+            #     vals["address_id"] = equipment.address_id.id
+            if not vals.get("user_id", False):
+                vals["user_id"] = equipment.technician_user_id.id
+
+            if not vals.get("partner_id", False):
+                vals["partner_id"] = equipment.agreement_id.partner_id.id
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._match_equipments(vals_list)
+        for vals in vals_list:
+            if vals.get("name", _("New")) == _("New"):
+                notification = self.with_company(vals["company_id"]) if "company_id" in vals else self
+                seq_date = None
+                if "date" in vals:
+                    seq_date = fields.Datetime.context_timestamp(self, fields.Datetime.to_datetime(vals["date"]))
+                vals["name"] = notification.env["ir.sequence"].next_by_code(
+                    "service.notification", sequence_date=seq_date
+                ) or _("New")
+
+        return super().create(vals_list)
 
     def write(self, vals):
         if "user_id" in vals:
@@ -629,17 +641,16 @@ class ServiceNotificationItem(models.Model):
 
     @api.depends("product_id", "quantity")
     def _compute_stock_issue(self):
-        for line in self:
-            location = line.notification_id.location_id
-            line.stock_location_issue = False
-            line.stock_issue = False
-            if line.product_id:
-                qty_available = line.product_id.with_context(location=location.id).qty_available
-                if qty_available < line.quantity:
-                    line.stock_location_issue = True
-                qty_available = line.product_id.qty_available
-                if qty_available < line.quantity:
-                    line.stock_issue = True
+        lines = self.filtered("product_id")
+        (self - lines).update({"stock_location_issue": False, "stock_issue": False})
+        locations = {line: line.notification_id.location_id.id for line in lines}
+        available = self.env["product.product"]._get_qty_available_by_location(
+            lines.product_id.ids, list(locations.values()) + [False]
+        )
+        for line in lines:
+            product_id = line.product_id.id
+            line.stock_location_issue = available[locations[line]][product_id] < line.quantity
+            line.stock_issue = available[False][product_id] < line.quantity
 
     @api.onchange("product_id")
     def onchange_product_id(self):
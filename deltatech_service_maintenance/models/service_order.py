@@ -152,12 +152,15 @@ class ServiceOrder(models.Model):
                 notification.location_id = notification.work_center_id.location_id
 
     def _compute_available_state(self):
+        available = self.env["product.product"]._get_qty_available_by_location(
+            self.component_ids.product_id.ids, [order.work_center_id.location_id.id for order in self]
+        )
         for order in self:
             available_state = "available"
-            location = order.work_center_id.location_id
+            quantities = available[order.work_center_id.location_id.id]
             qty = 0
             for component in order.component_ids:
-                qty_available = component.product_id.with_context(location=location.id).qty_available
+                qty_available = quantities.get(component.product_id.id, 0.0)
                 qty += qty_available
                 if qty_available < component.quantity:
                     available_state = "partially"
@@ -470,17 +473,16 @@ class ServiceOrderComponent(models.Model):
 
     @api.depends("product_id", "quantity")
     def _compute_stock_issue(self):
-        for line in self:
-            location = line.order_id.location_id
-            line.stock_location_issue = False
-            line.stock_issue = False
-            if line.product_id:
-                qty_available = line.product_id.with_context(location=location.id).qty_available
-                if qty_available < line.quantity:
-                    line.stock_location_issue = True
-                qty_available = line.product_id.qty_available
-                if qty_available < line.quantity:
-                    line.stock_issue = True
+        lines = self.filtered("product_id")
+        (self - lines).update({"stock_location_issue": False, "stock_issue": False})
+        locations = {line: line.order_id.location_id.id for line in lines}
+        available = self.env["product.product"]._get_qty_available_by_location(
+            lines.product_id.ids, list(locations.values()) + [False]
+        )
+        for line in lines:
+            product_id = line.product_id.id
+            line.stock_location_issue = available[locations[line]][product_id] < line.quantity
+            line.stock_issue = available[False][product_id] < line.quantity
 
     @api.onchange("product_id")
     def onchange_product_id(self):
@@ -94,3 +94,9 @@ class StockLot(models.Model):
                 }
                 return action
         raise UserError(_("No warranties for this serial!"))
+
+    def write(self, vals):
+        res = super().write(vals)
+        if "name" in vals:
+            self.env["service.equipment"]._clear_code_index()
+        return res
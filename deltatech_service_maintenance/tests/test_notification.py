@@ -64,3 +64,65 @@ class TestServiceNotification(TestServiceBase):
         notification.set_in_progress()
         notification.new_delivery_button()
         notification.request_approval()
+
+    def test_match_equipment_by_serial(self):
+        self.equipment.serial_no = "SN-0001"
+        other_equipment = self.env["service.equipment"].create({"name": "Other Equipment", "serial_no": "SN-0002"})
+        notifications = self.env["service.notification"].create(
+            [
+                {"description": "Printer SN-0001 does not print"},
+                {"description": "Paper jam on SN-0002"},
+                {"description": "Nothing to match"},
+            ]
+        )
+        self.assertEqual(notifications[0].equipment_id, self.equipment)
+        self.assertEqual(notifications[1].equipment_id, other_equipment)
+        self.assertFalse(notifications[2].equipment_id)
+
+        other_equipment.serial_no = "SN-0003"
+        notification = self.env["service.notification"].create({"description": "Paper jam on SN-0003"})
+        self.assertEqual(notification.equipment_id, other_equipment)
+
+    def test_code_index_clear(self):
+        cleared = []
+        equipment_class = type(self.env["service.equipment"])
+        self.patch(equipment_class, "_clear_code_index", lambda model: cleared.append(True))
+
+        # indexul se sterge doar cand se schimba un cod
+        equipment = self.env["service.equipment"].create({"name": "No code"})
+        equipment.write({"name": "Still no code", "serial_no": False})
+        equipment.unlink()
+        self.assertFalse(cleared)
+
+        equipment = self.env["service.equipment"].create({"name": "With code", "serial_no": "SN-0010"})
+        self.assertEqual(len(cleared), 1)
+        equipment.serial_no = "SN-0010"
+        self.assertEqual(len(cleared), 1)
+        equipment.serial_no = "SN-0011"
+        self.assertEqual(len(cleared), 2)
+        equipment.unlink()
+        self.assertEqual(len(cleared), 3)
+
+    def test_stock_issue(self):
+        stock_location = self.env.ref("stock.stock_location_stock")
+        self.work_center.location_id = stock_location
+        self.env["stock.quant"]._update_available_quantity(self.product, stock_location, 5)
+        product_2 = self.product.copy()
+        notification = self.env["service.notification"].create(
+            {
+                "partner_id": self.partner.id,
+                "work_center_id": self.work_center.id,
+                "item_ids": [
+                    (0, 0, {"product_id": self.product.id, "quantity": 3}),
+                    (0, 0, {"product_id": self.product.id, "quantity": 10}),
+                    (0, 0, {"product_id": product_2.id, "quantity": 1}),
+                ],
+            }
+        )
+        line_ok, line_big, line_missing = notification.item_ids
+        self.assertFalse(line_ok.stock_location_issue)
+        self.assertFalse(line_ok.stock_issue)
+        self.assertTrue(line_big.stock_location_issue)
+        self.assertTrue(line_big.stock_issue)
+        self.assertTrue(line_missing.stock_location_issue)
+        self.assertTrue(line_missing.stock_issue)
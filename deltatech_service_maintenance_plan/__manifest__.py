@@ -5,7 +5,7 @@
 {
     "name": "Deltatech Services Maintenance Plan",
     "summary": "Services Maintenance Plan",
-    "version": "16.0.1.0.6",
+    "version": "16.0.1.1.0",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
     "category": "Services/Maintenance",
@@ -14,6 +14,7 @@
         "deltatech_service_maintenance",
         "deltatech_service_equipment_base",
     ],
+    "external_dependencies": {"python": ["numpy"]},
     "license": "OPL-1",
     "data": [
         "security/service_security.xml",
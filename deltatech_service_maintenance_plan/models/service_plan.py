@@ -3,10 +3,17 @@
 # See README.rst file on addons root folder for license details
 
 
-from datetime import datetime, timedelta
+import threading
+from datetime import date, timedelta
+
+import numpy as np
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools import float_round, split_every
+
+# limita de apeluri generate pentru un plan la o reprogramare
+MAX_CALLS = 1000
 
 
 class ServicePlan(models.Model):
@@ -88,13 +95,28 @@ class ServicePlan(models.Model):
     last_call_id = fields.Many2one("service.plan.call", string="Last Call", readonly=True, compute="_compute_last_call")
 
     def _compute_last_call(self):
+        last_calls = self._get_last_calls()
         for plan in self:
-            domain = [("plan_id", "=", plan.id), ("state", "in", ["called", "skipped", "completion"])]
-            call = self.env["service.plan.call"].search(domain, order="plan_date DESC", limit=1)
-            if call:
-                plan.last_call_id = call
-            else:
-                plan.last_call_id = False
+            plan.last_call_id = last_calls.get(plan.id, False)
+
+    def _get_last_calls(self):
+        """Ultimul apel executat sau sarit al fiecarui plan
+
+        :return: dict {plan_id: call}
+        """
+        if not self.ids:
+            return {}
+        self.env["service.plan.call"].flush_model(["plan_id", "state", "plan_date"])
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT ON (plan_id) plan_id, id FROM service_plan_call
+            WHERE plan_id IN %s AND state IN ('called', 'skipped', 'completion')
+            ORDER BY plan_id, plan_date DESC, id DESC
+            """,
+            (tuple(self.ids),),
+        )
+        calls = self.env["service.plan.call"]
+        return {plan_id: calls.browse(call_id) for plan_id, call_id in self.env.cr.fetchall()}
 
     @api.model
     def create(self, vals):
@@ -131,79 +153,114 @@ class ServicePlan(models.Model):
         """
         Face urmatorul apel din lista
         """
-        for plan in self:
-            for call in plan.call_ids:
-                if call.state == "called":
-                    return call
-                if call.state == "draft":
-                    call.action_call()
-                    return call
-        return False
+        calls = self.env["service.plan.call"].search(
+            [("plan_id", "in", self.ids), ("state", "in", ["called", "draft"])], order="plan_id, plan_date, id"
+        )
+        next_calls = self.env["service.plan.call"]
+        done_plans = set()
+        for call in calls:
+            if call.plan_id.id in done_plans:
+                continue
+            done_plans.add(call.plan_id.id)
+            if call.state == "draft":
+                call.action_call()
+            next_calls |= call
+        return next_calls or False
+
+    def _get_schedule(self, last_call, end_date):
+        """Apelurile care trebuie sa existe in starea ciorna pana la end_date
+
+        :return: list of (sequence, call_date, plan_date, plan_counter)
+        """
+        self.ensure_one()
+        if last_call:
+            start_date = last_call.completion_date or last_call.plan_date
+            plan_counter = last_call.completion_counter or last_call.plan_counter
+            sequence = last_call.sequence
+        else:
+            plan_counter = self.start_counter
+            sequence = 1
+            start_date = self.start_date
+        sequence += 1
+
+        schedule = []
+        if not self.cycle_id.value:
+            return schedule
+        if self.unit == "counter":
+            value_a, value_b = self.meter_id.value_a, self.meter_id.value_b
+            if value_a <= 0:
+                return schedule
+            # toate contoarele pana la sfarsitul perioadei si datele estimate pentru ele, dintr-o data
+            end_ordinal = end_date.toordinal()
+            steps = int(np.ceil((value_a * end_ordinal + value_b - plan_counter) / self.cycle_id.value)) + 1
+            steps = min(max(steps, 0), MAX_CALLS)
+            counters = plan_counter + self.cycle_id.value * np.arange(1, steps + 1)
+            ordinals = np.floor((counters - value_b) / value_a)
+            valid = (ordinals >= 1) & (ordinals < end_ordinal)
+            for counter, ordinal in zip(counters[valid].tolist(), ordinals[valid].tolist()):
+                next_date = date.fromordinal(int(ordinal))
+                schedule.append((sequence, next_date - timedelta(days=self.horizon), next_date, counter))
+                sequence += 1
+        else:
+            cycle = self.cycle_id.get_cycle()
+            next_date = start_date + cycle
+            while next_date < end_date and len(schedule) < MAX_CALLS:
+                schedule.append((sequence, next_date - timedelta(days=self.horizon), next_date, plan_counter))
+                next_date = next_date + cycle
+                sequence += 1
+        return schedule
 
     def rescheduling(self):
-        # determin data de starsit de planificare
-
-        # TODO: de facut transformarea in zile a intervalului acum se presupune ca intervalul este in zile
-
-        for plan in self:
-            if plan.state != "active":
-                return False
-
-            end_date = datetime.today() + timedelta(days=plan.period)  # de ce rezulta datetime ?
-            end_date = end_date.date()
-            call = plan.last_call_id
-
-            if call:
-                if call.completion_date:
-                    start_date = fields.Date.from_string(call.completion_date)
-                else:
-                    start_date = fields.Date.from_string(call.plan_date)
-                if call.completion_counter:
-                    plan_counter = call.completion_counter
-                else:
-                    plan_counter = call.plan_counter
-
-                sequence = call.sequence
-            else:
-                plan_counter = plan.start_counter
-                sequence = 1
-                start_date = fields.Date.from_string(plan.start_date)
-
-            if plan.unit == "counter":
-                plan_counter = plan_counter + plan.cycle_id.value
-                next_date = fields.Date.from_string(plan.meter_id.get_forcast_date(plan_counter))
-            else:
-                next_date = start_date + plan.cycle_id.get_cycle()
-
-            call_ids = self.env["service.plan.call"].search([("plan_id", "=", plan.id), ("state", "=", "draft")])
-
-            call_ids.unlink()
-
-            sequence = sequence + 1
-
-            while next_date < end_date:
-                call_date = next_date - timedelta(days=plan.horizon)
-                self.env["service.plan.call"].create(
-                    {
-                        "plan_id": plan.id,
-                        "sequence": sequence,
-                        "call_date": fields.Date.to_string(call_date),
-                        "plan_date": fields.Date.to_string(next_date),
-                        "plan_counter": plan_counter,
-                    }
-                )
-                if plan.unit == "counter":
-                    plan_counter = plan_counter + plan.cycle_id.value
-                    next_date = fields.Date.from_string(plan.meter_id.get_forcast_date(plan_counter))
-                else:
-                    next_date = next_date + plan.cycle_id.get_cycle()
-
-                sequence = sequence + 1
-
-            plan.call_next()
-
+        """Recalculeaza apelurile ciorna: se pastreaza cele valabile, se sterg si se creeaza doar diferentele"""
+        plans = self.filtered(lambda p: p.state == "active")
+        if not plans:
+            return False
+
+        today = fields.Date.context_today(self)
+        last_calls = plans._get_last_calls()
+        draft_calls = self.env["service.plan.call"].search([("plan_id", "in", plans.ids), ("state", "=", "draft")])
+        drafts_by_plan = {}
+        for call in draft_calls:
+            key = (call.sequence, call.call_date, call.plan_date, float_round(call.plan_counter, 2))
+            drafts_by_plan.setdefault(call.plan_id.id, {})[key] = call
+
+        to_unlink = self.env["service.plan.call"]
+        vals_list = []
+        for plan in plans:
+            end_date = today + timedelta(days=plan.period)
+            existing = drafts_by_plan.get(plan.id, {})
+            for sequence, call_date, plan_date, plan_counter in plan._get_schedule(last_calls.get(plan.id), end_date):
+                key = (sequence, call_date, plan_date, float_round(plan_counter, 2))
+                if existing.pop(key, None) is None:
+                    vals_list.append(
+                        {
+                            "plan_id": plan.id,
+                            "sequence": sequence,
+                            "call_date": call_date,
+                            "plan_date": plan_date,
+                            "plan_counter": plan_counter,
+                        }
+                    )
+            for call in existing.values():
+                to_unlink |= call
+
+        to_unlink.unlink()
+        self.env["service.plan.call"].create(vals_list)
+        plans.call_next()
         return True
 
+    @api.model
+    def _cron_rescheduling(self, batch_size=200):
+        """Reprogramarea tuturor planurilor active, pe bucati"""
+        auto_commit = not getattr(threading.current_thread(), "testing", False) and not self.env.registry.in_test_mode()
+        plan_ids = self.search([("state", "=", "active")]).ids
+        for ids in split_every(batch_size, plan_ids):
+            plans = self.browse(ids)
+            plans.rescheduling()
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+            self.env.invalidate_all()
+
 
 class ServicePlanCall(models.Model):
     _name = "service.plan.call"
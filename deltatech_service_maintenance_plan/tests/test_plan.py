@@ -74,3 +74,34 @@ class TestPlan(TransactionCase):
 
         self.last_call_done = plan.equipment_id.last_call_done
         self.last_call_done = plan.service_location_id.last_call_done
+
+    def test_rescheduling_incremental(self):
+        plan = self.env["service.plan"].create(
+            {
+                "cycle_id": self.cycle.id,
+                "work_center_id": self.work_center.id,
+                "order_type_id": self.order_type.id,
+                "equipment_id": self.equipment.id,
+                "service_location_id": self.location.id,
+                "period": 365,
+            }
+        )
+        plan.action_start()
+        drafts = plan.call_ids.filtered(lambda c: c.state == "draft")
+        self.assertTrue(drafts)
+        self.assertEqual(len(plan.call_ids.filtered(lambda c: c.state == "called")), 1)
+
+        plan.rescheduling()
+        plan.invalidate_recordset(["call_ids"])
+        self.assertEqual(plan.call_ids.filtered(lambda c: c.state == "draft"), drafts)
+
+        plan.period = 730
+        plan.rescheduling()
+        plan.invalidate_recordset(["call_ids"])
+        new_drafts = plan.call_ids.filtered(lambda c: c.state == "draft")
+        self.assertGreater(len(new_drafts), len(drafts))
+        self.assertFalse(drafts - new_drafts)
+
+        self.env["service.plan"]._cron_rescheduling()
+        plan.invalidate_recordset(["call_ids"])
+        self.assertEqual(plan.call_ids.filtered(lambda c: c.state == "draft"), new_drafts)
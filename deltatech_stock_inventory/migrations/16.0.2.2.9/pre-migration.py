@@ -0,0 +1,36 @@
+# ©  2008-2021 Deltatech
+# See README.rst file on addons root folder for license details
+
+
+def migrate(cr, version):
+    # difference_qty and outdated are now stored; fill them here to avoid the recompute line by line,
+    # with the same rounding and states as _compute_difference and _compute_outdated
+    cr.execute(
+        """
+        ALTER TABLE stock_inventory_line ADD COLUMN IF NOT EXISTS difference_qty NUMERIC;
+        ALTER TABLE stock_inventory_line ADD COLUMN IF NOT EXISTS outdated BOOLEAN;
+
+        WITH line_rounding AS (
+            SELECT l.id, COALESCE(u.rounding, 0.01)::numeric AS rounding
+              FROM stock_inventory_line l
+                   LEFT JOIN uom_uom u ON u.id = l.product_uom_id
+        )
+        UPDATE stock_inventory_line l
+           SET difference_qty = ROUND((COALESCE(l.product_qty, 0) - COALESCE(l.theoretical_qty, 0))::numeric / r.rounding)
+                   * r.rounding,
+               outdated = COALESCE(l.state, '') != 'done' AND ABS(
+                   COALESCE(
+                       (SELECT SUM(q.quantity)
+                          FROM stock_quant q
+                         WHERE q.product_id = l.product_id
+                           AND q.location_id = l.location_id
+                           AND q.lot_id IS NOT DISTINCT FROM l.prod_lot_id
+                           AND q.package_id IS NOT DISTINCT FROM l.package_id
+                           AND q.owner_id IS NOT DISTINCT FROM l.partner_id),
+                       0
+                   ) - COALESCE(l.theoretical_qty, 0)
+               ) >= r.rounding / 2
+          FROM line_rounding r
+         WHERE r.id = l.id;
+    """
+    )
@@ -1,9 +1,11 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+from collections import defaultdict
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
 from odoo.osv import expression
-from odoo.tools import float_compare, float_is_zero
+from odoo.tools import float_compare, float_is_zero, float_round
 from odoo.tools.misc import OrderedSet
 
 from odoo.addons.base.models.ir_model import MODULE_UNINSTALL_FLAG
@@ -229,26 +231,40 @@ class Inventory(models.Model):
             inventory.write(vals)
 
             # completare qunaturi
-            for line in inventory.line_ids:
-                quants = line.get_quants()
-                if not quants:
-                    quants = self.env["stock.quant"].create(
-                        {
-                            "product_id": line.product_id.id,
-                            "lot_id": line.prod_lot_id.id,
-                            "owner_id": line.partner_id.id,
-                            "location_id": line.location_id.id,
-                            "package_id": line.package_id.id,
-                        }
-                    )
-                for quant in quants:
-                    quants.write(
-                        {
-                            "inventory_quantity": quant.quantity,
-                            "inventory_date": vals["date"],
-                            "user_id": self.env.user.id,
-                        }
-                    )
+            inventory._prepare_inventory_quants()
+
+    def _prepare_inventory_quants(self):
+        """Resolve the quants of all inventory lines, create the missing ones in a single batch
+        and prefill the counted quantity with the quantity on hand.
+        """
+        self.ensure_one()
+        if not self.line_ids:
+            return
+        if not self.env.user.has_group("deltatech_stock_inventory.group_view_inventory_button"):
+            raise UserError(_("Your user cannot update product quantities"))
+
+        quant_model = self.env["stock.quant"]
+        quant_ids = self.line_ids.get_quants(create=True).ids
+        if not quant_ids:
+            return
+
+        quant_model.flush_model()
+        self.env.cr.execute(
+            """
+            UPDATE stock_quant
+               SET inventory_quantity = quantity,
+                   inventory_diff_quantity = 0,
+                   inventory_date = %s,
+                   user_id = %s,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+             WHERE id IN %s
+            """,
+            (self.date.date(), self.env.uid, self.env.uid, tuple(quant_ids)),
+        )
+        quant_model.invalidate_model(
+            ["inventory_quantity", "inventory_diff_quantity", "inventory_date", "user_id", "write_uid", "write_date"]
+        )
 
     def action_open_inventory_lines(self):
         self.ensure_one()
@@ -489,7 +505,7 @@ class InventoryLine(models.Model):
     company_id = fields.Many2one(
         "res.company", "Company", related="inventory_id.company_id", index=True, readonly=True, store=True
     )
-    state = fields.Selection(string="Status", related="inventory_id.state", store=True)
+    state = fields.Selection(string="Status", related="inventory_id.state", store=True, index=True)
     theoretical_qty = fields.Float("Theoretical Quantity", digits="Product Unit of Measure", readonly=True)
     difference_qty = fields.Float(
         "Difference",
@@ -497,7 +513,8 @@ class InventoryLine(models.Model):
         help="Indicates the gap between the product's theoretical quantity and its newest quantity.",
         readonly=True,
         digits="Product Unit of Measure",
-        search="_search_difference_qty",
+        store=True,
+        index=True,
     )
     inventory_date = fields.Datetime(
         "Inventory Date",
@@ -505,27 +522,27 @@ class InventoryLine(models.Model):
         default=fields.Datetime.now,
         help="Last date at which the On Hand Quantity has been computed.",
     )
-    outdated = fields.Boolean(string="Quantity outdated", compute="_compute_outdated", search="_search_outdated")
+    outdated = fields.Boolean(string="Quantity outdated", compute="_compute_outdated", store=True, index=True)
     product_tracking = fields.Selection(string="Tracking", related="product_id.tracking", readonly=True)
     quant_id = fields.Many2one("stock.quant")
 
-    @api.depends("product_qty", "theoretical_qty")
+    @api.depends("product_qty", "theoretical_qty", "product_uom_id.rounding")
     def _compute_difference(self):
         for line in self:
-            line.difference_qty = line.product_qty - line.theoretical_qty
+            line.difference_qty = float_round(
+                line.product_qty - line.theoretical_qty, precision_rounding=line.product_uom_id.rounding or 0.01
+            )
 
-    @api.depends("inventory_date", "product_id.stock_move_ids", "theoretical_qty", "product_uom_id.rounding")
+    @api.depends("inventory_date", "theoretical_qty", "product_uom_id.rounding", "state")
     def _compute_outdated(self):
-        quants_by_inventory = {inventory: inventory._get_quantities() for inventory in self.inventory_id}
+        # the quantity on hand is not a dependency: the quants mark the lines to recompute,
+        # see stock.quant._recompute_inventory_lines_outdated
+        quants_by_line = self.filtered(lambda l: l.id and l.state != "done")._get_quants_by_line()
         for line in self:
-            quants = quants_by_inventory[line.inventory_id]
-            if line.state == "done" or not line.id:
+            if line not in quants_by_line:
                 line.outdated = False
                 continue
-            qty = quants.get(
-                (line.product_id.id, line.location_id.id, line.prod_lot_id.id, line.package_id.id, line.partner_id.id),
-                0,
-            )
+            qty = sum(quants_by_line[line].mapped("quantity"))
             if float_compare(qty, line.theoretical_qty, precision_rounding=line.product_uom_id.rounding) != 0:
                 line.outdated = True
             else:
@@ -601,8 +618,9 @@ class InventoryLine(models.Model):
     def write(self, vals):
         res = super().write(vals)
         if "product_qty" in vals:
+            quants_by_line = self._get_quants_by_line()
             for line in self:
-                quants = line.get_quants()
+                quants = quants_by_line[line]
                 if len(quants) == 1:
                     if quants.inventory_quantity != line.product_qty:
                         quants.write({"inventory_quantity": line.product_qty})
@@ -695,6 +713,17 @@ class InventoryLine(models.Model):
             ],
         }
 
+    def _get_quant_key(self):
+        """Key used to match the line with its quants: (product, location, lot, package, owner)"""
+        self.ensure_one()
+        return (
+            self.product_id.id,
+            self.location_id.id,
+            self.prod_lot_id.id or False,
+            self.package_id.id or False,
+            self.partner_id.id or False,
+        )
+
     def _get_virtual_location(self):
         return self.product_id.with_company(self.company_id).property_stock_inventory
 
@@ -712,42 +741,77 @@ class InventoryLine(models.Model):
             vals_list.append(vals)
         return self.env["stock.move"].create(vals_list)
 
+    def _get_quants_by_line(self):
+        """Resolve the quants of all the lines with a single query.
+
+        :return: a dict with the line as key and its quants (strict gather) as value
+        :rtype: dict
+        """
+        quant_model = self.env["stock.quant"]
+        ids_by_key = defaultdict(list)
+        if self:
+            domain = [("product_id", "in", self.product_id.ids), ("location_id", "in", self.location_id.ids)]
+            fields = ["product_id", "location_id", "lot_id", "package_id", "owner_id"]
+            for quant in quant_model.search_read(domain, fields + ["quantity"], load=False):
+                ids_by_key[tuple(quant[field] or False for field in fields)].append(quant["id"])
+        prefetch_ids = [quant_id for ids in ids_by_key.values() for quant_id in ids]
+        return {
+            line: quant_model.browse(ids_by_key.get(line._get_quant_key(), [])).with_prefetch(prefetch_ids)
+            for line in self
+        }
+
     def get_quants(self, create=False):
-        all_quants = self.env["stock.quant"]
-        for line in self:
-            quants = self.env["stock.quant"]._gather(
-                line.product_id,
-                line.location_id,
-                lot_id=line.prod_lot_id,
-                package_id=line.package_id,
-                owner_id=line.partner_id,
-                strict=True,
-            )
-            if not quants and create:
-                quants = self.env["stock.quant"].create(
+        quants_by_line = self._get_quants_by_line()
+        quant_ids = OrderedSet()
+        missing_vals = {}
+        for line, quants in quants_by_line.items():
+            if quants:
+                quant_ids.update(quants.ids)
+            elif create:
+                missing_vals.setdefault(
+                    line._get_quant_key(),
                     {
                         "product_id": line.product_id.id,
                         "lot_id": line.prod_lot_id.id,
                         "owner_id": line.partner_id.id,
                         "location_id": line.location_id.id,
                         "package_id": line.package_id.id,
-                    }
+                    },
                 )
-            all_quants |= quants
+        all_quants = self.env["stock.quant"].browse(list(quant_ids))
+        if missing_vals:
+            all_quants |= self.env["stock.quant"].create(list(missing_vals.values()))
         return all_quants
 
+    @api.model
+    def _get_lines_for_quants(self, quants):
+        """Return the open inventory lines matching the given quants"""
+        if not quants:
+            return self.browse()
+        lines = self.search(
+            [
+                ("state", "=", "confirm"),
+                ("product_id", "in", quants.product_id.ids),
+                ("location_id", "in", quants.location_id.ids),
+            ]
+        )
+        keys = {
+            (quant.product_id.id, quant.location_id.id, quant.lot_id.id, quant.package_id.id, quant.owner_id.id)
+            for quant in quants
+        }
+        return lines.filtered(lambda l: l._get_quant_key() in keys)
+
     def action_refresh_quantity(self):
-        filtered_lines = self.filtered(lambda l: l.state != "done")
+        filtered_lines = self.filtered(lambda l: l.state != "done" and l.outdated)
+        quants_by_line = filtered_lines._get_quants_by_line()
+        lines_by_quantity = defaultdict(lambda: self.env["stock.inventory.line"])
         for line in filtered_lines:
-            if line.outdated:
-                quants = line.get_quants()
-                if quants.exists():
-                    quantity = sum(quants.mapped("quantity"))
-                    if line.theoretical_qty != quantity:
-                        line.theoretical_qty = quantity
-                else:
-                    line.theoretical_qty = 0
-                line.inventory_date = fields.Datetime.now()
+            quantity = sum(quants_by_line[line].mapped("quantity"))
+            if line.theoretical_qty != quantity:
+                lines_by_quantity[quantity] |= line
+        for quantity, lines in lines_by_quantity.items():
+            lines.write({"theoretical_qty": quantity})
+        filtered_lines.write({"inventory_date": fields.Datetime.now()})
 
     def action_reset_product_qty(self):
         """Write `product_qty` to zero on the selected records."""
@@ -757,33 +821,3 @@ class InventoryLine(models.Model):
                 continue
             impacted_lines |= line
         impacted_lines.write({"product_qty": 0})
-
-    def _search_difference_qty(self, operator, value):
-        if operator == "=":
-            result = True
-        elif operator == "!=":
-            result = False
-        else:
-            raise NotImplementedError()
-        if not self.env.context.get("default_inventory_id"):
-            raise NotImplementedError(
-                _("Unsupported search on %s outside of an Inventory Adjustment", "difference_qty")
-            )
-        lines = self.search([("inventory_id", "=", self.env.context.get("default_inventory_id"))])
-        line_ids = lines.filtered(
-            lambda line: float_is_zero(line.difference_qty, precision_rounding=line.product_id.uom_id.rounding)
-            == result
-        ).ids
-        return [("id", "in", line_ids)]
-
-    def _search_outdated(self, operator, value):
-        if operator != "=":
-            if operator == "!=" and isinstance(value, bool):
-                value = not value
-            else:
-                raise NotImplementedError()
-        if not self.env.context.get("default_inventory_id"):
-            raise NotImplementedError(_("Unsupported search on %s outside of an Inventory Adjustment", "outdated"))
-        lines = self.search([("inventory_id", "=", self.env.context.get("default_inventory_id"))])
-        line_ids = lines.filtered(lambda line: line.outdated == value).ids
-        return [("id", "in", line_ids)]
@@ -92,6 +92,8 @@ class StockQuant(models.Model):
         ):
             raise UserError(_("Your user cannot update product quantities"))
         res = super().write(vals)
+        if "quantity" in vals:
+            self._recompute_inventory_lines_outdated()
         if "inventory_quantity" in vals and not self.env.context.get("apply_inventory", False):
             for quant in self:
                 inventor_line = quant.inventory_line_id
@@ -108,7 +110,22 @@ class StockQuant(models.Model):
                 "deltatech_stock_inventory.group_view_inventory_button"
             ):
                 raise UserError(_("Your user cannot update product quantities"))
-        return super().create(vals_list)
+        quants = super().create(vals_list)
+        quants._recompute_inventory_lines_outdated()
+        return quants
+
+    def unlink(self):
+        lines = self.env["stock.inventory.line"].sudo()._get_lines_for_quants(self)
+        res = super().unlink()
+        if lines:
+            self.env.add_to_compute(lines._fields["outdated"], lines)
+        return res
+
+    def _recompute_inventory_lines_outdated(self):
+        """The quantity of the quants changed, mark the flag outdated of the open inventory lines to recompute"""
+        lines = self.env["stock.inventory.line"].sudo()._get_lines_for_quants(self)
+        if lines:
+            self.env.add_to_compute(lines._fields["outdated"], lines)
 
     def _get_inventory_move_values(self, qty, location_id, location_dest_id, out=False):
         values = super()._get_inventory_move_values(qty, location_id, location_dest_id, out)
@@ -3,3 +3,4 @@
 # See README.rst file on addons root folder for license details
 
 from . import test_stock_inventory
+from . import test_stock_inventory_benchmark
@@ -103,6 +103,65 @@ class TestStockInventory(TransactionCase):
     # def test_confirm_actual_inventory(self):
     #     self.product_b.product_tmpl_id.confirm_actual_inventory()
 
+    def test_start_prefill_quants(self):
+        inventory = self.env["stock.inventory"].create(
+            {
+                "location_ids": [(6, 0, self.stock_location.ids)],
+                "line_ids": [
+                    (0, 0, {"product_id": self.product.id, "location_id": self.stock_location.id}),
+                    (0, 0, {"product_id": self.product_a.id, "location_id": self.stock_location.id}),
+                ],
+            }
+        )
+        inventory.action_start()
+        self.assertEqual(self.quant.inventory_quantity, 10.0)
+        new_quant = self.env["stock.quant"].search(
+            [("product_id", "=", self.product_a.id), ("location_id", "=", self.stock_location.id)]
+        )
+        self.assertEqual(len(new_quant), 1)
+        self.assertEqual(new_quant.inventory_quantity, 0.0)
+
+    def test_get_quants_by_line(self):
+        inventory = self.env["stock.inventory"].create(
+            {
+                "location_ids": [(6, 0, self.stock_location.ids)],
+                "line_ids": [
+                    (0, 0, {"product_id": self.product.id, "location_id": self.stock_location.id}),
+                    (0, 0, {"product_id": self.product_b.id, "location_id": self.stock_location.id}),
+                ],
+            }
+        )
+        line, line_b = inventory.line_ids.sorted(lambda l: l.product_id != self.product)
+        quants_by_line = inventory.line_ids._get_quants_by_line()
+        self.assertEqual(quants_by_line[line], self.quant)
+        self.assertFalse(quants_by_line[line_b])
+        quants = inventory.line_ids.get_quants(create=True)
+        self.assertEqual(len(quants), 2)
+        self.assertIn(self.quant, quants)
+
+    def test_outdated_stored(self):
+        inventory = self.env["stock.inventory"].create(
+            {
+                "location_ids": [(6, 0, self.stock_location.ids)],
+                "line_ids": [(0, 0, {"product_id": self.product.id, "location_id": self.stock_location.id})],
+            }
+        )
+        inventory.action_start()
+        line = inventory.line_ids
+        self.assertFalse(line.outdated)
+        self.env["stock.quant"]._update_available_quantity(self.product, self.stock_location, 5.0)
+        self.assertTrue(line.outdated)
+        domain = [("inventory_id", "=", inventory.id), ("outdated", "=", True)]
+        self.assertEqual(self.env["stock.inventory.line"].search(domain), line)
+        line.action_refresh_quantity()
+        self.assertFalse(line.outdated)
+        self.assertEqual(line.theoretical_qty, 15.0)
+
+        line.product_qty = 12.0
+        self.assertEqual(line.difference_qty, -3.0)
+        domain = [("inventory_id", "=", inventory.id), ("difference_qty", "!=", 0)]
+        self.assertEqual(self.env["stock.inventory.line"].search(domain), line)
+
     def test_new_inventory(self):
         inventory = (
             self.env["stock.inventory"]
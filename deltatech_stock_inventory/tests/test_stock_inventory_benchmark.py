@@ -0,0 +1,56 @@
+# ©  2015-2021 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+import logging
+import time
+
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("post_install", "-at_install", "-standard", "benchmark")
+class TestStockInventoryBenchmark(TransactionCase):
+    """Run with --test-tags benchmark; seeds 50k quants and logs the time needed to start the inventory"""
+
+    products_count = 5000
+    locations_count = 10
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.parent_location = cls.env["stock.location"].create({"name": "Benchmark", "usage": "view"})
+        cls.locations = cls.env["stock.location"].create(
+            [
+                {"name": "Benchmark %s" % i, "usage": "internal", "location_id": cls.parent_location.id}
+                for i in range(cls.locations_count)
+            ]
+        )
+        cls.products = cls.env["product.product"].create(
+            [{"name": "Benchmark %s" % i, "type": "product"} for i in range(cls.products_count)]
+        )
+        cls.env["stock.quant"].create(
+            [
+                {"product_id": product.id, "location_id": location.id, "quantity": 10.0}
+                for product in cls.products
+                for location in cls.locations
+            ]
+        )
+
+    def test_benchmark_action_start(self):
+        inventory = self.env["stock.inventory"].create({"location_ids": [(6, 0, self.parent_location.ids)]})
+        start = time.time()
+        inventory.action_start()
+        duration = time.time() - start
+        _logger.info(
+            "Inventory start for %s lines / %s quants took %.2f seconds",
+            len(inventory.line_ids),
+            self.products_count * self.locations_count,
+            duration,
+        )
+        self.assertEqual(len(inventory.line_ids), self.products_count * self.locations_count)
+        quants = inventory.line_ids.get_quants()
+        self.assertTrue(all(quant.inventory_quantity == quant.quantity for quant in quants))
@@ -5,7 +5,7 @@
 {
     "name": "Stock Reports",
     "summary": "Report with positions from picking lists",
-    "version": "16.0.1.0.3",
+    "version": "16.0.1.2.0",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
     "category": "Generic Modules",
@@ -14,8 +14,9 @@
     "data": [
         "security/ir.model.access.csv",
         "report/stock_picking_report.xml",
-        # "report/monthly_stock_report_view.xml",
-        # "report/stock_balance_view.xml",
+        "report/monthly_stock_report_view.xml",
+        "report/stock_balance_view.xml",
+        "data/data.xml",
     ],
     "images": ["images/main_screenshot.png"],
     "development_status": "Mature",
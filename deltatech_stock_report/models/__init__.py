@@ -3,3 +3,5 @@
 # See README.rst file on addons root folder for license details
 
 from . import stock_valuation_layer
+from . import stock_monthly_snapshot
+from . import stock_move
@@ -0,0 +1,238 @@
+# ©  2015-2022 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+from datetime import datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+# iesire este orice miscare care vine din sau se duce intr-o locatie de client sau de productie
+MOVE_TOTALS_QUERY = """
+    SELECT {group_columns},
+        COALESCE(SUM(loc.sign * sm.product_qty) FILTER (WHERE NOT is_out), 0) AS quantity_in,
+        COALESCE(SUM(loc.sign * sm.product_qty * sm.price_unit) FILTER (WHERE NOT is_out), 0) AS amount_in,
+        COALESCE(SUM(-loc.sign * sm.product_qty) FILTER (WHERE is_out), 0) AS quantity_out,
+        COALESCE(SUM(-loc.sign * sm.product_qty * sm.price_unit) FILTER (WHERE is_out), 0) AS amount_out
+    FROM stock_move AS sm
+        JOIN stock_location AS sl ON sl.id = sm.location_id
+        JOIN stock_location AS sld ON sld.id = sm.location_dest_id
+        CROSS JOIN LATERAL (
+            VALUES (sm.location_id, -1), (sm.location_dest_id, 1)
+        ) AS loc(location_id, sign)
+        CROSS JOIN LATERAL (
+            SELECT sl.usage IN ('customer', 'production') OR sld.usage IN ('customer', 'production') AS is_out
+        ) AS kind
+    WHERE
+        sm.state = 'done' AND
+        sm.company_id = %(company)s AND
+        sm.date >= %(date_from)s AND sm.date < %(date_to)s AND
+        (sm.location_id IN %(locations)s OR sm.location_dest_id IN %(locations)s) AND
+        loc.location_id IN %(locations)s
+    GROUP BY {group_columns}
+"""
+MOVE_GROUP_COLUMNS = "loc.location_id, sm.product_id"
+MOVE_GROUP_COLUMNS_BY_MONTH = "date_trunc('month', sm.date)::date, loc.location_id, sm.product_id"
+
+
+class StockMonthlySnapshot(models.Model):
+    _name = "stock.monthly.snapshot"
+    _description = "Monthly stock snapshot"
+    _order = "date desc, location_id"
+
+    company_id = fields.Many2one("res.company", required=True, index=True)
+    location_id = fields.Many2one("stock.location", required=True, index=True, ondelete="cascade")
+    date = fields.Date(required=True, index=True, help="Last day of the closed month")
+    line_ids = fields.One2many("stock.monthly.snapshot.line", "snapshot_id")
+
+    _sql_constraints = [
+        ("location_date_uniq", "unique(location_id, date)", "There is already a snapshot for this location and month"),
+    ]
+
+    @api.model
+    def _get_move_totals(self, company, location_ids, date_from, date_to, by_month=False):
+        """Aggregate the done moves of the locations in a single pass over stock_move
+
+        :param date_from: first datetime included, or False for the beginning of the history
+        :param date_to: first datetime excluded
+        :param by_month: group also by month, the key starts with the first day of the month
+        :return: dict {(location_id, product_id): (quantity_in, amount_in, quantity_out, amount_out)}
+        """
+        if not location_ids:
+            return {}
+        params = {
+            "company": company.id,
+            "locations": tuple(location_ids),
+            "date_from": date_from or datetime.min,
+            "date_to": date_to,
+        }
+        group_columns = MOVE_GROUP_COLUMNS_BY_MONTH if by_month else MOVE_GROUP_COLUMNS
+        key_length = 3 if by_month else 2
+        self.env.cr.execute(MOVE_TOTALS_QUERY.format(group_columns=group_columns), params)
+        return {row[:key_length]: row[key_length:] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_last_snapshots(self, location_ids, date):
+        """Return the last snapshot of each location closed strictly before date
+
+        :return: dict {location_id: snapshot}
+        """
+        snapshots = {}
+        if not location_ids:
+            return snapshots
+        self.env.cr.execute(
+            """
+            SELECT DISTINCT ON (location_id) location_id, id
+            FROM stock_monthly_snapshot
+            WHERE location_id IN %s AND date < %s
+            ORDER BY location_id, date DESC
+            """,
+            (tuple(location_ids), date),
+        )
+        for location_id, snapshot_id in self.env.cr.fetchall():
+            snapshots[location_id] = self.browse(snapshot_id)
+        return snapshots
+
+    @api.model
+    def _ensure_snapshots(self, company, location_ids, date):
+        """Close all the past months before date that do not have a snapshot yet.
+
+        The first call walks the history once, month by month; the following calls only
+        close the months elapsed since the last snapshot.
+        """
+        last_month_end = min(date.replace(day=1), fields.Date.context_today(self).replace(day=1)) - timedelta(days=1)
+        last_snapshots = self._get_last_snapshots(location_ids, last_month_end + timedelta(days=1))
+        todo = [
+            loc_id
+            for loc_id in location_ids
+            if loc_id not in last_snapshots or last_snapshots[loc_id].date < last_month_end
+        ]
+        if not todo:
+            return
+
+        starts = {
+            loc_id: last_snapshots[loc_id].date + timedelta(days=1) for loc_id in todo if loc_id in last_snapshots
+        }
+        without_snapshot = [loc_id for loc_id in todo if loc_id not in starts]
+        if without_snapshot:
+            self.env.cr.execute(
+                """
+                SELECT MIN(date) FROM stock_move
+                WHERE state = 'done' AND company_id = %s AND (location_id IN %s OR location_dest_id IN %s)
+                """,
+                (company.id, tuple(without_snapshot), tuple(without_snapshot)),
+            )
+            first_move_date = self.env.cr.fetchone()[0]
+            first_month = first_move_date.date().replace(day=1) if first_move_date else last_month_end.replace(day=1)
+            for loc_id in without_snapshot:
+                starts[loc_id] = first_month
+
+        month_start = min(starts.values())
+        while month_start <= last_month_end:
+            month_end = month_start + relativedelta(months=1, days=-1)
+            location_to_close = [loc_id for loc_id in todo if starts[loc_id] <= month_start]
+            self._close_month(company, location_to_close, month_start, month_end)
+            month_start += relativedelta(months=1)
+
+    @api.model
+    def _close_month(self, company, location_ids, month_start, month_end):
+        """Create the snapshots of the locations for the month: previous snapshot + moves of the month"""
+        if not location_ids:
+            return self.browse()
+        previous = self._get_last_snapshots(location_ids, month_start)
+        snapshots = self.create(
+            [{"company_id": company.id, "location_id": loc_id, "date": month_end} for loc_id in location_ids]
+        )
+        self.flush_model()
+        self.env.cr.execute(
+            """
+            WITH snap AS (
+                SELECT * FROM unnest(%(snap_locations)s::int[], %(snapshots)s::int[], %(previous)s::int[])
+                    AS t(location_id, snapshot_id, previous_id)
+            ),
+            balance AS (
+                SELECT snap.snapshot_id, line.product_id, line.quantity, line.amount
+                FROM snap JOIN stock_monthly_snapshot_line AS line ON line.snapshot_id = snap.previous_id
+                UNION ALL
+                SELECT snap.snapshot_id, moves.product_id,
+                    moves.quantity_in - moves.quantity_out, moves.amount_in - moves.amount_out
+                FROM snap JOIN ({moves}) AS moves ON moves.location_id = snap.location_id
+            )
+            INSERT INTO stock_monthly_snapshot_line
+                (snapshot_id, product_id, quantity, amount, create_uid, create_date, write_uid, write_date)
+            SELECT snapshot_id, product_id, SUM(quantity), SUM(amount),
+                %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+            FROM balance
+            GROUP BY snapshot_id, product_id
+            HAVING SUM(quantity) != 0 OR SUM(amount) != 0
+            """.format(
+                moves=MOVE_TOTALS_QUERY.format(group_columns=MOVE_GROUP_COLUMNS)
+            ),
+            {
+                "snap_locations": [snapshot.location_id.id for snapshot in snapshots],
+                "locations": tuple(location_ids),
+                "snapshots": snapshots.ids,
+                "previous": [previous.get(snapshot.location_id.id, self).id or None for snapshot in snapshots],
+                "company": company.id,
+                "date_from": datetime.combine(month_start, time.min),
+                "date_to": datetime.combine(month_end + timedelta(days=1), time.min),
+                "uid": self.env.uid,
+            },
+        )
+        return snapshots
+
+    @api.model
+    def _get_balances(self, company, location_ids, date):
+        """Stock balance of the locations at the beginning of date, read from the last snapshot
+        plus the moves done after it.
+
+        :return: dict {(location_id, product_id): (quantity, amount)}
+        """
+        self.sudo()._ensure_snapshots(company, location_ids, date)
+        snapshots = self._get_last_snapshots(location_ids, date)
+        balances = {}
+        if snapshots:
+            self.env.cr.execute(
+                """
+                SELECT snap.location_id, line.product_id, line.quantity, line.amount
+                FROM stock_monthly_snapshot_line AS line
+                    JOIN stock_monthly_snapshot AS snap ON snap.id = line.snapshot_id
+                WHERE line.snapshot_id IN %s
+                """,
+                (tuple(snapshot.id for snapshot in snapshots.values()),),
+            )
+            for location_id, product_id, quantity, amount in self.env.cr.fetchall():
+                balances[(location_id, product_id)] = (quantity, amount)
+
+        # miscarile de dupa ultimul snapshot, grupate dupa data de inceput
+        locations_by_start = {}
+        for location_id in location_ids:
+            snapshot = snapshots.get(location_id)
+            start = snapshot and snapshot.date + timedelta(days=1)
+            locations_by_start.setdefault(start, []).append(location_id)
+        date_to = datetime.combine(date, time.min)
+        for start, locations in locations_by_start.items():
+            date_from = start and datetime.combine(start, time.min)
+            if date_from and date_from >= date_to:
+                continue
+            totals = self._get_move_totals(company, locations, date_from, date_to)
+            for key, (qty_in, amount_in, qty_out, amount_out) in totals.items():
+                quantity, amount = balances.get(key, (0.0, 0.0))
+                balances[key] = (quantity + qty_in - qty_out, amount + amount_in - amount_out)
+        return balances
+
+    @api.model
+    def _invalidate(self, location_ids, date):
+        """Remove the snapshots that include a move done on date in one of the locations"""
+        self.sudo().search([("location_id", "in", location_ids), ("date", ">=", date)]).unlink()
+
+
+class StockMonthlySnapshotLine(models.Model):
+    _name = "stock.monthly.snapshot.line"
+    _description = "Monthly stock snapshot line"
+
+    snapshot_id = fields.Many2one("stock.monthly.snapshot", required=True, index=True, ondelete="cascade")
+    product_id = fields.Many2one("product.product", required=True, index=True, ondelete="cascade")
+    quantity = fields.Float(digits="Product Unit of Measure")
+    amount = fields.Float(digits="Account")
@@ -0,0 +1,40 @@
+# ©  2015-2022 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+from odoo import api, models
+
+
+class StockMove(models.Model):
+    _inherit = "stock.move"
+
+    @api.model
+    def _get_snapshot_fields(self):
+        return [
+            "state",
+            "date",
+            "product_id",
+            "product_qty",
+            "product_uom_qty",
+            "price_unit",
+            "location_id",
+            "location_dest_id",
+        ]
+
+    def write(self, vals):
+        check_snapshot = any(field in vals for field in self._get_snapshot_fields())
+        if check_snapshot:
+            self._invalidate_monthly_snapshots()
+        res = super().write(vals)
+        if check_snapshot:
+            self._invalidate_monthly_snapshots()
+        return res
+
+    def _invalidate_monthly_snapshots(self):
+        """A done move in a closed month changes the snapshots from its month onwards"""
+        moves = self.filtered(lambda m: m.state == "done")
+        if not moves:
+            return
+        self.env["stock.monthly.snapshot"]._invalidate(
+            (moves.location_id | moves.location_dest_id).ids, min(moves.mapped("date")).date()
+        )
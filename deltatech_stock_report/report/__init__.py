@@ -4,6 +4,6 @@
 
 
 from . import stock_picking_report
-
-# from . import monthly_stock_report
-# from . import stock_balance
+from . import monthly_stock_report
+from . import monthly_stock_report_batch
+from . import stock_balance
@@ -2,9 +2,13 @@
 #              Dorin Hongu <dhongu(@)gmail(.)com
 # See README.rst file on addons root folder for license details
 
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
 from dateutil.relativedelta import relativedelta
 
 from odoo import _, api, fields, models
+from odoo.osv import expression
 
 # todo: de verificat ca sunt utilizate corect unitatile de masura!
 
@@ -70,171 +74,117 @@ class MonthlyStockReport(models.TransientModel):
         return report
 
     def compute_data_for_report(self):
-        stock_init = {}
-
-        stock_in = {}
-
-        stock_out = {}
-
-        # determinare miscari pentru aceasta locatie care sunt pana la data de inceput
-        query = """
-            SELECT sm.product_id,
-                sum(CASE WHEN sm.location_id = %(location)s THEN -1*sm.product_qty*sm.price_unit
-                    ELSE sm.product_qty*sm.price_unit
-                    END),
-                sum(CASE WHEN sm.location_id = %(location)s THEN -1*product_qty
-                    ELSE product_qty
-                    END),
-                array_agg(sm.id)
-
-            FROM stock_move as sm
-            WHERE
-                sm.state = 'done' AND
-                sm.company_id = %(company)s AND
-                sm.date < %(date)s AND
-              ( sm.location_id = %(location)s OR sm.location_dest_id = %(location)s)
-             GROUP BY product_id
-        """
-
-        params = {
-            "location": self.location_id.id,
-            "company": self.company_id.id,
-            "date": fields.Date.to_string(self.date_from) + " 00:00:00",
-        }
+        snapshot_model = self.env["stock.monthly.snapshot"]
+        location_ids = self.location_id.ids
 
-        self.env.cr.execute(query, params=params)
-
-        product_ids = []
-        res = self.env.cr.fetchall()
-        for row in res:
-            product_ids += [row[0]]
-            stock_init[row[0]] = {
-                "report_id": self.id,
-                "product_id": row[0],
-                "amount_begin": row[1] or 0.0,
-                "quantity_begin": row[2] or 0.0,
-                "move_begin_ids": [(6, 0, list(row[3]))],
-            }
-        products = self.env["product.product"].browse(product_ids)
-
-        # determinare care sunt intrari in stoc
-        query = """
-            SELECT sm.product_id,
-                sum(CASE WHEN sm.location_id = %(location)s THEN -1*sm.product_qty*sm.price_unit
-                    ELSE sm.product_qty*sm.price_unit
-                    END),
-                sum(CASE WHEN sm.location_id = %(location)s THEN -1*product_qty
-                    ELSE product_qty
-                    END),
-            array_agg(sm.id)
-            FROM stock_move as sm  join stock_location as sl on sl.id = sm.location_id
-                                   join stock_location as sld on sld.id = sm.location_dest_id
-            WHERE
-                sm.state = 'done' AND
-                sm.company_id = %(company)s and
-                 date >= %(date_from)s AND date  <= %(date_to)s AND
-               ( sm.location_id = %(location)s OR sm.location_dest_id = %(location)s ) and
-              ( sld.usage not in ('customer','production') and sl.usage not in ('customer','production') )
-             GROUP BY sm.product_id
-        """
-        # and  sl.usage not in ('customer')
-        params = {
-            "location": self.location_id.id,
-            "company": self.company_id.id,
-            "date_from": fields.Date.to_string(self.date_from) + " 00:00:00",
-            "date_to": fields.Date.to_string(self.date_to) + " 23:59:59",
-        }
-
-        self.env.cr.execute(query, params=params)
-
-        product_ids = []
-        res = self.env.cr.fetchall()
-        for row in res:
-            product_ids += [row[0]]
-            stock_in[row[0]] = {
-                "report_id": self.id,
-                "product_id": row[0],
-                "amount_in": row[1] or 0.0,
-                "quantity_in": row[2] or 0.0,
-                "move_in_ids": [(6, 0, list(row[3]))],
-            }
-        products |= self.env["product.product"].browse(product_ids)
-
-        # determinare iesirile din aceasta locatie
-        # se cosnidera iesire orice miscare care se duce intro locatie de client sau de productie
-        query = """
-                    SELECT sm.product_id,
-                        sum(CASE WHEN sm.location_id = %(location)s THEN 1*sm.product_qty*sm.price_unit
-                            ELSE -sm.product_qty*sm.price_unit
-                            END),
-                        sum(CASE WHEN sm.location_id = %(location)s THEN 1*product_qty
-                            ELSE -product_qty
-                            END),
-                    array_agg(sm.id)
-                    FROM stock_move as sm  join stock_location as sl on sl.id = sm.location_id
-                                           join stock_location as sld on sld.id = sm.location_dest_id
-                    WHERE
-                       sm.state = 'done' AND
-                       sm.company_id = %(company)s and
-                         date >= %(date_from)s AND date  <= %(date_to)s AND
-                       (sm.location_id = %(location)s OR sm.location_dest_id = %(location)s) and
-                       not ( sld.usage not in ('customer','production') and sl.usage not in ('customer','production') )
-
-                     GROUP BY sm.product_id
-                """
-        # or sl.usage  in ('customer')
-        params = {
-            "location": self.location_id.id,
-            "company": self.company_id.id,
-            "date_from": fields.Date.to_string(self.date_from) + " 00:00:00",
-            "date_to": fields.Date.to_string(self.date_to) + " 23:59:59",
-        }
-
-        self.env.cr.execute(query, params=params)
-
-        product_ids = []
-        res = self.env.cr.fetchall()
-        for row in res:
-            product_ids += [row[0]]
-            stock_out[row[0]] = {
-                "report_id": self.id,
-                "product_id": row[0],
-                "amount_out": row[1] or 0.0,
-                "quantity_out": row[2] or 0.0,
-                "move_out_ids": [(6, 0, list(row[3]))],
-            }
-        products |= self.env["product.product"].browse(product_ids)
-
-        for product in products:
-            line_value = {
-                "quantity_begin": 0.0,
-                "quantity_in": 0.0,
-                "quantity_out": 0.0,
-                "categ_id": product.categ_id.id,
-                "amount_begin": 0.0,
-                "amount_in": 0.0,
-                "amount_out": 0.0,
-            }
+        # soldul initial se citeste din ultimul snapshot lunar + miscarile ulterioare
+        stock_init = snapshot_model._get_balances(self.company_id, location_ids, self.date_from)
 
-            init_product = stock_init.get(product.id, False)
-            if init_product:
-                line_value.update(init_product)
+        # intrarile si iesirile din perioada
+        stock_moves = snapshot_model._get_move_totals(
+            self.company_id,
+            location_ids,
+            datetime.combine(self.date_from, time.min),
+            datetime.combine(self.date_to + timedelta(days=1), time.min),
+        )
+        self._create_report_lines({self.location_id.id: self}, stock_init, stock_moves)
 
-            in_product = stock_in.get(product.id, False)
-            if in_product:
-                line_value.update(in_product)
-            out_product = stock_out.get(product.id, False)
-            if out_product:
-                line_value.update(out_product)
+    @api.model
+    def _create_report_lines(self, report_by_location, stock_init, stock_moves):
+        """Create in bulk the lines of the reports of the same period
 
-            line_value["quantity_finish"] = (
-                line_value["quantity_begin"] + line_value["quantity_in"] - line_value["quantity_out"]
+        :param report_by_location: dict {location_id: report}
+        :param stock_init: dict {(location_id, product_id): (quantity, amount)}
+        :param stock_moves: dict {(location_id, product_id): totals of the moves from the period}
+        :return: the balances at the end of the period, like stock_init
+        """
+        keys = sorted(set(stock_init) | set(stock_moves))
+        products = self.env["product.product"].browse({product_id for (_location_id, product_id) in keys})
+        categ_by_product = {product.id: product.categ_id.id for product in products}
+
+        stock_finish = {}
+        vals_list = []
+        for location_id, product_id in keys:
+            quantity_begin, amount_begin = stock_init.get((location_id, product_id), (0.0, 0.0))
+            quantity_in, amount_in, quantity_out, amount_out = stock_moves.get(
+                (location_id, product_id), (0.0, 0.0, 0.0, 0.0)
             )
-            line_value["amount_finish"] = (
-                line_value["amount_begin"] + line_value["amount_in"] - line_value["amount_out"]
+            quantity_finish = quantity_begin + quantity_in - quantity_out
+            amount_finish = amount_begin + amount_in - amount_out
+            stock_finish[(location_id, product_id)] = (quantity_finish, amount_finish)
+            if not (quantity_begin or quantity_in or quantity_out):
+                continue
+            vals_list.append(
+                {
+                    "report_id": report_by_location[location_id].id,
+                    "product_id": product_id,
+                    "categ_id": categ_by_product[product_id],
+                    "quantity_begin": quantity_begin,
+                    "quantity_in": quantity_in,
+                    "quantity_out": quantity_out,
+                    "quantity_finish": quantity_finish,
+                    "amount_begin": amount_begin,
+                    "amount_in": amount_in,
+                    "amount_out": amount_out,
+                    "amount_finish": amount_finish,
+                }
             )
-            if line_value["quantity_begin"] or line_value["quantity_in"] or line_value["quantity_out"]:
-                self.env["stock.monthly.report.line"].create(line_value)
+        self.env["stock.monthly.report.line"].create(vals_list)
+        return stock_finish
+
+    @api.model
+    def _compute_batch_reports(self, company_id, location_ids, date_from, months):
+        """Compute the reports of the locations for consecutive months with one query over stock_move
+
+        :param date_from: first day of the first month
+        :param months: number of months
+        :return: the created reports
+        """
+        company = self.env["res.company"].browse(company_id)
+        snapshot_model = self.env["stock.monthly.snapshot"]
+        date_from = fields.Date.to_date(date_from).replace(day=1)
+        periods = [date_from + relativedelta(months=i) for i in range(months)]
+        date_to = date_from + relativedelta(months=months)
+
+        stock_init = snapshot_model._get_balances(company, location_ids, date_from)
+        stock_moves = snapshot_model._get_move_totals(
+            company,
+            location_ids,
+            datetime.combine(date_from, time.min),
+            datetime.combine(date_to, time.min),
+            by_month=True,
+        )
+        moves_by_period = defaultdict(dict)
+        for (period, location_id, product_id), totals in stock_moves.items():
+            moves_by_period[period][(location_id, product_id)] = totals
+
+        existing = self.search(
+            [
+                ("company_id", "=", company.id),
+                ("location_id", "in", location_ids),
+                ("date_from", "in", periods),
+                ("date_to", "in", [period + relativedelta(months=1, days=-1) for period in periods]),
+            ]
+        )
+        existing.unlink()
+        reports = self.create(
+            [
+                {
+                    "company_id": company.id,
+                    "location_id": location_id,
+                    "date_from": period,
+                    "date_to": period + relativedelta(months=1, days=-1),
+                }
+                for period in periods
+                for location_id in location_ids
+            ]
+        )
+        for period in periods:
+            report_by_location = {
+                report.location_id.id: report for report in reports.filtered(lambda r: r.date_from == period)
+            }
+            stock_init = self._create_report_lines(report_by_location, stock_init, moves_by_period[period])
+        return reports
 
     def button_show(self):
         report = self.do_execute()
@@ -244,7 +194,7 @@ class MonthlyStockReport(models.TransientModel):
         # action['target'] = 'main'
         # action['name'] = _('Monthly Stock %s') % report.date_range_id.name
         action = {
-            "name": _("Monthly Stock %s") % report.name,
+            "name": _("Monthly Stock %s") % report.location_id.name,
             "type": "ir.actions.act_window",
             "view_type": "form",
             "view_mode": "pivot,tree",
@@ -265,7 +215,9 @@ class MonthlyStockReportLine(models.TransientModel):
     _name = "stock.monthly.report.line"
     _description = "MonthlyStockReportLine"
 
-    report_id = fields.Many2one("stock.monthly.report", string="Report")
+    report_id = fields.Many2one("stock.monthly.report", string="Report", index=True, ondelete="cascade")
+    location_id = fields.Many2one(related="report_id.location_id", store=True)
+    date_from = fields.Date(related="report_id.date_from", store=True)
 
     product_id = fields.Many2one("product.product")
     categ_id = fields.Many2one("product.category")
@@ -280,23 +232,44 @@ class MonthlyStockReportLine(models.TransientModel):
     amount_out = fields.Float("Amount Out")
     amount_finish = fields.Float("Amount Finish")
 
-    move_begin_ids = fields.Many2many("stock.move", relation="stock_monthly_report_move_begin")
-    move_in_ids = fields.Many2many("stock.move", relation="stock_monthly_report_move_in")
-    move_out_ids = fields.Many2many("stock.move", relation="stock_monthly_report_move_out")
+    # miscarile nu se mai salveaza in raport, domeniul se evalueaza la deschiderea detaliilor
+    def _get_move_domain(self, date_from=False, date_to=False):
+        self.ensure_one()
+        report = self.report_id
+        domain = [
+            ("state", "=", "done"),
+            ("company_id", "=", report.company_id.id),
+            ("product_id", "=", self.product_id.id),
+            "|",
+            ("location_id", "=", report.location_id.id),
+            ("location_dest_id", "=", report.location_id.id),
+        ]
+        if date_from:
+            domain += [("date", ">=", fields.Datetime.to_string(datetime.combine(date_from, time.min)))]
+        if date_to:
+            domain += [("date", "<", fields.Datetime.to_string(datetime.combine(date_to, time.min)))]
+        return domain
+
+    @api.model
+    def _get_move_out_domain(self):
+        out_usage = ["customer", "production"]
+        return ["|", ("location_id.usage", "in", out_usage), ("location_dest_id.usage", "in", out_usage)]
 
     def action_move_begin_details(self):
         self.ensure_one()
-        return self.show_move(self.move_begin_ids)
+        return self.show_move(self._get_move_domain(date_to=self.report_id.date_from))
 
     def action_move_in_details(self):
         self.ensure_one()
-        return self.show_move(self.move_in_ids)
+        domain = self._get_move_domain(self.report_id.date_from, self.report_id.date_to + timedelta(days=1))
+        return self.show_move(expression.AND([domain, ["!"] + self._get_move_out_domain()]))
 
     def action_move_out_details(self):
         self.ensure_one()
-        return self.show_move(self.move_out_ids)
+        domain = self._get_move_domain(self.report_id.date_from, self.report_id.date_to + timedelta(days=1))
+        return self.show_move(expression.AND([domain, self._get_move_out_domain()]))
 
-    def show_move(self, move_ids):
+    def show_move(self, domain):
         action = {
             "name": _("Move"),
             "type": "ir.actions.act_window",
@@ -304,7 +277,7 @@ class MonthlyStockReportLine(models.TransientModel):
             "view_mode": "tree,form",
             "context": self.env.context,
             "res_model": "stock.move",
-            "domain": [("id", "in", move_ids.ids)],
+            "domain": domain,
         }
 
         # tree_view_ref = self.env.ref('stock_account.view_stock_account_aml')
@@ -0,0 +1,62 @@
+# ©  2015-2022 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import _, api, fields, models
+
+
+class MonthlyStockReportBatch(models.TransientModel):
+    _name = "stock.monthly.report.batch"
+    _description = "Monthly Stock Report for more locations and months"
+
+    company_id = fields.Many2one("res.company", string="Company", default=lambda self: self.env.company, required=True)
+    location_ids = fields.Many2many(
+        "stock.location",
+        domain="[('usage','=','internal'),('company_id','=',company_id)]",
+        help="Leave empty for all internal locations",
+    )
+    include_children = fields.Boolean("Include Sublocations", default=True)
+    date_from = fields.Date("Start Month", required=True)
+    months = fields.Integer("Months", default=1, required=True)
+    split_by_location = fields.Boolean("Job per Location", help="Compute each location in a separate queue job")
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        today = fields.Date.context_today(self)
+        res["date_from"] = today + relativedelta(day=1, months=-1)
+        return res
+
+    def _get_locations(self):
+        domain = [("usage", "=", "internal"), ("company_id", "=", self.company_id.id)]
+        if self.location_ids and self.include_children:
+            domain += [("id", "child_of", self.location_ids.ids)]
+        elif self.location_ids:
+            domain += [("id", "in", self.location_ids.ids)]
+        return self.env["stock.location"].search(domain)
+
+    def button_compute(self):
+        self.ensure_one()
+        locations = self._get_locations()
+        date_from = self.date_from.replace(day=1)
+        months = max(self.months, 1)
+        report_model = self.env["stock.monthly.report"]
+        if self.split_by_location and hasattr(report_model, "with_delay"):
+            for location in locations:
+                report_model.with_delay(
+                    description=_("Monthly Stock %(location)s", location=location.complete_name)
+                )._compute_batch_reports(self.company_id.id, location.ids, date_from, months)
+        else:
+            report_model._compute_batch_reports(self.company_id.id, locations.ids, date_from, months)
+
+        periods = [date_from + relativedelta(months=i) for i in range(months)]
+        return {
+            "name": _("Monthly Stock"),
+            "type": "ir.actions.act_window",
+            "view_mode": "pivot,tree",
+            "res_model": "stock.monthly.report.line",
+            "domain": [("location_id", "in", locations.ids), ("date_from", "in", periods)],
+            "context": {"pivot_row_groupby": ["location_id"], "pivot_column_groupby": ["date_from:month"]},
+        }
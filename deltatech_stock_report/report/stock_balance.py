@@ -18,19 +18,53 @@
 #
 ##############################################################################
 
-from odoo import fields, models, tools
+from datetime import datetime, timedelta
+
+from odoo import api, fields, models
+
+WATERMARK_PARAM = "deltatech_stock_report.stock_balance_watermark"
+TEMPLATE_WATERMARK_PARAM = "deltatech_stock_report.stock_balance_template_watermark"
+# miscarile scrise de tranzactii inca deschise la citirea watermark-ului sunt reluate la urmatoarea actualizare
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# fiecare miscare efectuata genereaza o iesire din locatia sursa si o intrare in locatia destinatie
+STOCK_BALANCE_INSERT = """
+    INSERT INTO stock_balance (move_id, date, location_id, categ_id, product_id, product_uom, company_id,
+        qty_in, amount_in, qty_out, amount_out, product_qty, amount)
+    SELECT sm.id, sm.date::date, side.location_id, pt.categ_id, sm.product_id, pt.uom_id, sm.company_id,
+        side.qty_in, side.qty_in * sm.price_unit, side.qty_out, side.qty_out * sm.price_unit,
+        side.qty_in - side.qty_out, (side.qty_in - side.qty_out) * sm.price_unit
+    FROM stock_move AS sm
+        JOIN product_product AS pp ON pp.id = sm.product_id
+        JOIN product_template AS pt ON pt.id = pp.product_tmpl_id
+        CROSS JOIN LATERAL (
+            VALUES (sm.location_id, 0.0, sm.product_qty), (sm.location_dest_id, sm.product_qty, 0.0)
+        ) AS side(location_id, qty_in, qty_out)
+    WHERE sm.state = 'done' {where}
+"""
+
+# categoria si unitatea de masura sunt copiate din produs, se actualizeaza pentru produsele modificate
+STOCK_BALANCE_PRODUCT_UPDATE = """
+    UPDATE stock_balance AS sb SET categ_id = pt.categ_id, product_uom = pt.uom_id
+    FROM product_product AS pp
+        JOIN product_template AS pt ON pt.id = pp.product_tmpl_id
+    WHERE sb.product_id = pp.id AND pt.write_date >= %(watermark)s
+        AND (sb.categ_id IS DISTINCT FROM pt.categ_id OR sb.product_uom IS DISTINCT FROM pt.uom_id)
+"""
 
 
 class StockBalance(models.Model):
     _name = "stock.balance"
     _description = "stock Stock balance"
-    _auto = False
+    _order = "date desc, id desc"
+    _log_access = False
 
-    date = fields.Datetime("Date", readonly=True)
+    move_id = fields.Many2one("stock.move", "Stock Move", readonly=True, index=True, ondelete="cascade")
+    date = fields.Date("Date", readonly=True, index=True)
     location_id = fields.Many2one("stock.location", "Location", readonly=True, index=True)
     categ_id = fields.Many2one("product.category", "Category", readonly=True)
-    product_id = fields.Many2one("product.product", "Product", readonly=True)
-    product_uom = fields.Many2one("uom.uom", "Unit of Measure", required=True)
+    product_id = fields.Many2one("product.product", "Product", readonly=True, index=True)
+    product_uom = fields.Many2one("uom.uom", "Unit of Measure", readonly=True)
     qty_in = fields.Float("Qty In", digits="Product Unit of Measure", readonly=True)
     amount_in = fields.Float("Amount In", digits="Account", readonly=True)
     qty_out = fields.Float("Qty Out", digits="Product Unit of Measure", readonly=True)
@@ -40,64 +74,62 @@ class StockBalance(models.Model):
     company_id = fields.Many2one("res.company", "Company", readonly=True)
 
     def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
         self.env.cr.execute(
             """
-         create or replace view stock_balance as (
+            CREATE INDEX IF NOT EXISTS stock_balance_location_product_date_index
+            ON stock_balance (location_id, product_id, date)
+            """
+        )
+        # la instalare si la actualizarea modulului tabelul se construieste complet
+        if not self.env["ir.config_parameter"].sudo().get_param(WATERMARK_PARAM):
+            self._refresh()
 
-            SELECT
-             min(smg.id) AS id, smg.date,
-             smg.location_id, smg.categ_id, smg.product_id,  smg.product_uom,
-             sum(smg.qty_in) AS qty_in,
-             sum(smg.amount_in) AS amount_in,
-             sum(smg.qty_out) AS qty_out,
-             sum(smg.amount_out) AS amount_out,
-             sum((smg.qty_in - smg.qty_out)) AS product_qty,
-             sum((smg.amount_in - smg.amount_out)) AS amount,
-             smg.company_id
-             FROM (
-              SELECT min(sm.id) AS id,
-                sm.date  AS date,
-                sm.location_id, pt.categ_id, sm.product_id, pu.id AS product_uom,
-                0 AS qty_in, 0 AS amount_in,
-                COALESCE(sum(((sm.product_qty * pu.factor) / pu2.factor)), 0.0) AS qty_out,
-                sum(sm.value) AS amount_out, sm.company_id
-              FROM stock_move sm
-                LEFT JOIN stock_move_line sml  ON   sml.move_id = sm.id
-                    LEFT JOIN stock_quant_package ON  stock_quant_package.id = sml.result_package_id
-                        LEFT JOIN stock_quant q ON  stock_quant_package.id = q.package_id
-                LEFT JOIN product_product pp ON  sm.product_id = pp.id
-                    LEFT JOIN product_template pt ON  pp.product_tmpl_id = pt.id
-                        LEFT JOIN uom_uom pu ON  pt.uom_id = pu.id
-                LEFT JOIN uom_uom pu2 ON  sm.product_uom = pu2.id
+    @api.model
+    def _refresh(self):
+        """Bring the table up to date with the moves written since the last refresh.
 
-              WHERE ( sm.state  = 'done' )
-              GROUP BY pt.categ_id, sm.product_id, pu.id, sm.location_id, sm.date,
-                  sm.company_id
-                UNION ALL
-                SELECT min(- sm.id) AS id,
-                    sm.date AS date,
-                    sm.location_dest_id AS location_id, pt.categ_id, sm.product_id,
-                    pu.id AS product_uom,
-                    COALESCE(sum(((sm.product_qty*pu.factor)/pu2.factor)), 0.0) AS qty_in,
-                    sum( sm.value ) AS amount_in,
+        The rows of the changed moves are deleted and inserted again, so a move processed twice
+        is counted only once. The category and the unit of measure of the products changed since
+        the last refresh are updated. Without a watermark the table is rebuilt from all the done moves.
+        """
+        self.env["stock.move"].flush_model()
+        self.env["product.product"].flush_model(["product_tmpl_id"])
+        self.env["product.template"].flush_model(["categ_id", "uom_id"])
+        config = self.env["ir.config_parameter"].sudo()
+        watermark = config.get_param(WATERMARK_PARAM)
+        template_watermark = config.get_param(TEMPLATE_WATERMARK_PARAM)
 
-                    0 AS qty_out, 0 AS amount_out, sm.company_id
-                FROM  stock_move sm
-                    LEFT JOIN stock_move_line sml  ON   sml.move_id = sm.id
-                    LEFT JOIN stock_quant_package ON  stock_quant_package.id = sml.result_package_id
-                        LEFT JOIN stock_quant q ON  stock_quant_package.id = q.package_id
-                    LEFT JOIN product_product pp ON  sm.product_id = pp.id
-                    LEFT JOIN product_template pt ON  pp.product_tmpl_id = pt.id
-                    LEFT JOIN uom_uom pu ON  pt.uom_id = pu.id
-                    LEFT JOIN uom_uom pu2 ON  sm.product_uom = pu2.id
+        self.env.cr.execute("SELECT MAX(write_date) FROM stock_move")
+        new_watermark = self.env.cr.fetchone()[0]
+        self.env.cr.execute("SELECT MAX(write_date) FROM product_template")
+        new_template_watermark = self.env.cr.fetchone()[0]
+        if watermark:
+            # fara watermark pentru produse se verifica toate produsele o singura data
+            date_from = template_watermark and fields.Datetime.to_datetime(template_watermark) - WATERMARK_OVERLAP
+            self.env.cr.execute(STOCK_BALANCE_PRODUCT_UPDATE, {"watermark": date_from or datetime.min})
+            params = {"watermark": fields.Datetime.to_datetime(watermark) - WATERMARK_OVERLAP}
+            self.env.cr.execute(
+                """
+                DELETE FROM stock_balance AS sb USING stock_move AS sm
+                WHERE sb.move_id = sm.id AND sm.write_date >= %(watermark)s
+                """,
+                params,
+            )
+            self.env.cr.execute(STOCK_BALANCE_INSERT.format(where="AND sm.write_date >= %(watermark)s"), params)
+        else:
+            self.env.cr.execute("DELETE FROM stock_balance")
+            self.env.cr.execute(STOCK_BALANCE_INSERT.format(where=""))
+        self.invalidate_model()
+        if new_watermark:
+            config.set_param(WATERMARK_PARAM, fields.Datetime.to_string(new_watermark))
+        if new_template_watermark:
+            config.set_param(TEMPLATE_WATERMARK_PARAM, fields.Datetime.to_string(new_template_watermark))
 
-              WHERE ( sm.state   = 'done')
-              GROUP BY pt.categ_id, sm.product_id, pu.id, sm.location_dest_id, sm.date,
-                  sm.company_id) smg
-             GROUP BY smg.date,  smg.categ_id, smg.product_id,
-             smg.location_id, smg.product_uom, smg.company_id
-        )"""
-        )
+    @api.model
+    def _cron_refresh(self):
+        self.sudo()._refresh()
 
-        # amount_in era calculat din sum((q.quantity * q.cost)) AS amount_in
+    @api.model
+    def action_refresh(self):
+        self.sudo()._refresh()
+        return {"type": "ir.actions.client", "tag": "reload"}
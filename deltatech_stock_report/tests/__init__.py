@@ -0,0 +1,6 @@
+# ©  2015-2022 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+from . import test_monthly_stock_report
+from . import test_stock_balance
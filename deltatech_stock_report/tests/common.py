@@ -0,0 +1,35 @@
+# ©  2015-2022 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+
+class TestStockReportBase(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.location = self.env["stock.location"].create({"name": "Test location", "usage": "internal"})
+        self.supplier_location = self.env.ref("stock.stock_location_suppliers")
+        self.customer_location = self.env.ref("stock.stock_location_customers")
+        self.product = self.env["product.product"].create({"name": "Test Product", "type": "product"})
+        self.month_start = fields.Date.today().replace(day=1)
+
+    def _make_move(self, qty, location, location_dest, date):
+        move = self.env["stock.move"].create(
+            {
+                "name": self.product.name,
+                "product_id": self.product.id,
+                "product_uom": self.product.uom_id.id,
+                "product_uom_qty": qty,
+                "price_unit": 10,
+                "location_id": location.id,
+                "location_dest_id": location_dest.id,
+            }
+        )
+        move._action_confirm()
+        move._action_assign()
+        move.quantity_done = qty
+        move._action_done()
+        move.date = date
+        return move
@@ -0,0 +1,85 @@
+# ©  2015-2022 Deltatech
+#              Dorin Hongu <dhongu(@)gmail(.)com
+# See README.rst file on addons root folder for license details
+
+from dateutil.relativedelta import relativedelta
+
+from .common import TestStockReportBase
+
+
+class TestMonthlyStockReport(TestStockReportBase):
+    def _get_report_line(self, date_from, date_to):
+        report = self.env["stock.monthly.report"].create(
+            {"location_id": self.location.id, "date_from": date_from, "date_to": date_to}
+        )
+        report.do_execute()
+        return report.line_product_ids.filtered(lambda l: l.product_id == self.product)
+
+    def test_monthly_report_snapshot(self):
+        self._make_move(10, self.supplier_location, self.location, self.month_start - relativedelta(months=3))
+        self._make_move(4, self.location, self.customer_location, self.month_start - relativedelta(months=2))
+        self._make_move(5, self.supplier_location, self.location, self.month_start - relativedelta(months=1))
+        self._make_move(2, self.location, self.customer_location, self.month_start - relativedelta(months=1, days=-1))
+
+        date_from = self.month_start - relativedelta(months=1)
+        line = self._get_report_line(date_from, self.month_start - relativedelta(days=1))
+        self.assertEqual(line.quantity_begin, 6)
+        self.assertEqual(line.quantity_in, 5)
+        self.assertEqual(line.quantity_out, 2)
+        self.assertEqual(line.quantity_finish, 9)
+
+        move_model = self.env["stock.move"]
+        self.assertEqual(len(move_model.search(line.action_move_begin_details()["domain"])), 2)
+        self.assertEqual(move_model.search(line.action_move_in_details()["domain"]).product_uom_qty, 5)
+        self.assertEqual(move_model.search(line.action_move_out_details()["domain"]).product_uom_qty, 2)
+
+        snapshots = self.env["stock.monthly.snapshot"].search([("location_id", "=", self.location.id)])
+        self.assertEqual(snapshots[0].date, date_from - relativedelta(days=1))
+
+        # o miscare intr-o luna inchisa invalideaza snapshot-urile
+        self._make_move(1, self.supplier_location, self.location, self.month_start - relativedelta(months=3))
+        line = self._get_report_line(date_from, self.month_start - relativedelta(days=1))
+        self.assertEqual(line.quantity_begin, 7)
+        self.assertEqual(line.quantity_finish, 10)
+
+    def test_monthly_report_mid_month(self):
+        self._make_move(10, self.supplier_location, self.location, self.month_start - relativedelta(months=3))
+        self._make_move(4, self.location, self.customer_location, self.month_start - relativedelta(months=2, days=-5))
+        self._make_move(3, self.location, self.customer_location, self.month_start - relativedelta(months=2, days=-20))
+
+        # raportul cerut de doua ori din mijlocul lunii nu inchide din nou luna
+        date_from = self.month_start - relativedelta(months=2, days=-14)
+        date_to = self.month_start - relativedelta(days=1)
+        for _i in range(2):
+            line = self._get_report_line(date_from, date_to)
+            self.assertEqual(line.quantity_begin, 6)
+            self.assertEqual(line.quantity_out, 3)
+            self.assertEqual(line.quantity_finish, 3)
+        snapshots = self.env["stock.monthly.snapshot"].search([("location_id", "=", self.location.id)])
+        self.assertEqual(snapshots[0].date, self.month_start - relativedelta(months=2, days=1))
+
+    def test_monthly_report_batch(self):
+        location_2 = self.env["stock.location"].create(
+            {"name": "Test sublocation", "usage": "internal", "location_id": self.location.id}
+        )
+        self._make_move(10, self.supplier_location, self.location, self.month_start - relativedelta(months=3))
+        self._make_move(3, self.supplier_location, location_2, self.month_start - relativedelta(months=2))
+        self._make_move(4, self.location, self.customer_location, self.month_start - relativedelta(months=1))
+
+        wizard = self.env["stock.monthly.report.batch"].create(
+            {
+                "location_ids": [(6, 0, self.location.ids)],
+                "date_from": self.month_start - relativedelta(months=2),
+                "months": 2,
+            }
+        )
+        action = wizard.button_compute()
+        lines = self.env["stock.monthly.report.line"].search(action["domain"])
+        self.assertEqual(len(lines.report_id), 4)
+
+        line = lines.filtered(lambda l: l.location_id == self.location and l.date_from == wizard.date_from)
+        self.assertEqual((line.quantity_begin, line.quantity_finish), (10, 10))
+        line = lines.filtered(lambda l: l.location_id == self.location and l.date_from > wizard.date_from)
+        self.assertEqual((line.quantity_begin, line.quantity_out, line.quantity_finish), (10, 4, 6))
+        line = lines.filtered(lambda l: l.location_id == location_2 and l.date_from == wizard.date_from)
+        self.assertEqual((line.quantity_in, line.quantity_finish), (3, 3))
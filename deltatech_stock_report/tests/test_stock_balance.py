@@ -0,0 +1,41 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from odoo import fields
+
+from .common import TestStockReportBase
+
+
+class TestStockBalance(TestStockReportBase):
+    def _get_balance(self):
+        groups = self.env["stock.balance"].read_group(
+            [("location_id", "=", self.location.id), ("product_id", "=", self.product.id)],
+            ["qty_in", "qty_out", "product_qty"],
+            [],
+        )
+        return groups[0]
+
+    def test_stock_balance_refresh(self):
+        today = fields.Datetime.now()
+        self._make_move(10, self.supplier_location, self.location, today)
+        self.env["stock.balance"].action_refresh()
+        balance = self._get_balance()
+        self.assertEqual(balance["qty_in"], 10)
+        self.assertEqual(balance["product_qty"], 10)
+
+        # actualizarea incrementala nu dubleaza miscarile deja incarcate
+        self._make_move(4, self.location, self.customer_location, today)
+        self.env["stock.balance"]._cron_refresh()
+        balance = self._get_balance()
+        self.assertEqual(balance["qty_in"], 10)
+        self.assertEqual(balance["qty_out"], 4)
+        self.assertEqual(balance["product_qty"], 6)
+
+    def test_stock_balance_category(self):
+        self._make_move(10, self.supplier_location, self.location, fields.Datetime.now())
+        self.env["stock.balance"].action_refresh()
+        category = self.env["product.category"].create({"name": "Test Category"})
+        self.product.categ_id = category
+        self.env["stock.balance"]._cron_refresh()
+        rows = self.env["stock.balance"].search([("product_id", "=", self.product.id)])
+        self.assertEqual(rows.categ_id, category)
@@ -7,6 +7,7 @@ import logging
 
 from odoo import http
 from odoo.http import request
+from odoo.osv import expression
 
 from odoo.addons.website_sale.controllers.main import WebsiteSale
 
@@ -22,79 +23,42 @@ class WebsiteSaleAlternativeLink(WebsiteSale):
         return self.product(product, **kwargs)
 
     @http.route(["/shop/products-json"], type="json", auth="public", website=True, sitemap=False)
-    def products_json_by_code(self, search="", vat="", **kwargs):
-        res = self._search_products_by_code(search, vat)
-        return res
+    def products_json_by_code(self, search="", vat="", limit=None, page=1, **kwargs):
+        product_model = request.env["product.template"].sudo()
+        limit = product_model._get_code_search_limit(limit)
+        try:
+            page = max(int(page or 1), 1)
+        except (TypeError, ValueError):
+            page = 1
+        domain = self._get_products_by_code_domain(search, vat)
+        total = product_model.search_count(domain)
+        products = product_model.search(domain, limit=limit, offset=(page - 1) * limit)
+        return {
+            "products": self._get_products_by_code_values(products),
+            "page": page,
+            "limit": limit,
+            "total": total,
+            "pages": -(-total // limit),
+        }
 
     @http.route(["/shop/products-search"], type="http", auth="public", website=True, sitemap=False)
     def products_search_by_code(self, search="", vat="", **kwargs):
-        res = self._search_products_by_code(search, vat)
+        res = self._search_products_by_code(search, vat, limit=kwargs.get("limit"))
         return str(res)
 
-    def _search_products_by_code(self, search, vat=""):
-        domain = request.website.sale_product_domain()
+    def _get_products_by_code_domain(self, search, vat=""):
         _logger.info("_search_products_by_code: %s", search)
-        if search:
-            for srch in search.split(" "):
-                domain += [
-                    "|",
-                    "|",
-                    "|",
-                    ("name", "ilike", srch),
-                    ("description", "ilike", srch),
-                    ("description_sale", "ilike", srch),
-                    ("product_variant_ids.default_code", "ilike", srch),
-                ]
+        domain = request.env["product.template"]._get_code_search_domain(search, vat)
+        return expression.AND([request.website.sale_product_domain(), domain])
 
-        products = request.env["product.template"].with_context(bin_size=True).sudo().search(domain, limit=10)
-        res = []
-        alternative_code_mod = (
-            request.env["ir.module.module"]
-            .sudo()
-            .search([("name", "=", "deltatech_alternative"), ("state", "=", "installed")])
-        )
-        pricelist = request.website.get_current_pricelist()
+    def _get_products_by_code_values(self, products):
+        # web.base.url este citit din cache-ul parametrilor de sistem
         base_url = request.env["ir.config_parameter"].sudo().get_param("web.base.url")
+        pricelist = request.website.get_current_pricelist()
+        return products.with_context(bin_size=True)._get_code_search_values(pricelist, request.website, base_url)
 
-        # filtrare dupa furnizor
-        if not vat:
-            filtred_products = products
-        else:
-            filtred_products = request.env["product.template"]
-
-            for product in products:
-                ok = True
-                for supplier in product.seller_ids:
-                    if supplier.partner_id.vat == vat:
-                        ok = False
-                if ok:
-                    filtred_products |= product
-
-        for product in filtred_products:
-            if product.is_published:
-                combination_info = product.with_context(display_default_code=False)._get_combination_info(
-                    pricelist=pricelist
-                )
-                values = {
-                    "name": combination_info["display_name"],
-                    "default_code": product.default_code or "ID_%s" % product.id,
-                    "categories": [],
-                    "price": combination_info["price"],
-                    "list_price": combination_info["list_price"],
-                    "image_url": base_url + "/web/image/product.template/" + str(product.id) + "/image_1024/",
-                }
-                for categ in product.public_categ_ids:
-                    values["categories"] += [categ.display_name]
-                if alternative_code_mod:
-                    alternative_code = []
-                    for alternative in product.alternative_ids:
-                        alternative_code += [{"name": alternative.name, "hide": alternative.hide}]
-                    values["alternative_code"] = alternative_code
-
-                values["images"] = []
-                for media in product.product_template_image_ids:
-                    values["images"] += [base_url + "/web/image/product.image/" + str(media.id) + "/image_1024/"]
-
-                res += [values]
-
-        return res
+    def _search_products_by_code(self, search, vat="", limit=None, offset=0):
+        product_model = request.env["product.template"].sudo()
+        domain = self._get_products_by_code_domain(search, vat)
+        products = product_model.search(domain, limit=product_model._get_code_search_limit(limit), offset=offset)
+        return self._get_products_by_code_values(products)
@@ -2,7 +2,11 @@
 #              Dorin Hongu <dhongu(@)gmail(.)com
 # See README.rst file on addons root folder for license details
 
-from odoo import models
+from odoo import api, models
+from odoo.osv import expression
+
+CODE_SEARCH_LIMIT_PARAM = "deltatech_website_product_code.products_json_limit"
+CODE_SEARCH_MAX_LIMIT_PARAM = "deltatech_website_product_code.products_json_max_limit"
 
 
 class ProductTemplate(models.Model):
@@ -18,3 +22,86 @@ class ProductTemplate(models.Model):
                 data["name"] = "[{}] {}".format(data["default_code"], data["name"])
 
         return results_data
+
+    @api.model
+    def _get_code_search_limit(self, limit=None):
+        """Page size of the code search, the default and the maximum are set in system parameters"""
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        max_limit = int(get_param(CODE_SEARCH_MAX_LIMIT_PARAM, "100"))
+        try:
+            limit = int(limit or get_param(CODE_SEARCH_LIMIT_PARAM, "10"))
+        except ValueError:
+            limit = int(get_param(CODE_SEARCH_LIMIT_PARAM, "10"))
+        return max(1, min(limit, max_limit))
+
+    @api.model
+    def _get_code_search_domain(self, search, vat=""):
+        """Domain of the published products that contain all the words of search.
+
+        With deltatech_alternative the words are searched in search_index (trigram index with name,
+        codes and alternative codes), otherwise in the name and in the code of the variants.
+        """
+        domain = [("is_published", "=", True)]
+        indexed = "search_index" in self._fields
+        for word in (search or "").split():
+            if indexed:
+                domain = expression.AND([domain, [("search_index", "ilike", word)]])
+            else:
+                word_domain = ["|", ("name", "ilike", word), ("product_variant_ids.default_code", "ilike", word)]
+                domain = expression.AND([domain, word_domain])
+        if vat:
+            # fara produsele care au ca furnizor partenerul cu acest cod fiscal
+            supplier_query = self.env["product.supplierinfo"].sudo()._search([("partner_id.vat", "=", vat)])
+            domain = expression.AND([domain, [("seller_ids", "not in", supplier_query)]])
+        return domain
+
+    def _get_code_search_prices(self, pricelist, website):
+        """Price and list price of all the products computed in a single pricelist pass, with the taxes
+        displayed as in _get_combination_info
+
+        :return: dict {product_id: (price, list_price)}
+        """
+        currency = pricelist.currency_id or website.currency_id
+        list_prices = self.price_compute("list_price", currency=currency)
+        prices = pricelist._get_products_price(self, 1.0) if pricelist else list_prices
+        company = website.company_id
+        fiscal_position = website.fiscal_position_id.sudo()
+        partner = self.env.user.partner_id
+        tax_key = "total_included" if website.show_line_subtotals_tax_selection == "tax_included" else "total_excluded"
+        tax_model = self.env["account.tax"]
+        res = {}
+        for product in self:
+            product_taxes = product.sudo().taxes_id.filtered(lambda t, c=company: t.company_id == c)
+            taxes = fiscal_position.map_tax(product_taxes)
+            values = []
+            for price in (prices[product.id], list_prices[product.id]):
+                price = tax_model._fix_tax_included_price_company(price, product_taxes, taxes, company)
+                values.append(taxes.compute_all(price, currency, 1, product, partner)[tax_key])
+            res[product.id] = tuple(values)
+        return res
+
+    def _get_code_search_values(self, pricelist, website, base_url):
+        """Values returned by the code search endpoints, the prices are computed for all products at once"""
+        prices = self._get_code_search_prices(pricelist, website)
+        with_alternative = "alternative_ids" in self._fields
+        res = []
+        for product in self.with_context(display_default_code=False):
+            price, list_price = prices[product.id]
+            values = {
+                "name": product.display_name,
+                "default_code": product.default_code or "ID_%s" % product.id,
+                "categories": product.public_categ_ids.mapped("display_name"),
+                "price": price,
+                "list_price": list_price,
+                "image_url": "{}/web/image/product.template/{}/image_1024/".format(base_url, product.id),
+            }
+            if with_alternative:
+                values["alternative_code"] = [
+                    {"name": alternative.name, "hide": alternative.hide} for alternative in product.alternative_ids
+                ]
+            values["images"] = [
+                "{}/web/image/product.image/{}/image_1024/".format(base_url, media.id)
+                for media in product.product_template_image_ids
+            ]
+            res.append(values)
+        return res
@@ -0,0 +1,4 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from . import test_product_code
@@ -0,0 +1,56 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from odoo.tests.common import TransactionCase
+
+
+class TestProductCode(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.product_model = self.env["product.template"]
+        self.supplier = self.env["res.partner"].create({"name": "Test Supplier", "vat": "RO123456"})
+        self.product = self.product_model.create(
+            {"name": "Test Filter Oil", "default_code": "TCODE-001", "list_price": 100, "is_published": True}
+        )
+        self.product_other = self.product_model.create(
+            {
+                "name": "Test Filter Air",
+                "default_code": "TCODE-002",
+                "list_price": 50,
+                "is_published": True,
+                "seller_ids": [(0, 0, {"partner_id": self.supplier.id, "price": 10})],
+            }
+        )
+        self.website = self.env["website"].get_current_website()
+
+    def test_search_domain(self):
+        domain = self.product_model._get_code_search_domain("test filter")
+        self.assertEqual(self.product_model.search(domain), self.product | self.product_other)
+        domain = self.product_model._get_code_search_domain("TCODE-001")
+        self.assertEqual(self.product_model.search(domain), self.product)
+        domain = self.product_model._get_code_search_domain("test filter", vat="RO123456")
+        self.assertEqual(self.product_model.search(domain), self.product)
+
+        # un alt furnizor nu face produsul vizibil
+        other_supplier = self.env["res.partner"].create({"name": "Other Supplier", "vat": "RO654321"})
+        self.product_other.seller_ids = [(0, 0, {"partner_id": other_supplier.id, "price": 12})]
+        self.assertEqual(self.product_model.search(domain), self.product)
+        domain = self.product_model._get_code_search_domain("test filter", vat="RO654321")
+        self.assertEqual(self.product_model.search(domain), self.product)
+
+    def test_search_limit(self):
+        self.env["ir.config_parameter"].sudo().set_param("deltatech_website_product_code.products_json_limit", "5")
+        self.assertEqual(self.product_model._get_code_search_limit(), 5)
+        self.assertEqual(self.product_model._get_code_search_limit(1000), 100)
+        self.assertEqual(self.product_model._get_code_search_limit("x"), 5)
+
+    def test_search_values(self):
+        products = self.product | self.product_other
+        pricelist = self.website.get_current_pricelist()
+        values = products._get_code_search_values(pricelist, self.website, "http://localhost")
+        self.assertEqual([v["default_code"] for v in values], ["TCODE-001", "TCODE-002"])
+        for product, product_values in zip(products, values):
+            product = product.with_context(display_default_code=False, website_id=self.website.id)
+            info = product._get_combination_info(pricelist=pricelist)
+            self.assertAlmostEqual(product_values["price"], info["price"])
+            self.assertAlmostEqual(product_values["list_price"], info["list_price"])
@@ -5,7 +5,7 @@
     "name": "eCommerce Product Link",
     "category": "Website",
     "summary": "Alternative product url",
-    "version": "16.0.1.0.0",
+    "version": "16.0.1.0.1",
     "author": "Terrabit, Dorin Hongu",
     "license": "OPL-1",
     "website": "https://www.terrabit.ro",
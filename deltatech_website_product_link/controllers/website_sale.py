@@ -13,15 +13,11 @@ class WebsiteSaleAlternativeLink(WebsiteSale):
     @http.route(["/<string:alternative_link>"], type="http", auth="public", website=True, sitemap=False)
     def shop_alternative_link(self, alternative_link=None, **post):
         if alternative_link:
-            Category = request.env["product.public.category"]
-            category = Category.search([("alternative_link", "=", alternative_link)], limit=1)
-            if category:
-                res = self.shop(category=category.id, **post)
-                return res
-
-            Product = request.env["product.template"]
-            product = Product.search([("alternative_link", "=", alternative_link)], limit=1)
-            if product:
-                res = self.product(product=product, **post)
-                return res
+            route = request.env["product.template"]._get_alternative_link_route(alternative_link)
+            if route:
+                model, res_id, _origin, active = route
+                if model == "product.public.category":
+                    return self.shop(category=res_id, **post)
+                if active:
+                    return self.product(product=request.env["product.template"].browse(res_id), **post)
         raise request.not_found()
@@ -69,13 +69,8 @@ class IrHttp(models.AbstractModel):
         rerouting = rerouting or getattr(request, "rerouting", list())
         website = website or getattr(request, "website", self.env["website"].get_current_website())
 
-        # match = self.search([("origin", "=", path)])
-        Category = request.env["product.public.category"]
-        match = Category.search([("website_url", "=", path)], limit=1)
-        # if not match:
-        #     Product = self.env['product.template']
-        #     match = Product.search([("alternative_link", "=", path)], limit=1)
-        destination = match.alternative_link
+        redirects = self.env["product.template"]._get_alternative_link_routes()[1]
+        destination = redirects.get(path)
         # Fail when needed
         if not destination:
             raise NoRedirectionError(_("No redirection target found."))
@@ -107,11 +102,7 @@ class IrHttp(models.AbstractModel):
         """
         path = redirected_path or request.httprequest.path
 
-        Category = request.env["product.public.category"]
-        match = Category.search([("alternative_link", "=", path)], limit=1)
-        if not match:
-            Product = self.env["product.template"].with_context(origin=True, active_test=False)
-            match = Product.search([("alternative_link", "=", path)], limit=1)
-        if not match:
+        route = self.env["product.template"]._get_alternative_link_route(path)
+        if not route:
             raise NoOriginError(_("No origin found for this redirection."))
-        return match.with_context(origin=True).website_url
+        return route[2]
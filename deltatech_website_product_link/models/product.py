@@ -3,7 +3,7 @@
 # See README.rst file on addons root folder for license details
 
 
-from odoo import fields, models
+from odoo import api, fields, models
 
 
 class ProductPublicCategory(models.Model):
@@ -11,6 +11,27 @@ class ProductPublicCategory(models.Model):
 
     alternative_link = fields.Char()
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        categories = super().create(vals_list)
+        if categories.filtered("alternative_link"):
+            self.env["product.template"]._clear_alternative_link_routes()
+        return categories
+
+    def write(self, vals):
+        clear = "alternative_link" in vals or ("name" in vals and self.filtered("alternative_link"))
+        res = super().write(vals)
+        if clear:
+            self.env["product.template"]._clear_alternative_link_routes()
+        return res
+
+    def unlink(self):
+        clear = self.filtered("alternative_link")
+        res = super().unlink()
+        if clear:
+            self.env["product.template"]._clear_alternative_link_routes()
+        return res
+
     def _compute_website_url(self):
         super()._compute_website_url()
         origin = self.env.context.get("origin", False)
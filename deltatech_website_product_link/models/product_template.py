@@ -3,7 +3,11 @@
 # See README.rst file on addons root folder for license details
 
 
-from odoo import fields, models
+from odoo import api, fields, models, tools
+
+from odoo.addons.http_routing.models.ir_http import slug
+
+ROUTE_FIELDS = {"alternative_link", "name", "active"}
 
 
 class ProductTemplate(models.Model):
@@ -23,3 +27,62 @@ class ProductTemplate(models.Model):
                         website_url = "/" + website_url
                     product.website_url = website_url
         return record
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        if products.filtered("alternative_link"):
+            self._clear_alternative_link_routes()
+        return products
+
+    def write(self, vals):
+        clear = "alternative_link" in vals or (ROUTE_FIELDS & set(vals) and self.filtered("alternative_link"))
+        res = super().write(vals)
+        if clear:
+            self._clear_alternative_link_routes()
+        return res
+
+    def unlink(self):
+        clear = self.filtered("alternative_link")
+        res = super().unlink()
+        if clear:
+            self._clear_alternative_link_routes()
+        return res
+
+    @api.model
+    def _alternative_link_key(self, link):
+        return (link or "").strip("/")
+
+    @api.model
+    @tools.ormcache("self.env.lang")
+    def _get_alternative_link_routes(self):
+        """Routing table of the alternative links, kept in the registry cache of each worker.
+
+        :return: tuple (routes, redirects) where routes is {link: (model, id, origin path, active)}
+            and redirects is {origin path: alternative path} for the categories
+        """
+        routes = {}
+        redirects = {}
+        products = self.sudo().with_context(active_test=False).search([("alternative_link", "!=", False)])
+        for product in products:
+            key = self._alternative_link_key(product.alternative_link)
+            routes.setdefault(key, ("product.template", product.id, "/shop/%s" % slug(product), product.active))
+        # categoriile au prioritate fata de produse, ca in controller
+        categories = self.env["product.public.category"].sudo().search([("alternative_link", "!=", False)])
+        for category in categories:
+            key = self._alternative_link_key(category.alternative_link)
+            origin = "/shop/category/%s" % slug(category)
+            routes[key] = ("product.public.category", category.id, origin, True)
+            redirects.setdefault(origin, "/" + key)
+        return routes, redirects
+
+    @api.model
+    def _clear_alternative_link_routes(self):
+        # clear_caches semnaleaza si celorlalte procese ca trebuie sa goleasca cache-ul
+        self.clear_caches()
+
+    @api.model
+    def _get_alternative_link_route(self, link):
+        """Return (model, id, origin path, active) for the alternative link or None, without any query"""
+        routes = self._get_alternative_link_routes()[0]
+        return routes.get(self._alternative_link_key(link))
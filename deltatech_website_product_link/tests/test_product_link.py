@@ -0,0 +1,32 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from odoo.tests.common import TransactionCase
+
+
+class TestProductLink(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.product_model = self.env["product.template"]
+        self.product = self.product_model.create({"name": "Test Product", "alternative_link": "test-product"})
+        self.category = self.env["product.public.category"].create(
+            {"name": "Test Category", "alternative_link": "/test-category"}
+        )
+
+    def test_routes(self):
+        model, res_id, origin, active = self.product_model._get_alternative_link_route("/test-product")
+        self.assertEqual((model, res_id, active), ("product.template", self.product.id, True))
+        self.assertTrue(origin.startswith("/shop/"))
+
+        model, res_id, origin, active = self.product_model._get_alternative_link_route("test-category")
+        self.assertEqual((model, res_id), ("product.public.category", self.category.id))
+        redirects = self.product_model._get_alternative_link_routes()[1]
+        self.assertEqual(redirects[origin], "/test-category")
+
+    def test_routes_invalidation(self):
+        self.assertTrue(self.product_model._get_alternative_link_route("test-product"))
+        self.product.alternative_link = "other-link"
+        self.assertFalse(self.product_model._get_alternative_link_route("test-product"))
+        self.assertTrue(self.product_model._get_alternative_link_route("other-link"))
+        self.category.unlink()
+        self.assertFalse(self.product_model._get_alternative_link_route("test-category"))
@@ -5,7 +5,7 @@
     "name": "eCommerce Attribute values ",
     "category": "Website",
     "summary": "Attribute values for products displayed",
-    "version": "16.0.1.0.0",
+    "version": "16.0.1.1.0",
     "license": "LGPL-3",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
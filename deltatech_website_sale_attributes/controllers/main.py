@@ -17,31 +17,27 @@ class WebsiteSaleAttribute(WebsiteSale):
     def shop(self, page=0, category=None, search="", ppg=False, **post):
         response = super().shop(page, category, search, ppg, **post)
 
+        # valorile atributelor si numarul de produse se citesc dintr-o interogare agregata, tinuta in cache
+        category = response.qcontext.get("category")
+        attrib_values = response.qcontext.get("attrib_values")
+        domain = self._get_search_domain(search, category, attrib_values)
+        pricelist = response.qcontext.get("pricelist")
+        value_counts = request.env["product.template"]._get_facet_counts(
+            domain,
+            request.website.id,
+            category and category.id,
+            search,
+            attrib_values,
+            pricelist and pricelist.id,
+        )
+        value_ids = request.env["product.attribute.value"].browse(value_counts)
+
         if category and search:
-            # attrib_values = response.qcontext.get("attrib_values")
-            category = response.qcontext.get("category")
-            # domain = self._get_search_domain(search, category, attrib_values)
-            domain = request.env.context.get("shop_search_domain", [])
-
-            # value_ids = request.env["product.attribute.value"]
-            # products = response.qcontext.get("products")
-            products = request.env["product.template"].with_context(prefetch_fields=False).search(domain)
-
-            domain = [("product_tmpl_id", "in", products.ids)]
-            attribute_lines = request.env["product.template.attribute.line"].search(domain)
-
-            value_ids = attribute_lines.mapped("value_ids")
-            # domain = [("pav_attribute_line_ids", "in", attribute_lines.ids)]
-            # value_ids = request.env["product.attribute.value"].search(domain)
-
-            if category:
-                # se ascund restul de caterorii
-                # categories = request.env['product.public.category'].search([('id','child_of',category.id)])
-                categories = category
-                response.qcontext.update(categories=categories)
-        else:
-            value_ids = request.env["product.attribute.value"].search([])
-
-        response.qcontext.update(value_ids=value_ids)
+            # se ascund restul de caterorii
+            # categories = request.env['product.public.category'].search([('id','child_of',category.id)])
+            categories = category
+            response.qcontext.update(categories=categories)
+
+        response.qcontext.update(value_ids=value_ids, value_counts=value_counts)
 
         return response
@@ -0,0 +1,66 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+import time
+
+from odoo import api, models, tools
+
+FACET_QUERY = """
+    SELECT ptav.product_attribute_value_id, COUNT(DISTINCT ptav.product_tmpl_id)
+    FROM product_template_attribute_value AS ptav
+    WHERE ptav.ptav_active AND ptav.product_tmpl_id IN ({products})
+    GROUP BY ptav.product_attribute_value_id
+"""
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    @api.model
+    def _get_facet_cache_bucket(self):
+        """Time bucket added to the cache key, the cached counts expire after the TTL in seconds"""
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        ttl = int(get_param("deltatech_website_sale_attributes.facet_cache_ttl", "300"))
+        return int(time.time() // ttl) if ttl > 0 else time.time()
+
+    @api.model
+    def _get_facet_counts(self, domain, website_id, category_id, search, attrib_values, pricelist_id):
+        """Attribute values of the products of the shop domain, with the number of products for each value
+
+        The result is kept in the registry cache (LRU) for the TTL; the key is the domain, the website,
+        the category, the normalised search, the selected attribute values, the pricelist and the access
+        level of the user.
+
+        :return: dict {product.attribute.value id: count of product templates}
+        """
+        search = " ".join((search or "").lower().split())
+        attrib_values = tuple(sorted(tuple(value) for value in attrib_values or []))
+        return dict(
+            self._get_facet_counts_cached(
+                domain,
+                website_id,
+                category_id,
+                search,
+                attrib_values,
+                pricelist_id,
+                self.env.user._is_internal(),
+                self._get_facet_cache_bucket(),
+            )
+        )
+
+    @api.model
+    @tools.ormcache(
+        "str(domain)", "website_id", "category_id", "search", "attrib_values", "pricelist_id", "internal", "bucket"
+    )
+    def _get_facet_counts_cached(
+        self, domain, website_id, category_id, search, attrib_values, pricelist_id, internal, bucket
+    ):
+        query = self._search(domain)
+        if isinstance(query, list):
+            return ()
+        self.env["product.template.attribute.value"].flush_model(
+            ["product_attribute_value_id", "product_tmpl_id", "ptav_active"]
+        )
+        subquery, params = query.subselect()
+        self.env.cr.execute(FACET_QUERY.format(products=subquery), params)
+        return tuple(self.env.cr.fetchall())
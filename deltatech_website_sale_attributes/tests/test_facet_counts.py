@@ -0,0 +1,44 @@
+# ©  2008-2023 Deltatech
+# See README.rst file on addons root folder for license details
+
+from odoo.tests.common import TransactionCase
+
+
+class TestFacetCounts(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        # intervalul de cache este fixat, testul nu depinde de ora la care ruleaza
+        self.patch(type(self.env["product.template"]), "_get_facet_cache_bucket", lambda self: 1)
+        self.attribute = self.env["product.attribute"].create({"name": "Facet", "create_variant": "no_variant"})
+        self.value_a, self.value_b = self.env["product.attribute.value"].create(
+            [{"name": "A", "attribute_id": self.attribute.id}, {"name": "B", "attribute_id": self.attribute.id}]
+        )
+        self.products = self.env["product.template"].create(
+            [
+                {
+                    "name": "Facet %s" % index,
+                    "attribute_line_ids": [
+                        (0, 0, {"attribute_id": self.attribute.id, "value_ids": [(6, 0, values.ids)]})
+                    ],
+                }
+                for index, values in enumerate([self.value_a, self.value_a | self.value_b])
+            ]
+        )
+
+    def test_facet_counts(self):
+        product_model = self.env["product.template"]
+        domain = [("id", "in", self.products.ids)]
+        counts = product_model._get_facet_counts(domain, 1, False, " Facet ", [], False)
+        self.assertEqual(counts, {self.value_a.id: 2, self.value_b.id: 1})
+
+        # aceeasi cheie de cache, rezultatul nu se recalculeaza
+        self.products[1].attribute_line_ids.unlink()
+        self.assertEqual(product_model._get_facet_counts(domain, 1, False, "facet", [], False), counts)
+
+        product_model.clear_caches()
+        counts = product_model._get_facet_counts(domain, 1, False, "facet", [], False)
+        self.assertEqual(counts, {self.value_a.id: 1})
+
+        # alt domeniu cu aceeasi cheie de magazin nu foloseste rezultatul din cache
+        domain = [("id", "=", self.products[1].id)]
+        self.assertEqual(product_model._get_facet_counts(domain, 1, False, "facet", [], False), {})
@@ -5,7 +5,7 @@
     "name": "eCommerce Product sort",
     "category": "Website",
     "summary": "Additional sorting criteria ",
-    "version": "16.0.1.0.1",
+    "version": "16.0.1.1.0",
     "license": "LGPL-3",
     "author": "Terrabit, Dorin Hongu",
     "website": "https://www.terrabit.ro",
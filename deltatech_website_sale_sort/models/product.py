@@ -3,13 +3,113 @@
 # See README.rst file on addons root folder for license details
 
 import logging
+import threading
 from datetime import time, timedelta
 
 from odoo import api, fields, models
-from odoo.tools.float_utils import float_round
+from odoo.tools import split_every
 
 _logger = logging.getLogger(__name__)
 
+TRACK_WATERMARK_PARAM = "deltatech_website_sale_sort.website_track_watermark"
+# vizitele mai noi de atat pot fi inca in tranzactii deschise, sunt numarate la urmatoarea rulare
+TRACK_DELAY = timedelta(minutes=10)
+
+# cantitatea vanduta in ultimul an, in unitatea de masura a produsului
+SALES_QUERY = """
+    UPDATE product_product AS pp SET sales_count2 = stat.sales_count2
+    FROM (
+        SELECT p.id, COALESCE(ROUND((sales.qty / u.rounding)::numeric) * u.rounding, 0) AS sales_count2
+        FROM product_product AS p
+            JOIN product_template AS t ON t.id = p.product_tmpl_id
+            JOIN uom_uom AS u ON u.id = t.uom_id
+            LEFT JOIN (
+                SELECT l.product_id, SUM(l.product_uom_qty / lu.factor * pu.factor) AS qty
+                FROM sale_order_line AS l
+                    JOIN sale_order AS s ON s.id = l.order_id
+                    JOIN product_product AS lp ON lp.id = l.product_id
+                    JOIN product_template AS lt ON lt.id = lp.product_tmpl_id
+                    JOIN uom_uom AS lu ON lu.id = l.product_uom
+                    JOIN uom_uom AS pu ON pu.id = lt.uom_id
+                WHERE s.state IN %(states)s AND s.date_order >= %(date_from)s AND l.product_id = ANY(%(ids)s)
+                GROUP BY l.product_id
+            ) AS sales ON sales.product_id = p.id
+        WHERE p.id = ANY(%(ids)s)
+    ) AS stat
+    WHERE pp.id = stat.id AND pp.sales_count2 IS DISTINCT FROM stat.sales_count2
+"""
+
+VISITS_QUERY = """
+    UPDATE product_product AS pp SET visit_count = stat.visit_count
+    FROM (
+        SELECT p.id, COALESCE(tracks.visit_count, 0) AS visit_count
+        FROM product_product AS p
+            LEFT JOIN (
+                SELECT product_id, COUNT(*) AS visit_count FROM website_track
+                WHERE product_id IS NOT NULL AND id <= %(id_to)s {where}
+                GROUP BY product_id
+            ) AS tracks ON tracks.product_id = p.id
+        WHERE TRUE {product_where}
+    ) AS stat
+    WHERE pp.id = stat.id AND pp.visit_count IS DISTINCT FROM stat.visit_count
+"""
+
+VISITS_INCREMENT_QUERY = """
+    UPDATE product_product AS pp SET visit_count = COALESCE(pp.visit_count, 0) + tracks.visit_count
+    FROM (
+        SELECT product_id, COUNT(*) AS visit_count FROM website_track
+        WHERE product_id IS NOT NULL AND id > %(id_from)s AND id <= %(id_to)s
+        GROUP BY product_id
+    ) AS tracks
+    WHERE pp.id = tracks.product_id
+"""
+
+TEMPLATE_STATISTICS_QUERY = """
+    UPDATE product_template AS pt SET
+        sales_count2 = stat.sales_count2,
+        visit_count = stat.visit_count,
+        rating_count2 = stat.rating_count2,
+        rating_avg2 = stat.rating_avg2,
+        in_stock = stat.in_stock
+    FROM (
+        SELECT t.id,
+            COALESCE(variants.sales_count2, 0) AS sales_count2,
+            COALESCE(variants.visit_count, 0) AS visit_count,
+            COALESCE(ratings.rating_count, 0) AS rating_count2,
+            COALESCE(ratings.rating_avg, 0) AS rating_avg2,
+            COALESCE(stock.quantity, 0) > 0 AS in_stock
+        FROM product_template AS t
+            LEFT JOIN (
+                SELECT product_tmpl_id, SUM(sales_count2) AS sales_count2, SUM(visit_count) AS visit_count
+                FROM product_product
+                WHERE product_tmpl_id = ANY(%(ids)s)
+                GROUP BY product_tmpl_id
+            ) AS variants ON variants.product_tmpl_id = t.id
+            LEFT JOIN (
+                SELECT res_id, COUNT(*) AS rating_count, AVG(rating) AS rating_avg
+                FROM rating_rating
+                WHERE res_model = 'product.template' AND consumed AND res_id = ANY(%(ids)s)
+                GROUP BY res_id
+            ) AS ratings ON ratings.res_id = t.id
+            LEFT JOIN (
+                SELECT pp.product_tmpl_id, SUM(sq.quantity) AS quantity
+                FROM stock_quant AS sq
+                    JOIN stock_location AS sl ON sl.id = sq.location_id
+                    JOIN product_product AS pp ON pp.id = sq.product_id
+                WHERE sl.usage = 'internal' AND sl.warehouse_id IS NOT NULL AND pp.product_tmpl_id = ANY(%(ids)s)
+                GROUP BY pp.product_tmpl_id
+            ) AS stock ON stock.product_tmpl_id = t.id
+        WHERE t.id = ANY(%(ids)s)
+    ) AS stat
+    WHERE pt.id = stat.id AND (
+        pt.sales_count2 IS DISTINCT FROM stat.sales_count2
+        OR pt.visit_count IS DISTINCT FROM stat.visit_count
+        OR pt.rating_count2 IS DISTINCT FROM stat.rating_count2
+        OR pt.rating_avg2 IS DISTINCT FROM stat.rating_avg2
+        OR pt.in_stock IS DISTINCT FROM stat.in_stock
+    )
+"""
+
 
 class ProductTemplate(models.Model):
     _inherit = "product.template"
@@ -26,34 +126,35 @@ class ProductTemplate(models.Model):
     in_stock = fields.Boolean()
 
     def _update_statistics(self):
-        domain = [("res_model", "=", self._name), ("res_id", "in", self.ids), ("consumed", "=", True)]
-        read_group_res = self.env["rating.rating"].read_group(
-            domain, ["rating:avg"], groupby=["res_id"], lazy=False
-        )  # force average on rating column
-        mapping = {
-            item["res_id"]: {"rating_count": item["__count"], "rating_avg": item["rating"]} for item in read_group_res
-        }
-
-        for record in self:
-            sales_count2 = sum(p.sales_count2 for p in record.with_context(active_test=False).product_variant_ids)
-            visit_count = sum(p.visit_count for p in record.with_context(active_test=False).product_variant_ids)
-            rating_count2 = mapping.get(record.id, {}).get("rating_count", 0)
-            rating_avg2 = mapping.get(record.id, {}).get("rating_avg", 0)
-            record.write(
-                {
-                    "sales_count2": sales_count2,
-                    "visit_count": visit_count,
-                    "rating_count2": rating_count2,
-                    "rating_avg2": rating_avg2,
-                    "in_stock": record.qty_available > 0,
-                }
-            )
+        """Sum the statistics of the variants, count the ratings and check the stock with one query,
+        only the templates with changed values are written"""
+        if not self:
+            return
+        self.env["product.product"].flush_model(["sales_count2", "visit_count", "product_tmpl_id"])
+        self.env["rating.rating"].flush_model(["res_model", "res_id", "rating", "consumed"])
+        self.env["stock.quant"].flush_model(["product_id", "location_id", "quantity"])
+        self.flush_recordset(["sales_count2", "visit_count", "rating_count2", "rating_avg2", "in_stock"])
+        self.env.cr.execute(TEMPLATE_STATISTICS_QUERY, {"ids": self.ids})
+        _logger.info("Updated statistics of %s products templates", self.env.cr.rowcount)
+        self.invalidate_recordset(["sales_count2", "visit_count", "rating_count2", "rating_avg2", "in_stock"])
+
+    @api.model
+    def _get_statistics_chunk_size(self):
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        return int(get_param("deltatech_website_sale_sort.statistics_chunk_size", "10000"))
+
+    @api.model
+    def _commit_chunk(self):
+        """Commit the chunk processed by the cron, so a long run does not keep the rows locked"""
+        if not getattr(threading.current_thread(), "testing", False) and not self.env.registry.in_test_mode():
+            self.env.cr.commit()  # pylint: disable=invalid-commit
 
     @api.model
     def _cron_update_statistics(self):
         self.env["product.product"]._cron_update_statistics()
-        products = self.search([])
-        products._update_statistics()
+        for ids in split_every(self._get_statistics_chunk_size(), self.search([]).ids, list):
+            self.browse(ids)._update_statistics()
+            self._commit_chunk()
 
 
 class ProductProduct(models.Model):
@@ -62,37 +163,69 @@ class ProductProduct(models.Model):
     sales_count2 = fields.Float(string="Sold2", store=True)
     visit_count = fields.Integer(string="Visits", store=True)
 
-    def _update_statistics(self):
+    def _update_sales_statistics(self):
+        if not self:
+            return
         date_from = fields.Datetime.to_string(
             fields.datetime.combine(fields.datetime.now() - timedelta(days=365), time.min)
         )
-
         done_states = self.env["sale.report"]._get_done_states()
+        self.env["sale.order.line"].flush_model(["order_id", "product_id", "product_uom_qty", "product_uom"])
+        self.env["sale.order"].flush_model(["state", "date_order"])
+        self.flush_recordset(["sales_count2"])
+        params = {"ids": self.ids, "states": tuple(done_states), "date_from": date_from}
+        self.env.cr.execute(SALES_QUERY, params)
+        self.invalidate_recordset(["sales_count2"])
 
-        domain = [
-            ("state", "in", done_states),
-            ("product_id", "in", self.ids),
-            ("date", ">=", date_from),
-        ]
-
-        results = self.env["sale.report"].read_group(domain, ["product_id", "product_uom_qty"], ["product_id"])
-
-        sale_mapping = {item["product_id"]: {"sales_count": item["product_uom_qty"]} for item in results}
-
-        results = self.env["website.track"].read_group(
-            domain=[("product_id", "!=", False)],
-            fields=["product_id", "id:count_distinct"],
-            groupby=["product_id"],
-            lazy=False,
+    @api.model
+    def _get_track_watermark(self):
+        """Last website.track counted in visit_count and the last one that can be counted now"""
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        watermark = int(get_param(TRACK_WATERMARK_PARAM, "0"))
+        self.env["website.track"].flush_model()
+        self.env.cr.execute(
+            "SELECT MAX(id) FROM website_track WHERE visit_datetime < %s",
+            (fields.Datetime.now() - TRACK_DELAY,),
         )
-        visit_mapping = {item["product_id"]: {"visit_count": item["__count"]} for item in results}
+        return watermark, max(self.env.cr.fetchone()[0] or 0, watermark)
+
+    def _update_visit_statistics(self):
+        """Count again the visits of the products, up to the watermark"""
+        if not self:
+            return
+        watermark, new_watermark = self._get_track_watermark()
+        self.flush_recordset(["visit_count"])
+        query = VISITS_QUERY.format(where="AND product_id = ANY(%(ids)s)", product_where="AND p.id = ANY(%(ids)s)")
+        # inainte de prima rulare a cron-ului se numara tot istoricul, ca la _update_visit_counts
+        self.env.cr.execute(query, {"ids": self.ids, "id_to": watermark or new_watermark})
+        self.invalidate_recordset(["visit_count"])
 
-        for product in self:
-            visit_count = visit_mapping.get(product.id, {}).get("visit_count", 0)
-            sales_count2 = float_round(sale_mapping.get(product.id, 0), precision_rounding=product.uom_id.rounding)
-            product.write({"visit_count": visit_count, "sales_count2": sales_count2})
+    @api.model
+    def _update_visit_counts(self):
+        """Add to visit_count the visits tracked since the last run, the history is not read again"""
+        watermark, new_watermark = self._get_track_watermark()
+        if new_watermark == watermark:
+            return
+        self.flush_model(["visit_count"])
+        if watermark:
+            query = VISITS_INCREMENT_QUERY
+        else:
+            # la prima rulare se numara tot istoricul
+            query = VISITS_QUERY.format(where="", product_where="")
+        self.env.cr.execute(query, {"id_from": watermark, "id_to": new_watermark})
+        _logger.info("Updated visits of %s products", self.env.cr.rowcount)
+        self.invalidate_model(["visit_count"])
+        self.env["ir.config_parameter"].sudo().set_param(TRACK_WATERMARK_PARAM, new_watermark)
+
+    def _update_statistics(self):
+        self._update_sales_statistics()
+        self._update_visit_statistics()
 
     @api.model
     def _cron_update_statistics(self):
-        products = self.search([])
-        products._update_statistics()
+        self._update_visit_counts()
+        template_model = self.env["product.template"]
+        template_model._commit_chunk()
+        for ids in split_every(template_model._get_statistics_chunk_size(), self.search([]).ids, list):
+            self.browse(ids)._update_sales_statistics()
+            template_model._commit_chunk()
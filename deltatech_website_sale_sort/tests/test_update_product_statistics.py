@@ -2,6 +2,9 @@
 #              Dorin Hongu <dhongu(@)gmail(.)com
 # See README.rst file on addons root folder for license details
 
+from datetime import timedelta
+
+from odoo import fields
 from odoo.tests.common import TransactionCase
 
 
@@ -20,3 +23,32 @@ class TestUpdateProductStatistics(TransactionCase):
 
     def test_update_statistics(self):
         self.env["product.template"]._cron_update_statistics()
+
+    def _track(self, product, count):
+        visitor = self.env["website.visitor"].create({})
+        visit_datetime = fields.Datetime.now() - timedelta(hours=1)
+        self.env["website.track"].create(
+            [{"visitor_id": visitor.id, "product_id": product.id, "visit_datetime": visit_datetime}] * count
+        )
+
+    def test_update_statistics_incremental(self):
+        stock_location = self.env.ref("stock.stock_location_stock")
+        self.env["stock.quant"]._update_available_quantity(self.product_a, stock_location, 5)
+        self._track(self.product_a, 2)
+        self.env["product.template"]._cron_update_statistics()
+        self.assertEqual(self.product_a.visit_count, 2)
+        self.assertEqual(self.product_a.product_tmpl_id.visit_count, 2)
+        self.assertTrue(self.product_a.product_tmpl_id.in_stock)
+        self.assertFalse(self.product_b.product_tmpl_id.in_stock)
+
+        # vizitele noi se aduna la cele numarate deja
+        self._track(self.product_a, 1)
+        self.env["product.template"]._cron_update_statistics()
+        self.assertEqual(self.product_a.visit_count, 3)
+        self.assertEqual(self.product_a.product_tmpl_id.visit_count, 3)
+
+    def test_update_statistics_without_watermark(self):
+        self.env["ir.config_parameter"].sudo().set_param("deltatech_website_sale_sort.website_track_watermark", "0")
+        self._track(self.product_a, 2)
+        self.product_a._update_statistics()
+        self.assertEqual(self.product_a.visit_count, 2)
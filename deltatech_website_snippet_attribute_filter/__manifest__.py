@@ -5,7 +5,7 @@
     "category": "Website",
     "summary": "eCommerce Attribute Values Filter Snippet",
     "images": ["static/description/main_screenshot.png"],
-    "version": "16.0.1.0.4",
+    "version": "16.0.1.0.5",
     "author": "Terrabit, Dorin Hongu",
     "license": "OPL-1",
     "website": "https://www.terrabit.ro",
@@ -1,13 +1,46 @@
 # ©  2023 Deltatech
 # See README.rst file on addons root folder for license details
 
+import time
 
-from odoo import models
+from odoo import api, models, tools
+
+# valorile atributului folosite de produsele care au cel putin una din valorile selectate
+RELATED_VALUES_QUERY = """
+    SELECT pav.id
+    FROM product_attribute_value AS pav
+    WHERE pav.id IN (
+        SELECT ptav.product_attribute_value_id
+        FROM product_template_attribute_value AS ptav
+        WHERE ptav.attribute_id = %(attribute)s AND ptav.ptav_active AND ptav.product_tmpl_id IN (
+            SELECT product_tmpl_id FROM product_template_attribute_value
+            WHERE product_attribute_value_id = ANY(%(values)s) AND ptav_active
+        )
+    )
+    ORDER BY pav.sequence, COALESCE(pav.name->>%(lang)s, pav.name->>'en_US'), pav.id
+"""
 
 
 class ProductAttribute(models.Model):
     _inherit = "product.attribute"
 
+    @api.model
+    def _get_values_cache_bucket(self):
+        """Time bucket added to the cache key, the cached values expire after the TTL in seconds"""
+        get_param = self.env["ir.config_parameter"].sudo().get_param
+        ttl = int(get_param("deltatech_website_snippet_attribute_filter.cache_ttl", "300"))
+        return int(time.time() // ttl) if ttl > 0 else time.time()
+
+    @tools.ormcache("self.id", "attribute_value_ids", "self.env.lang", "bucket")
+    def _get_related_value_ids(self, attribute_value_ids, bucket):
+        self.env["product.template.attribute.value"].flush_model(
+            ["attribute_id", "product_attribute_value_id", "product_tmpl_id", "ptav_active"]
+        )
+        self.env["product.attribute.value"].flush_model(["sequence", "name"])
+        params = {"attribute": self.id, "values": list(attribute_value_ids), "lang": self.env.lang or "en_US"}
+        self.env.cr.execute(RELATED_VALUES_QUERY, params)
+        return tuple(row[0] for row in self.env.cr.fetchall())
+
     def get_attribute_values(self, attribute_value_ids=None):
         self.ensure_one()
 
@@ -18,13 +51,9 @@ class ProductAttribute(models.Model):
         else:
             if isinstance(attribute_value_ids, str):
                 attribute_value_ids = [int(v) for v in attribute_value_ids.split(",")]
-            domain = [("product_attribute_value_id", "in", attribute_value_ids)]
-            template_values = self.env["product.template.attribute.value"].search(domain)
-            domain = [
-                ("product_tmpl_id", "in", template_values.mapped("product_tmpl_id").ids),
-                ("attribute_id", "=", self.id),
-            ]
-            template_values = self.env["product.template.attribute.value"].search(domain)
-            values |= template_values.mapped("product_attribute_value_id")
+            value_ids = self._get_related_value_ids(
+                tuple(sorted(set(attribute_value_ids))), self._get_values_cache_bucket()
+            )
+            values |= values.browse(value_ids)
 
         return values.read(["id", "name"])
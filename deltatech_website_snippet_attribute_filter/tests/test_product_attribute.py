@@ -17,3 +17,38 @@ class TestProductAttribute(TransactionCase):
         attribute.get_attribute_values()
         attribute.get_attribute_values(attribute_value_ids="{},{}".format(values.ids[0], values.ids[1]))
         attribute.get_attribute_values(attribute_value_ids=values.ids)
+
+    def test_get_related_attribute_values(self):
+        color = self.env["product.attribute"].create({"name": "Color", "create_variant": "no_variant"})
+        size = self.env["product.attribute"].create({"name": "Size", "create_variant": "no_variant"})
+        red, blue = self.env["product.attribute.value"].create(
+            [{"name": "Red", "attribute_id": color.id}, {"name": "Blue", "attribute_id": color.id}]
+        )
+        small, large = self.env["product.attribute.value"].create(
+            [{"name": "S", "attribute_id": size.id}, {"name": "L", "attribute_id": size.id}]
+        )
+        self.env["product.template"].create(
+            [
+                {
+                    "name": "Red shirt",
+                    "attribute_line_ids": [
+                        (0, 0, {"attribute_id": color.id, "value_ids": [(6, 0, red.ids)]}),
+                        (0, 0, {"attribute_id": size.id, "value_ids": [(6, 0, small.ids)]}),
+                    ],
+                },
+                {
+                    "name": "Blue shirt",
+                    "attribute_line_ids": [
+                        (0, 0, {"attribute_id": color.id, "value_ids": [(6, 0, blue.ids)]}),
+                        (0, 0, {"attribute_id": size.id, "value_ids": [(6, 0, large.ids)]}),
+                    ],
+                },
+            ]
+        )
+        values = size.get_attribute_values(attribute_value_ids=str(red.id))
+        self.assertEqual([value["id"] for value in values], small.ids)
+
+        # valorile sunt ordonate dupa secventa si denumire
+        small.sequence, large.sequence = 2, 1
+        values = size.get_attribute_values(attribute_value_ids=[red.id, blue.id])
+        self.assertEqual([value["id"] for value in values], [large.id, small.id])